@@ -1,14 +1,71 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.db.models import Q
+from django.db.models.functions import Left
 
 from .models import (
     ClarifyingQuestion,
+    Comment,
     DreamEntry,
+    DreamJob,
+    DreamMessage,
     DreamSymbol,
+    FeedItem,
     Interpretation,
+    InterpretationCacheEntry,
+    Like,
+    MonthlyDreamStats,
     Symbol,
     Tag,
     UserProfile,
 )
+from .pagination import EstimatedCountPaginator
+from .services import complete_names, search_dreams
+
+
+class LargeTableChangeList(ChangeList):
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        if self.model_admin.list_only:
+            queryset = queryset.only(*self.model_admin.list_only)
+        return queryset
+
+
+class KeysetChangeList(LargeTableChangeList):
+    """Newest first, one page at a time: "Older" links to ``?id__lt=<last id>`` instead
+    of an OFFSET, so every page is a short primary-key range scan and nothing is counted.
+    """
+
+    def get_results(self, request):
+        rows = list(self.queryset[: self.list_per_page + 1])
+        self.result_list = rows[: self.list_per_page]
+        self.result_count = len(self.result_list)
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = False
+        self.can_show_all = False
+        self.multi_page = False
+        self.paginator = self.model_admin.get_paginator(
+            request, self.queryset, self.list_per_page
+        )
+        self.older_url = None
+        if len(rows) > self.list_per_page:
+            self.older_url = self.get_query_string(
+                {"id__lt": self.result_list[-1].pk}, [PAGE_VAR]
+            )
+        self.newest_url = self.get_query_string(remove=["id__lt", PAGE_VAR])
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist for tables with millions of rows: no exact COUNT(*) and only the
+    columns in ``list_only`` are loaded."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_only: tuple[str, ...] = ()
+
+    def get_changelist(self, request, **kwargs):
+        return LargeTableChangeList
 
 
 @admin.register(UserProfile)
@@ -17,30 +74,95 @@ class UserProfileAdmin(admin.ModelAdmin):
     search_fields = ("user__username", "display_name")
 
 
+class CompletionSearchMixin:
+    # Also serves DreamEntryAdmin.autocomplete_fields: prefix/trigram lookups on the
+    # canonical key instead of ILIKE '%...%' over every name.
+    search_result_limit = 50
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        completions = complete_names(self.model, search_term, limit=self.search_result_limit)
+        return queryset.filter(pk__in=[pk for pk, _ in completions]), False
+
+
 @admin.register(Tag)
-class TagAdmin(admin.ModelAdmin):
+class TagAdmin(CompletionSearchMixin, admin.ModelAdmin):
+    list_display = ("name", "key")
     search_fields = ("name",)
+    readonly_fields = ("key",)
 
 
 @admin.register(Symbol)
-class SymbolAdmin(admin.ModelAdmin):
+class SymbolAdmin(CompletionSearchMixin, admin.ModelAdmin):
     list_display = ("name", "category")
     list_filter = ("category",)
     search_fields = ("name",)
+    readonly_fields = ("key",)
 
 
 @admin.register(DreamEntry)
-class DreamEntryAdmin(admin.ModelAdmin):
+class DreamEntryAdmin(LargeTableAdmin):
     list_display = ("title", "user", "date_dreamed", "privacy", "created_at")
     list_filter = ("privacy", "date_dreamed")
+    list_select_related = ("user",)
+    list_only = ("title", "user__username", "date_dreamed", "privacy", "created_at")
     search_fields = ("title", "narrative", "user__username")
     autocomplete_fields = ("tags", "symbols")
-    date_hierarchy = "date_dreamed"
+    raw_id_fields = ("user",)
+    search_result_limit = 1000
+
+    def get_search_results(self, request, queryset, search_term):
+        # Title/narrative go through the full-text index instead of ILIKE '%...%'.
+        if not search_term:
+            return queryset, False
+        ids = search_dreams(search_term, limit=self.search_result_limit)
+        return queryset.filter(Q(pk__in=ids) | Q(user__username=search_term)), False
+
+
+@admin.register(DreamMessage)
+class DreamMessageAdmin(LargeTableAdmin):
+    list_display = ("id", "dream", "role", "excerpt", "created_at")
+    list_select_related = ("dream__user",)
+    list_only = ("dream__title", "dream__user__username", "role", "created_at")
+    list_per_page = 50
+    ordering = ("-id",)
+    sortable_by = ()
+    search_fields = ("dream__title",)
+    search_result_limit = 1000
+    change_list_template = "admin/journal/keyset_change_list.html"
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(content_excerpt=Left("content", 80))
+
+    def get_search_results(self, request, queryset, search_term):
+        # Messages of the dreams whose title/narrative match, via the full-text index.
+        if not search_term:
+            return queryset, False
+        ids = search_dreams(search_term, limit=self.search_result_limit)
+        return queryset.filter(dream_id__in=ids), False
+
+    @admin.display(description="content")
+    def excerpt(self, message):
+        return message.content_excerpt
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(DreamSymbol)
 class DreamSymbolAdmin(admin.ModelAdmin):
     list_display = ("dream", "symbol", "confidence")
+    list_select_related = ("dream__user", "symbol")
     list_filter = ("symbol",)
     search_fields = ("dream__title", "symbol__name")
 
@@ -48,6 +170,7 @@ class DreamSymbolAdmin(admin.ModelAdmin):
 @admin.register(Interpretation)
 class InterpretationAdmin(admin.ModelAdmin):
     list_display = ("dream", "angle", "model", "created_at")
+    list_select_related = ("dream__user",)
     list_filter = ("angle",)
     search_fields = ("dream__title", "summary")
 
@@ -55,4 +178,53 @@ class InterpretationAdmin(admin.ModelAdmin):
 @admin.register(ClarifyingQuestion)
 class ClarifyingQuestionAdmin(admin.ModelAdmin):
     list_display = ("dream", "created_at")
+    list_select_related = ("dream__user",)
     search_fields = ("dream__title", "question", "answer")
+
+
+@admin.register(DreamJob)
+class DreamJobAdmin(admin.ModelAdmin):
+    list_display = ("dream", "kind", "status", "attempts", "run_after", "updated_at")
+    list_select_related = ("dream__user",)
+    list_filter = ("kind", "status")
+    search_fields = ("dream__title", "last_error")
+    raw_id_fields = ("dream",)
+
+
+@admin.register(InterpretationCacheEntry)
+class InterpretationCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ("key", "model", "prompt_version", "hits", "created_at", "last_used_at")
+    list_filter = ("model", "prompt_version")
+    search_fields = ("key",)
+    readonly_fields = ("key", "created_at")
+
+
+@admin.register(MonthlyDreamStats)
+class MonthlyDreamStatsAdmin(admin.ModelAdmin):
+    list_display = ("user", "month", "dream_count", "updated_at")
+    list_filter = ("month",)
+    search_fields = ("user__username",)
+    raw_id_fields = ("user",)
+    readonly_fields = ("dream_count", "symbol_counts", "emotion_counts", "mood_counts", "updated_at")
+
+
+@admin.register(FeedItem)
+class FeedItemAdmin(admin.ModelAdmin):
+    list_display = ("title", "author_name", "privacy", "like_count", "comment_count", "created_at")
+    list_filter = ("privacy",)
+    search_fields = ("title", "author_name")
+    raw_id_fields = ("dream", "author")
+    readonly_fields = ("like_count", "comment_count")
+
+
+@admin.register(Like)
+class LikeAdmin(admin.ModelAdmin):
+    list_display = ("feed_item", "user", "created_at")
+    raw_id_fields = ("feed_item", "user")
+
+
+@admin.register(Comment)
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ("feed_item", "author", "created_at")
+    search_fields = ("body", "author__username")
+    raw_id_fields = ("feed_item", "author")
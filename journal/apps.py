@@ -3,3 +3,56 @@ from django.apps import AppConfig
 
 class JournalConfig(AppConfig):
     name = 'journal'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import (
+            m2m_changed,
+            post_delete,
+            post_migrate,
+            post_save,
+            pre_delete,
+            pre_save,
+        )
+
+        from . import models
+        from .instrumentation import install_query_recorder
+        from .services import facets, feed, fragments, similarity, stats
+        from .services.search import ensure_search_triggers
+
+        connection_created.connect(install_query_recorder, dispatch_uid="journal.query_recorder")
+        post_migrate.connect(ensure_search_triggers, sender=self, dispatch_uid="journal.search")
+
+        # Derived data (monthly stats, facets, similarity index, feed and fragment caches)
+        # follows dream writes.
+        for signal, receiver, sender in (
+            (pre_save, stats.entry_pre_save, models.DreamEntry),
+            (post_save, stats.entry_post_save, models.DreamEntry),
+            (pre_delete, stats.entry_pre_delete, models.DreamEntry),
+            (post_delete, stats.entry_post_delete, models.DreamEntry),
+            (post_save, stats.symbol_post_save, models.DreamSymbol),
+            (post_delete, stats.symbol_post_delete, models.DreamSymbol),
+            (post_save, facets.entry_post_save, models.DreamEntry),
+            (pre_save, similarity.entry_pre_save, models.DreamEntry),
+            (post_save, similarity.entry_post_save, models.DreamEntry),
+            (post_delete, similarity.entry_post_delete, models.DreamEntry),
+            (post_save, feed.entry_post_save, models.DreamEntry),
+            (post_delete, feed.item_post_delete, models.FeedItem),
+            (post_save, fragments.entry_changed, models.DreamEntry),
+            (post_delete, fragments.entry_post_delete, models.DreamEntry),
+            (post_save, fragments.related_changed, models.Interpretation),
+            (post_delete, fragments.related_changed, models.Interpretation),
+            (post_save, fragments.related_changed, models.DreamSymbol),
+            (post_delete, fragments.related_changed, models.DreamSymbol),
+            (m2m_changed, fragments.tags_changed, models.DreamEntry.tags.through),
+            (post_save, fragments.tag_changed, models.Tag),
+            (pre_delete, fragments.tag_changed, models.Tag),
+            (post_save, fragments.symbol_changed, models.Symbol),
+            (pre_delete, fragments.symbol_changed, models.Symbol),
+        ):
+            signal.connect(
+                receiver,
+                sender=sender,
+                dispatch_uid=f"{receiver.__module__}.{receiver.__name__}",
+            )
+
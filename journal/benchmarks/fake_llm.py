@@ -0,0 +1,203 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+INTERPRETATION = {
+    "title": "Glass bridge",
+    "psych_summary": "Crossing something fragile suggests a transition you feel unsure about.",
+    "spiritual_summary": "The fox is a guide; trust the quiet path it shows.",
+    "tags": ["transition", "night"],
+    "symbols": ["fox", "bridge", "glass"],
+    "emotions": ["curious", "uneasy"],
+    "people": [],
+    "settings": ["bridge"],
+    "followup_question": "What were you walking towards?",
+}
+CHAT_REPLY = (
+    "The fox often stands for instinct and cleverness. It led you across the bridge, "
+    "so part of you may already know the way through this change. What did the far "
+    "side of the bridge look like?"
+)
+WORD_RE = re.compile(r"\S+\s*")
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """Local OpenAI-compatible stub for benchmarks: Responses API (plain and streamed)
+    and embeddings, with a configurable delay before the first byte and between
+    streamed words.
+    """
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.5,
+        jitter: float = 0.0,
+        token_delay: float = 0.02,
+        seed: int = 0,
+    ):
+        super().__init__((host, port), FakeLLMHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.token_delay = token_delay
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def delay(self) -> float:
+        with self._lock:
+            self.requests += 1
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def start(self) -> "FakeLLMServer":
+        threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def _usage(payload: dict, text: str) -> dict:
+    # Roughly one token per four bytes, so metrics and cost estimates see plausible numbers.
+    input_tokens = len(json.dumps(payload.get("input") or "")) // 4
+    output_tokens = len(text.encode()) // 4
+    return {
+        "input_tokens": input_tokens,
+        "input_tokens_details": {"cached_tokens": 0},
+        "output_tokens": output_tokens,
+        "output_tokens_details": {"reasoning_tokens": 0},
+        "total_tokens": input_tokens + output_tokens,
+    }
+
+
+def _response(text: str, usage: dict | None = None) -> dict:
+    return {
+        "id": "resp_fake",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": "fake-llm",
+        "status": "completed",
+        "output": [
+            {
+                "type": "message",
+                "id": "msg_fake",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }
+        ],
+        "usage": usage,
+    }
+
+
+def _embedding(text: str, dimensions: int) -> list[float]:
+    digest = hashlib.blake2b(text.encode(), digest_size=32).digest()
+    rng = random.Random(digest)
+    return [rng.uniform(-1, 1) for _ in range(dimensions)]
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(self.server.delay())
+        if self.path.rstrip("/").endswith("/embeddings"):
+            self._embeddings(payload)
+        elif self.path.rstrip("/").endswith("/responses"):
+            text = self._reply_text(payload)
+            if payload.get("stream"):
+                self._stream(text, _usage(payload, text))
+            else:
+                self._json(200, _response(text, _usage(payload, text)))
+        else:
+            self._json(404, {"error": {"message": f"Unknown endpoint {self.path}"}})
+
+    @staticmethod
+    def _reply_text(payload: dict) -> str:
+        text_format = (payload.get("text") or {}).get("format") or {}
+        if text_format.get("type") == "json_schema" or "Return JSON only" in (
+            payload.get("instructions") or ""
+        ):
+            return json.dumps(INTERPRETATION)
+        return CHAT_REPLY
+
+    def _embeddings(self, payload: dict) -> None:
+        texts = payload.get("input") or []
+        if isinstance(texts, str):
+            texts = [texts]
+        dimensions = int(payload.get("dimensions") or 256)
+        self._json(
+            200,
+            {
+                "object": "list",
+                "model": payload.get("model", "fake-embedding"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": _embedding(text, dimensions)}
+                    for i, text in enumerate(texts)
+                ],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            },
+        )
+
+    def _json(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, text: str, usage: dict) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        sequence = 0
+
+        def send(event: dict) -> None:
+            nonlocal sequence
+            event["sequence_number"] = sequence
+            sequence += 1
+            self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+            self.wfile.flush()
+
+        send({"type": "response.created", "response": {**_response(""), "status": "in_progress"}})
+        for word in WORD_RE.findall(text):
+            send(
+                {
+                    "type": "response.output_text.delta",
+                    "item_id": "msg_fake",
+                    "output_index": 0,
+                    "content_index": 0,
+                    "delta": word,
+                }
+            )
+            if self.server.token_delay:
+                time.sleep(self.server.token_delay)
+        send({"type": "response.completed", "response": _response(text, usage)})
+
+    def log_message(self, *args):
+        pass
@@ -0,0 +1,174 @@
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import (
+    DreamEntry,
+    DreamMessage,
+    DreamSymbol,
+    FeedItem,
+    Interpretation,
+    Symbol,
+    Tag,
+    UserProfile,
+)
+from ..naming import canonical_name
+from ..services.facets import add_facets
+from ..services.feed import EXCERPT_LENGTH, bump_feed_version
+from ..services.stats import rebuild_stats
+
+BATCH_SIZE = 1000
+WORDS = (
+    "fox river glass city bridge stairs door mirror ocean forest train station key "
+    "house school teacher mother brother falling flying running hiding searching "
+    "storm moon light dark quiet crowded endless narrow golden broken ancient"
+).split()
+TAGS = ["lucid", "recurring", "nightmare", "vivid", "calm", "family", "work", "travel"]
+SYMBOLS = [(word, Symbol.CATEGORY_OBJECT) for word in WORDS[:16]]
+EMOTIONS = ["anxious", "curious", "calm", "afraid", "joyful", "sad", "confused"]
+
+
+@dataclass
+class FixtureSpec:
+    users: int = 1
+    dreams: int = 2000
+    messages: int = 10
+    public_ratio: float = 0.1
+    seed: int = 0
+    prefix: str = "bench"
+
+    def username(self, index: int) -> str:
+        return f"{self.prefix}-{index}"
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _ids(model, names: list[str]) -> list[int]:
+    keys = [canonical_name(name) for name in names]
+    return list(model.objects.filter(key__in=keys).values_list("pk", flat=True))
+
+
+def generate_fixtures(spec: FixtureSpec) -> list:
+    """Create ``spec.users`` users with ``spec.dreams`` dreams each, with tags, symbols,
+    interpretations and ``spec.messages`` chat messages per dream.
+
+    Existing users with the same prefix are deleted first. Rows go in with
+    bulk_create, so post_save receivers do not run: facets are indexed per batch,
+    and monthly stats and the feed are rebuilt at the end.
+    """
+    rng = random.Random(spec.seed)
+    User = get_user_model()
+    User.objects.filter(username__startswith=f"{spec.prefix}-").delete()
+    Tag.objects.bulk_create(
+        [Tag(name=name, key=canonical_name(name)) for name in TAGS], ignore_conflicts=True
+    )
+    Symbol.objects.bulk_create(
+        [
+            Symbol(name=name, key=canonical_name(name), category=category)
+            for name, category in SYMBOLS
+        ],
+        ignore_conflicts=True,
+    )
+    tag_ids = _ids(Tag, TAGS)
+    symbol_ids = _ids(Symbol, [name for name, _ in SYMBOLS])
+    today = timezone.localdate()
+
+    users = []
+    for index in range(spec.users):
+        with transaction.atomic():
+            user = User.objects.create_user(spec.username(index), password=spec.prefix)
+            # Benchmarks measure the server, not the per-user AI throttle.
+            UserProfile.objects.create(user=user, ai_requests_per_minute=0, ai_max_in_flight=0)
+            for start in range(0, spec.dreams, BATCH_SIZE):
+                count = min(BATCH_SIZE, spec.dreams - start)
+                _create_batch(rng, user, count, spec, today, tag_ids, symbol_ids)
+        users.append(user)
+    rebuild_stats(users)
+    bump_feed_version()
+    return users
+
+
+def _create_batch(rng, user, count, spec, today, tag_ids, symbol_ids) -> None:
+    entries = DreamEntry.objects.bulk_create(
+        [
+            DreamEntry(
+                user=user,
+                title=_sentence(rng, 3)[:-1],
+                narrative=" ".join(
+                    _sentence(rng, rng.randint(8, 20)) for _ in range(rng.randint(2, 8))
+                ),
+                date_dreamed=today - timedelta(days=rng.randint(0, 3 * 365)),
+                mood_rating=rng.randint(1, 10),
+                emotions=rng.sample(EMOTIONS, rng.randint(0, 3)),
+                privacy=(
+                    DreamEntry.PRIVACY_PUBLIC
+                    if rng.random() < spec.public_ratio
+                    else DreamEntry.PRIVACY_PRIVATE
+                ),
+            )
+            for _ in range(count)
+        ]
+    )
+    add_facets(entries)
+    tag_through = DreamEntry.tags.through
+    entry_tags = {entry.pk: rng.sample(tag_ids, rng.randint(1, 3)) for entry in entries}
+    tag_through.objects.bulk_create(
+        [
+            tag_through(dreamentry_id=dream_id, tag_id=tag_id)
+            for dream_id, ids in entry_tags.items()
+            for tag_id in ids
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    DreamSymbol.objects.bulk_create(
+        [
+            DreamSymbol(dream_id=entry.pk, symbol_id=symbol_id)
+            for entry in entries
+            for symbol_id in rng.sample(symbol_ids, rng.randint(1, 4))
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    Interpretation.objects.bulk_create(
+        [
+            Interpretation(dream_id=entry.pk, angle=angle, summary=_sentence(rng, 40))
+            for entry in entries
+            for angle in (Interpretation.ANGLE_PSYCH, Interpretation.ANGLE_SPIRITUAL)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    DreamMessage.objects.bulk_create(
+        [
+            DreamMessage(
+                dream_id=entry.pk,
+                role=DreamMessage.ROLE_USER if turn % 2 == 0 else DreamMessage.ROLE_ASSISTANT,
+                content=_sentence(rng, rng.randint(6, 40)),
+            )
+            for entry in entries
+            for turn in range(spec.messages)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    tag_names = dict(Tag.objects.filter(pk__in=tag_ids).values_list("pk", "name"))
+    FeedItem.objects.bulk_create(
+        [
+            FeedItem(
+                dream_id=entry.pk,
+                author=user,
+                author_name=user.get_username(),
+                privacy=entry.privacy,
+                title=entry.title,
+                excerpt=entry.narrative[:EXCERPT_LENGTH],
+                tag_names=sorted(tag_names[pk] for pk in entry_tags[entry.pk]),
+                created_at=entry.created_at,
+            )
+            for entry in entries
+            if entry.privacy == DreamEntry.PRIVACY_PUBLIC
+        ],
+        batch_size=BATCH_SIZE,
+    )
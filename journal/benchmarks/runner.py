@@ -0,0 +1,205 @@
+import asyncio
+import math
+import os
+import platform
+import random
+import secrets
+import statistics
+import subprocess
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from unittest import mock
+
+import django
+import httpx
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from ..models import DreamEntry, DreamMessage
+from ..services.client import clients
+from .fake_llm import FakeLLMServer
+from .scenarios import SCENARIOS, Scenario, Session
+
+REPORT_VERSION = 1
+
+
+@dataclass
+class RunConfig:
+    scenarios: list[str] = field(default_factory=lambda: list(SCENARIOS))
+    requests: int = 200
+    concurrency: int = 10
+    warmup: int = 5
+    seed: int = 0
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    """Nearest-rank percentile; ``values`` must be sorted."""
+    if not values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+def _summary(values: list[float], digits: int = 1) -> dict:
+    values = sorted(values)
+    if not values:
+        return {"p50": None, "p90": None, "p99": None, "max": None, "mean": None}
+    return {
+        "p50": round(percentile(values, 50), digits),
+        "p90": round(percentile(values, 90), digits),
+        "p99": round(percentile(values, 99), digits),
+        "max": round(values[-1], digits),
+        "mean": round(statistics.fmean(values), digits),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            cwd=settings.BASE_DIR,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextmanager
+def fake_llm_settings(llm: FakeLLMServer):
+    with (
+        override_settings(OPENAI_BASE_URL=llm.base_url),
+        mock.patch.dict(os.environ, {"OPENAI_API_KEY": "benchmark"}),
+    ):
+        clients.reset()
+        try:
+            yield
+        finally:
+            clients.reset()
+
+
+def _login(user) -> dict[str, str]:
+    client = Client()
+    client.force_login(user)
+    return {
+        settings.SESSION_COOKIE_NAME: client.cookies[settings.SESSION_COOKIE_NAME].value,
+        settings.CSRF_COOKIE_NAME: secrets.token_hex(16),
+    }
+
+
+async def _run_scenario(scenario: Scenario, sessions: list[Session], config: RunConfig) -> dict:
+    latencies, queries, errors = [], [], 0
+
+    async def one(index: int, record: bool) -> None:
+        nonlocal errors
+        session = sessions[index % len(sessions)]
+        started = time.perf_counter()
+        try:
+            response = await scenario.run(session)
+        except httpx.HTTPError:
+            response = None
+        elapsed = (time.perf_counter() - started) * 1000
+        if not record:
+            return
+        if response is None or response.status_code != scenario.expected_status:
+            errors += 1
+            return
+        latencies.append(elapsed)
+        if "X-Query-Count" in response.headers:
+            queries.append(int(response.headers["X-Query-Count"]))
+
+    for index in range(config.warmup):
+        await one(index, record=False)
+    semaphore = asyncio.Semaphore(config.concurrency)
+
+    async def limited(index: int) -> None:
+        async with semaphore:
+            await one(index, record=True)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(limited(index) for index in range(config.requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "description": scenario.description,
+        "requests": config.requests,
+        "concurrency": config.concurrency,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round((config.requests - errors) / elapsed, 2) if elapsed else None,
+        "latency_ms": _summary(latencies),
+        # Absent when QueryBudgetMiddleware is off (QUERY_BUDGETS_ENABLED=False).
+        "queries": _summary(queries, digits=0) if queries else None,
+    }
+
+
+async def _run_all(config: RunConfig, logins: list[tuple[dict, list[int]]]) -> dict:
+    transport = httpx.ASGITransport(app=get_asgi_application())
+    sessions = [
+        Session(
+            httpx.AsyncClient(
+                transport=transport, base_url="http://localhost", cookies=cookies, timeout=None
+            ),
+            cookies[settings.CSRF_COOKIE_NAME],
+            dream_ids,
+            random.Random(config.seed + index),
+        )
+        for index, (cookies, dream_ids) in enumerate(logins)
+    ]
+    results = {}
+    try:
+        for name in config.scenarios:
+            results[name] = await _run_scenario(SCENARIOS[name], sessions, config)
+    finally:
+        for session in sessions:
+            await session.client.aclose()
+    return results
+
+
+def run_benchmark(config: RunConfig, users: list, llm: FakeLLMServer) -> dict:
+    """Run every scenario in ``config`` against the in-process ASGI app; returns the report."""
+    unknown = set(config.scenarios) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+    logins = [
+        (
+            _login(user),
+            list(
+                DreamEntry.objects.filter(user=user)
+                .order_by("-date_dreamed", "-id")
+                .values_list("pk", flat=True)[:500]
+            ),
+        )
+        for user in users
+    ]
+    with fake_llm_settings(llm):
+        results = asyncio.run(_run_all(config, logins))
+    return {
+        "version": REPORT_VERSION,
+        "meta": {
+            "created_at": timezone.now().isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "fixture": {
+            "users": len(users),
+            "dreams": DreamEntry.objects.filter(user__in=users).count(),
+            "messages": DreamMessage.objects.filter(dream__user__in=users).count(),
+        },
+        "llm": {
+            "latency_s": llm.latency,
+            "jitter_s": llm.jitter,
+            "token_delay_s": llm.token_delay,
+        },
+        "config": asdict(config),
+        "scenarios": results,
+    }
@@ -0,0 +1,85 @@
+import random
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+import httpx
+
+
+@dataclass
+class Session:
+    """One logged-in benchmark user driving the ASGI app."""
+
+    client: httpx.AsyncClient
+    csrf_token: str
+    dream_ids: list[int]
+    rng: random.Random = field(default_factory=random.Random)
+
+    def dream(self) -> int:
+        return self.rng.choice(self.dream_ids)
+
+    async def post(self, path: str, data: dict, htmx: bool = False) -> httpx.Response:
+        headers = {"X-CSRFToken": self.csrf_token}
+        if htmx:
+            headers["HX-Request"] = "true"
+        return await self.client.post(path, data=data, headers=headers)
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    description: str
+    run: Callable[[Session], Awaitable[httpx.Response]]
+    expected_status: int = 200
+
+
+async def _dreams_list(session: Session) -> httpx.Response:
+    return await session.client.get("/dreams/")
+
+
+async def _dreams_search(session: Session) -> httpx.Response:
+    return await session.client.get("/dreams/", params={"q": session.rng.choice(["fox", "river"])})
+
+
+async def _dream_detail(session: Session) -> httpx.Response:
+    return await session.client.get(f"/dreams/{session.dream()}/")
+
+
+async def _community(session: Session) -> httpx.Response:
+    return await session.client.get("/community/")
+
+
+async def _home_post(session: Session) -> httpx.Response:
+    narrative = "I crossed a glass bridge behind a fox while the river sang below."
+    return await session.post("/", {"narrative": narrative}, htmx=True)
+
+
+async def _chat(session: Session) -> httpx.Response:
+    return await session.post(f"/dreams/{session.dream()}/", {"message": "Why a fox?"})
+
+
+async def _chat_stream(session: Session) -> httpx.Response:
+    pk = session.dream()
+    posted = await session.post(f"/dreams/{pk}/", {"message": "Why a bridge?"}, htmx=True)
+    if posted.status_code != 200:
+        return posted
+    message = posted.text.split("chat/stream/?message=", 1)[-1].split('"', 1)[0]
+    async with session.client.stream(
+        "GET", f"/dreams/{pk}/chat/stream/", params={"message": message}
+    ) as response:
+        async for _ in response.aiter_bytes():
+            pass
+    return response
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        Scenario("dreams_list", "First page of the dreams list.", _dreams_list),
+        Scenario("dreams_search", "Full-text search on the dreams list.", _dreams_search),
+        Scenario("dream_detail", "Dream page with tags, symbols and chat.", _dream_detail),
+        Scenario("community", "First page of the community feed.", _community),
+        Scenario("home_post", "HTMX dream submission (enqueues interpretation).", _home_post),
+        Scenario("chat", "Plain chat POST; waits for the full reply.", _chat, 302),
+        Scenario("chat_stream", "HTMX chat POST, then the whole SSE reply.", _chat_stream),
+    )
+}
@@ -1,6 +1,7 @@
 from django import forms
 
-from .models import DreamEntry, Symbol, Tag
+from .models import DreamEntry
+from .services import ingest_dream
 
 
 class DreamEntryForm(forms.ModelForm):
@@ -35,20 +36,10 @@ class DreamEntryForm(forms.ModelForm):
         instance.emotions = self._split_list(self.cleaned_data.get("emotions_input", ""))
         instance.people = self._split_list(self.cleaned_data.get("people_input", ""))
         instance.settings = self._split_list(self.cleaned_data.get("settings_input", ""))
-        if commit:
-            instance.save()
-        tags = self._split_list(self.cleaned_data.get("tags_input", ""))
-        if tags:
-            tag_objs = [Tag.objects.get_or_create(name=name)[0] for name in tags]
-            instance.tags.set(tag_objs)
-        symbols = self._split_list(self.cleaned_data.get("symbols_input", ""))
-        if symbols:
-            symbol_objs = [
-                Symbol.objects.get_or_create(
-                    name=name,
-                    defaults={"category": Symbol.CATEGORY_ABSTRACT},
-                )[0]
-                for name in symbols
-            ]
-            instance.symbols.set(symbol_objs)
-        return instance
+        if not commit:
+            return instance
+        return ingest_dream(
+            instance,
+            tags=self._split_list(self.cleaned_data.get("tags_input", "")),
+            symbols=self._split_list(self.cleaned_data.get("symbols_input", "")),
+        )
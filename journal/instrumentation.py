@@ -0,0 +1,115 @@
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger("journal.queries")
+
+_current_stats: ContextVar["QueryStats | None"] = ContextVar("query_stats", default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration * 1000
+
+
+def query_budget(limit: int):
+    """Declare the maximum number of SQL queries a view may run per request."""
+
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+
+    return decorator
+
+
+def record_query(execute, sql, params, many, context):
+    # Installed on every connection; the context variable follows the request across
+    # sync_to_async threads, so async views are counted too.
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.duration += time.perf_counter() - start
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class QueryBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_BUDGETS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        return self._report(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        return self._report(request, response, stats)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, "query_budget", None)
+
+    def _report(self, request, response, stats: QueryStats):
+        budget = getattr(request, "query_budget", None)
+        response["X-Query-Count"] = str(stats.count)
+        response["X-Query-Time-Ms"] = f"{stats.duration_ms:.1f}"
+        if budget is not None:
+            response["X-Query-Budget"] = str(budget)
+        view_name = getattr(request.resolver_match, "view_name", request.path)
+        if budget is not None and stats.count > budget:
+            message = (
+                f"{request.method} {view_name} ran {stats.count} queries "
+                f"(budget {budget}) in {stats.duration_ms:.1f}ms"
+            )
+            if settings.QUERY_BUDGETS_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        else:
+            logger.info(
+                "%s %s ran %s queries in %.1fms",
+                request.method,
+                view_name,
+                stats.count,
+                stats.duration_ms,
+            )
+        return response
@@ -0,0 +1,170 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from journal.services import interpretations_to_backfill, reinterpret
+from journal.services.ai import INTERPRET_PROMPT_VERSION
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all worker threads."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(start - now)
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-run AI interpretation for dreams stuck on placeholder text or interpreted "
+        "with an older prompt version. Progress is checkpointed so runs can resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--concurrency", type=int, default=4, help="Parallel AI requests.")
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=2.0,
+            help="Maximum AI requests per second (0 for no limit).",
+        )
+        parser.add_argument("--limit", type=int, default=0, help="Stop after this many dreams.")
+        parser.add_argument(
+            "--checkpoint",
+            default="backfill_interpretations.json",
+            help="File that records the last finished dream id and the ids that failed.",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore any saved checkpoint and start from the first dream.",
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = Path(options["checkpoint"])
+        state = self._load_checkpoint(checkpoint, options["restart"])
+        if state["last_pk"]:
+            self.stdout.write(f"Resuming after dream {state['last_pk']}.")
+        if state["failed"]:
+            self.stdout.write(f"Retrying {len(state['failed'])} dream(s) that failed before.")
+        limiter = RateLimiter(options["rate"])
+        concurrency = max(1, options["concurrency"])
+        batch_size = max(1, options["batch_size"])
+        limit = options["limit"]
+        counts = {"succeeded": 0, "failed": 0}
+        failed_pks: list[int] = []
+        retries = list(state["failed"])
+        started = time.monotonic()
+
+        executor = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+        try:
+            while not limit or counts["succeeded"] + counts["failed"] < limit:
+                size = batch_size
+                if limit:
+                    size = min(size, limit - counts["succeeded"] - counts["failed"])
+                candidates = interpretations_to_backfill().order_by("pk")
+                if retries:
+                    retry_pks, retries = retries[:size], retries[size:]
+                    # Dreams fixed or deleted since the last run simply drop out.
+                    batch = list(candidates.filter(pk__in=retry_pks))
+                else:
+                    retry_pks = []
+                    batch = list(candidates.filter(pk__gt=state["last_pk"])[:size])
+                    if not batch:
+                        # The pass is complete; the next run starts over, which also
+                        # reaches the failures and any dream a job worker owned meanwhile.
+                        state.update(last_pk=0, failed=[])
+                        self._save_checkpoint(checkpoint, state)
+                        break
+                task = partial(self._process, limiter=limiter)
+                results = list(executor.map(task, batch) if executor else map(task, batch))
+                for ok in results:
+                    counts["succeeded" if ok else "failed"] += 1
+                newly_failed = [entry.pk for entry, ok in zip(batch, results) if not ok]
+                failed_pks.extend(newly_failed)
+                # Whole batches finish before the checkpoint moves; failures are kept in it
+                # so the next run retries them.
+                state["failed"] = sorted(
+                    {pk for pk in state["failed"] if pk not in retry_pks} | set(newly_failed)
+                )
+                if not retry_pks:
+                    state["last_pk"] = batch[-1].pk
+                self._save_checkpoint(checkpoint, state)
+                self.stdout.write(
+                    f"Processed {counts['succeeded'] + counts['failed']} dream(s) "
+                    f"(last id {state['last_pk']}, {counts['failed']} failed)."
+                )
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted; rerun the command to resume from the checkpoint.")
+        finally:
+            if executor:
+                executor.shutdown(wait=True)
+
+        total = counts["succeeded"] + counts["failed"]
+        elapsed = time.monotonic() - started
+        throughput = total / elapsed if elapsed else 0.0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Backfilled {counts['succeeded']} dream(s), {counts['failed']} error(s) "
+                f"in {elapsed:.1f}s ({throughput:.2f} dreams/s)."
+            )
+        )
+        if failed_pks:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Failed dream ids: {', '.join(map(str, sorted(failed_pks)))}. "
+                    "They are retried on the next run."
+                )
+            )
+
+    def _process(self, entry, limiter: RateLimiter) -> bool:
+        threaded = threading.current_thread() is not threading.main_thread()
+        if threaded:
+            close_old_connections()
+        limiter.wait()
+        try:
+            return reinterpret(entry, full=entry.has_placeholders)
+        except Exception as exc:
+            self.stderr.write(f"Dream {entry.pk}: {exc}")
+            return False
+        finally:
+            if threaded:
+                connection.close()
+
+    @staticmethod
+    def _load_checkpoint(path: Path, restart: bool) -> dict:
+        state = {"prompt_version": INTERPRET_PROMPT_VERSION, "last_pk": 0, "failed": []}
+        if restart or not path.exists():
+            return state
+        try:
+            saved = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return state
+        # A new prompt version makes every dream a candidate again.
+        if saved.get("prompt_version") == INTERPRET_PROMPT_VERSION:
+            state["last_pk"] = int(saved.get("last_pk") or 0)
+            state["failed"] = sorted(int(pk) for pk in saved.get("failed") or [])
+        return state
+
+    @staticmethod
+    def _save_checkpoint(path: Path, state: dict) -> None:
+        tmp = path.with_name(f"{path.name}.tmp")
+        tmp.write_text(json.dumps(state))
+        tmp.replace(path)
@@ -0,0 +1,88 @@
+import json
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from journal.benchmarks.fake_llm import FakeLLMServer
+from journal.benchmarks.fixtures import FixtureSpec, generate_fixtures
+from journal.benchmarks.runner import RunConfig, run_benchmark
+from journal.benchmarks.scenarios import SCENARIOS
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the benchmark scenarios against the in-process ASGI app and a fake LLM, and "
+        "write a JSON report (latency percentiles, throughput, query counts) for diffing "
+        "between releases. Uses bench_fixtures users, creating them if missing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            dest="scenarios",
+            choices=sorted(SCENARIOS),
+            help="Scenario to run (repeatable); all by default.",
+        )
+        parser.add_argument("--requests", type=int, default=200, help="Requests per scenario.")
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--prefix", default="bench", help="Fixture username prefix.")
+        parser.add_argument("--users", type=int, default=1, help="Fixture users to create.")
+        parser.add_argument("--dreams", type=int, default=2000, help="Fixture dreams per user.")
+        parser.add_argument("--messages", type=int, default=10, help="Fixture messages per dream.")
+        parser.add_argument("--latency", type=float, default=0.5, help="Fake LLM delay (s).")
+        parser.add_argument("--jitter", type=float, default=0.0)
+        parser.add_argument("--token-delay", type=float, default=0.02)
+        parser.add_argument("--output", help="Write the report here instead of stdout.")
+
+    def handle(self, *args, **options):
+        users = list(
+            get_user_model()
+            .objects.filter(username__startswith=f"{options['prefix']}-")
+            .order_by("pk")
+        )
+        if not users:
+            self.stderr.write("No fixture users found; generating them.")
+            users = generate_fixtures(
+                FixtureSpec(
+                    users=options["users"],
+                    dreams=options["dreams"],
+                    messages=options["messages"],
+                    seed=options["seed"],
+                    prefix=options["prefix"],
+                )
+            )
+        config = RunConfig(
+            requests=max(1, options["requests"]),
+            concurrency=max(1, options["concurrency"]),
+            warmup=max(0, options["warmup"]),
+            seed=options["seed"],
+        )
+        if options["scenarios"]:
+            config.scenarios = options["scenarios"]
+        llm = FakeLLMServer(
+            latency=options["latency"],
+            jitter=options["jitter"],
+            token_delay=options["token_delay"],
+            seed=options["seed"],
+        )
+        with llm:
+            try:
+                report = run_benchmark(config, users, llm)
+            except ValueError as exc:
+                raise CommandError(str(exc)) from exc
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options["output"]:
+            Path(options["output"]).write_text(output + "\n")
+            for name, result in report["scenarios"].items():
+                latency = result["latency_ms"]
+                self.stdout.write(
+                    f"{name:<14} {result['throughput_rps']:>8} req/s  p50 {latency['p50']} ms  "
+                    f"p99 {latency['p99']} ms  errors {result['errors']}"
+                )
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}."))
+        else:
+            self.stdout.write(output)
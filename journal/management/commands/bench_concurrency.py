@@ -0,0 +1,167 @@
+import asyncio
+import json
+import secrets
+import statistics
+import time
+from contextlib import ExitStack
+
+import httpx
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.decorators import login_required
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.shortcuts import get_object_or_404, redirect
+from django.test import Client, override_settings
+from django.urls import path
+from django.utils import timezone
+
+from journal.benchmarks.fake_llm import FakeLLMServer
+from journal.benchmarks.runner import fake_llm_settings
+from journal.models import DreamEntry, DreamMessage, UserProfile
+from journal.services import AIServiceError, build_chat_context, dream_chat_reply
+from journal.services.client import clients
+
+BENCH_USERNAME = "bench-concurrency"
+
+
+@login_required
+def sync_dream_chat(request, pk: int):
+    # The non-HTMX chat POST as the sync dream_detail view served it before it went
+    # async. Under ASGI Django runs it in a thread of its own per request, and the
+    # blocking provider call holds that thread throughout.
+    entry = get_object_or_404(DreamEntry, pk=pk, user=request.user)
+    message = request.POST.get("message", "").strip()
+    user_message = DreamMessage.objects.create(
+        dream=entry, role=DreamMessage.ROLE_USER, content=message
+    )
+    try:
+        context = build_chat_context(entry, message, before=user_message.pk)
+        reply = dream_chat_reply(context.narrative, context.history, message, context.summary)
+    except AIServiceError as exc:
+        reply = f"AI unavailable: {exc}"
+    DreamMessage.objects.create(dream=entry, role=DreamMessage.ROLE_ASSISTANT, content=reply)
+    return redirect("dream_detail", pk=entry.pk)
+
+
+# ROOT_URLCONF for sync runs; dream_detail is only here so redirect() can reverse it.
+urlpatterns = [path("dreams/<int:pk>/", sync_dream_chat, name="dream_detail")]
+
+
+# Results so far (1 vCPU, SQLite, 1s stub latency, 50 and 200 concurrent requests):
+# the async view shows no throughput gain over the sync one; the gap is within
+# run-to-run noise. Repeat on production-like hardware before claiming one.
+class Command(BaseCommand):
+    help = (
+        "Measure how many concurrent chat requests (non-HTMX POST /dreams/<id>/) one ASGI "
+        "worker sustains against a provider with fixed latency: through the former sync "
+        "view (a thread per request, blocking client) and through the async view."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            default="1,10,50,200",
+            help="Comma-separated numbers of simultaneous requests.",
+        )
+        parser.add_argument("--latency", type=float, default=1.0, help="Provider delay (s).")
+        parser.add_argument(
+            "--mode",
+            choices=["sync", "async", "both"],
+            default="both",
+        )
+        parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        levels = [int(level) for level in options["concurrency"].split(",") if level.strip()]
+        modes = ["sync", "async"] if options["mode"] == "both" else [options["mode"]]
+        user, entries, cookies = self._fixture(max(levels))
+        results = []
+        try:
+            with (
+                FakeLLMServer(latency=options["latency"], token_delay=0) as provider,
+                fake_llm_settings(provider),
+            ):
+                for mode in modes:
+                    for level in levels:
+                        results.append(self._run(mode, level, entries, cookies))
+                        if not options["json"]:
+                            self._print(results[-1])
+        finally:
+            user.delete()
+        if options["json"]:
+            self.stdout.write(json.dumps({"latency": options["latency"], "results": results}))
+
+    def _fixture(self, count: int):
+        get_user_model().objects.filter(username=BENCH_USERNAME).delete()
+        user = get_user_model().objects.create_user(BENCH_USERNAME)
+        # No throttling: the point is to saturate the worker, not the user's bucket.
+        UserProfile.objects.create(user=user, ai_requests_per_minute=0, ai_max_in_flight=0)
+        # One dream per simultaneous request, so no request waits on another's row.
+        entries = DreamEntry.objects.bulk_create(
+            DreamEntry(
+                user=user,
+                title=f"Benchmark {i}",
+                narrative="A fox led me across a glass bridge.",
+                date_dreamed=timezone.localdate(),
+            )
+            for i in range(count)
+        )
+        client = Client()
+        client.force_login(user)
+        csrf = secrets.token_hex(16)
+        cookies = {
+            settings.SESSION_COOKIE_NAME: client.cookies[settings.SESSION_COOKIE_NAME].value,
+            settings.CSRF_COOKIE_NAME: csrf,
+        }
+        return user, entries, cookies
+
+    def _run(self, mode: str, concurrency: int, entries: list[DreamEntry], cookies: dict) -> dict:
+        with ExitStack() as stack:
+            # A pool smaller than the burst would queue requests in both modes alike.
+            stack.enter_context(
+                override_settings(
+                    AI_POOL_MAX_CONNECTIONS=max(settings.AI_POOL_MAX_CONNECTIONS, concurrency),
+                    AI_POOL_MAX_KEEPALIVE=max(settings.AI_POOL_MAX_KEEPALIVE, concurrency),
+                )
+            )
+            if mode == "sync":
+                stack.enter_context(override_settings(ROOT_URLCONF=__name__))
+            clients.reset()
+            return asyncio.run(self._burst(mode, concurrency, entries, cookies))
+
+    async def _burst(self, mode, concurrency, entries, cookies) -> dict:
+        transport = httpx.ASGITransport(app=get_asgi_application())
+        headers = {"X-CSRFToken": cookies[settings.CSRF_COOKIE_NAME]}
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://localhost", cookies=cookies, timeout=None
+        ) as client:
+
+            async def one(entry: DreamEntry) -> tuple[float, int]:
+                started = time.perf_counter()
+                response = await client.post(
+                    f"/dreams/{entry.pk}/", data={"message": "Why a fox?"}, headers=headers
+                )
+                return time.perf_counter() - started, response.status_code
+
+            await one(entries[-1])  # warm up URL resolution, templates and the client
+            started = time.perf_counter()
+            outcomes = await asyncio.gather(*(one(entry) for entry in entries[:concurrency]))
+            elapsed = time.perf_counter() - started
+        latencies = sorted(latency for latency, _ in outcomes)
+        return {
+            "mode": mode,
+            "concurrency": concurrency,
+            "errors": sum(1 for _, status in outcomes if status != 302),
+            "elapsed_s": round(elapsed, 3),
+            "requests_per_s": round(concurrency / elapsed, 2),
+            "p50_ms": round(statistics.median(latencies) * 1000, 1),
+            "max_ms": round(latencies[-1] * 1000, 1),
+        }
+
+    def _print(self, result: dict) -> None:
+        self.stdout.write(
+            f"{result['mode']:>5} x{result['concurrency']:<4} "
+            f"{result['requests_per_s']:>8.2f} req/s  p50 {result['p50_ms']:>8.1f} ms  "
+            f"max {result['max_ms']:>8.1f} ms  errors {result['errors']}"
+        )
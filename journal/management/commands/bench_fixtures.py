@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from journal.benchmarks.fixtures import FixtureSpec, generate_fixtures
+
+
+class Command(BaseCommand):
+    help = (
+        "Create benchmark users with thousands of dreams, chat messages and links. "
+        "Replaces existing users with the same prefix; run against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1)
+        parser.add_argument("--dreams", type=int, default=2000, help="Dreams per user.")
+        parser.add_argument("--messages", type=int, default=10, help="Chat messages per dream.")
+        parser.add_argument("--public-ratio", type=float, default=0.1)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--prefix", default="bench", help="Username prefix.")
+
+    def handle(self, *args, **options):
+        spec = FixtureSpec(
+            users=options["users"],
+            dreams=options["dreams"],
+            messages=options["messages"],
+            public_ratio=options["public_ratio"],
+            seed=options["seed"],
+            prefix=options["prefix"],
+        )
+        users = generate_fixtures(spec)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {len(users)} user(s) with {spec.dreams} dream(s) and "
+                f"{spec.dreams * spec.messages} message(s) each "
+                f"({', '.join(user.get_username() for user in users)})."
+            )
+        )
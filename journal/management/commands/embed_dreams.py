@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from journal.models import DreamEntry
+from journal.services import get_embedding_provider, similarity_index
+
+
+class Command(BaseCommand):
+    help = "Compute embeddings for dreams that have none or were embedded by another provider."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-embed every dream, not only missing or outdated ones.",
+        )
+
+    def handle(self, *args, **options):
+        if not similarity_index.enabled:
+            raise CommandError("NumPy is not installed; similar dreams are disabled.")
+        batch_size = max(1, options["batch_size"])
+        entries = DreamEntry.objects.only("id", "user_id", "title", "narrative", "privacy")
+        if not options["all"]:
+            entries = entries.exclude(embedding__model=get_embedding_provider().name)
+        total = 0
+        last_pk = 0
+        while True:
+            batch = list(entries.filter(pk__gt=last_pk).order_by("pk")[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                similarity_index.index(batch)
+            total += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f"Embedded {total} dream(s)...")
+        provider = get_embedding_provider().name
+        self.stdout.write(self.style.SUCCESS(f"Embedded {total} dream(s) with {provider}."))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from journal.benchmarks.fake_llm import FakeLLMServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a fake OpenAI-compatible API for load tests against a running server. "
+        "Point OPENAI_BASE_URL at the printed URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--latency", type=float, default=0.5, help="Seconds before replying.")
+        parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- seconds.")
+        parser.add_argument(
+            "--token-delay",
+            type=float,
+            default=0.02,
+            help="Seconds between streamed words.",
+        )
+
+    def handle(self, *args, **options):
+        server = FakeLLMServer(
+            options["host"],
+            options["port"],
+            latency=options["latency"],
+            jitter=options["jitter"],
+            token_delay=options["token_delay"],
+        )
+        self.stdout.write(f"Fake LLM listening on {server.base_url} (Ctrl+C to stop).")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
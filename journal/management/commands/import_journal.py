@@ -0,0 +1,39 @@
+import sys
+import zipfile
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from journal.services import JournalImportError, archive_lines, import_journal
+
+
+class Command(BaseCommand):
+    help = (
+        "Add the dreams from a journal export (.ndjson or .zip, or NDJSON on stdin "
+        "with '-') to a user's journal, in batches of --batch-size dreams per transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("path", help="Export file, or - for NDJSON on stdin.")
+        parser.add_argument("--batch-size", type=int, help="Defaults to IMPORT_BATCH_SIZE.")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get_by_natural_key(options["username"])
+        except get_user_model().DoesNotExist as exc:
+            raise CommandError(f"No user named {options['username']!r}.") from exc
+        try:
+            if options["path"] == "-":
+                result = import_journal(user, sys.stdin.buffer, options["batch_size"])
+            else:
+                with open(options["path"], "rb") as stream:
+                    result = import_journal(user, archive_lines(stream), options["batch_size"])
+        except (OSError, JournalImportError, zipfile.BadZipFile) as exc:
+            raise CommandError(str(exc)) from exc
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {result.dreams} dream(s), {result.interpretations} "
+                f"interpretation(s) and {result.messages} message(s) for {user.get_username()}."
+            )
+        )
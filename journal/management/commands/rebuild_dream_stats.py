@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from journal.services import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the monthly dream stats used by the quick-stats panel."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            action="append",
+            dest="usernames",
+            help="Only rebuild stats for this username (repeatable).",
+        )
+
+    def handle(self, *args, **options):
+        users = None
+        if options["usernames"]:
+            User = get_user_model()
+            users = list(User.objects.filter(**{f"{User.USERNAME_FIELD}__in": options["usernames"]}))
+            missing = set(options["usernames"]) - {user.get_username() for user in users}
+            if missing:
+                raise CommandError(f"Unknown user(s): {', '.join(sorted(missing))}")
+        rows = rebuild_stats(users)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} monthly stats row(s)."))
@@ -0,0 +1,82 @@
+import os
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from journal.services import claim_job, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Process queued dream interpretation jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.JOB_WORKER_CONCURRENCY,
+            help="Number of worker threads.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.JOB_POLL_INTERVAL,
+            help="Seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the queue and exit instead of polling forever.",
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options["concurrency"])
+        poll_interval = options["poll_interval"]
+        once = options["once"]
+        stop = threading.Event()
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+        requeue_stale_jobs()
+        threads = [
+            threading.Thread(
+                target=self._work,
+                args=(f"{prefix}:{index}", stop, poll_interval, once),
+                daemon=True,
+            )
+            for index in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Started {concurrency} job worker(s).")
+
+        try:
+            ticks = 0
+            while any(thread.is_alive() for thread in threads):
+                stop.wait(poll_interval)
+                ticks += 1
+                if ticks % 30 == 0:
+                    requeue_stale_jobs()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping after current jobs finish...")
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            connection.close()
+        self.stdout.write(self.style.SUCCESS("Job workers stopped."))
+
+    def _work(self, worker_id, stop, poll_interval, once):
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                job = claim_job(worker_id)
+                if job is None:
+                    if once:
+                        return
+                    stop.wait(poll_interval)
+                    continue
+                run_job(job)
+        finally:
+            connection.close()
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.2 on 2026-10-18 08:03
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0002_dreammessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dreamentry',
+            name='job_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', max_length=16),
+        ),
+        migrations.CreateModel(
+            name='DreamJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('interpret', 'Interpretation')], default='interpret', max_length=16)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=16)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_by', models.CharField(blank=True, max_length=120)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('dream', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='journal.dreamentry')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='journal_dre_status_b9350c_idx')],
+            },
+        ),
+    ]
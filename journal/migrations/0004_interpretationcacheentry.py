@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-18 08:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0003_dreamjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InterpretationCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('model', models.CharField(max_length=80)),
+                ('prompt_version', models.CharField(max_length=32)),
+                ('payload', models.JSONField(default=dict)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['last_used_at'], name='journal_int_last_us_dc4894_idx'), models.Index(fields=['created_at'], name='journal_int_created_c1f6e1_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,91 @@
+from django.db import migrations
+
+FTS_TABLE = "journal_dreamentry_fts"
+
+SQLITE_FORWARD = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, narrative, content='journal_dreamentry', content_rowid='id'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON journal_dreamentry BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, narrative)
+        VALUES (new.id, new.title, new.narrative);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON journal_dreamentry BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, narrative)
+        VALUES ('delete', old.id, old.title, old.narrative);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF title, narrative ON journal_dreamentry BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, narrative)
+        VALUES ('delete', old.id, old.title, old.narrative);
+        INSERT INTO {FTS_TABLE}(rowid, title, narrative)
+        VALUES (new.id, new.title, new.narrative);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE journal_dreamentry ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(narrative, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX journal_dreamentry_search_gin ON journal_dreamentry USING gin (search_vector)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS journal_dreamentry_search_gin",
+    "ALTER TABLE journal_dreamentry DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def forwards(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        _run(schema_editor, POSTGRES_FORWARD)
+    elif vendor == "sqlite":
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("PRAGMA compile_options")
+            if "ENABLE_FTS5" not in {row[0] for row in cursor.fetchall()}:
+                return
+        _run(schema_editor, SQLITE_FORWARD)
+
+
+def backwards(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        _run(schema_editor, POSTGRES_BACKWARD)
+    elif vendor == "sqlite":
+        _run(schema_editor, SQLITE_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0004_interpretationcacheentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
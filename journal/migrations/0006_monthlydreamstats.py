@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0005_dreamentry_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyDreamStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('dream_count', models.PositiveIntegerField(default=0)),
+                ('symbol_counts', models.JSONField(blank=True, default=dict)),
+                ('emotion_counts', models.JSONField(blank=True, default=dict)),
+                ('mood_counts', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'monthly dream stats',
+                'unique_together': {('user', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0006_monthlydreamstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DreamEmbedding',
+            fields=[
+                ('dream', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='embedding', serialize=False, to='journal.dreamentry')),
+                ('model', models.CharField(max_length=80)),
+                ('dimensions', models.PositiveSmallIntegerField()),
+                ('vector', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0007_dreamembedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dreamentry',
+            name='chat_summary',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='dreamentry',
+            name='chat_summary_until',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='dreamentry',
+            name='condensed_narrative',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='dreamentry',
+            name='condensed_narrative_key',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def publish_existing_dreams(apps, schema_editor):
+    DreamEntry = apps.get_model("journal", "DreamEntry")
+    FeedItem = apps.get_model("journal", "FeedItem")
+    items = []
+    public = DreamEntry.objects.filter(privacy="public").select_related("user")
+    for entry in public.prefetch_related("tags").iterator(chunk_size=500):
+        items.append(
+            FeedItem(
+                dream_id=entry.pk,
+                author_id=entry.user_id,
+                author_name=entry.user.username,
+                privacy=entry.privacy,
+                title=entry.title,
+                excerpt=entry.narrative[:280],
+                tag_names=sorted(tag.name for tag in entry.tags.all()),
+                created_at=entry.created_at,
+            )
+        )
+    FeedItem.objects.bulk_create(items, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0008_dreamentry_chat_context'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author_name', models.CharField(max_length=150)),
+                ('privacy', models.CharField(choices=[('private', 'Private'), ('unlisted', 'Unlisted'), ('public', 'Public')], max_length=16)),
+                ('title', models.CharField(max_length=160)),
+                ('excerpt', models.TextField()),
+                ('tag_names', models.JSONField(blank=True, default=list)),
+                ('like_count', models.PositiveIntegerField(default=0)),
+                ('comment_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to=settings.AUTH_USER_MODEL)),
+                ('dream', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='feed_item', to='journal.dreamentry')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Comment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('body', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_comments', to=settings.AUTH_USER_MODEL)),
+                ('feed_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='journal.feeditem')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Like',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('feed_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='journal.feeditem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_likes', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['privacy', 'created_at', 'id'], name='journal_fee_privacy_b40490_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['feed_item', 'created_at'], name='journal_com_feed_it_db80b4_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='like',
+            unique_together={('feed_item', 'user')},
+        ),
+        migrations.RunPython(publish_existing_dreams, migrations.RunPython.noop),
+    ]
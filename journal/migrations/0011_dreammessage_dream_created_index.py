@@ -0,0 +1,27 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0010_userprofile_ai_limits'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='dreammessage',
+            options={'ordering': ['created_at', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='dreammessage',
+            index=models.Index(fields=['dream', 'created_at', 'id'], name='journal_dre_dream_i_f1c1cd_idx'),
+        ),
+        migrations.AlterField(
+            model_name='dreammessage',
+            name='dream',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='journal.dreamentry'),
+        ),
+    ]
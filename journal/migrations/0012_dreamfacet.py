@@ -0,0 +1,55 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+FACET_FIELDS = {"emotion": "emotions", "person": "people", "setting": "settings"}
+
+
+def _values(raw) -> list[str]:
+    values = (str(value).strip().casefold()[:120] for value in raw or [])
+    return [value for value in dict.fromkeys(values) if value]
+
+
+def index_existing_facets(apps, schema_editor):
+    DreamEntry = apps.get_model("journal", "DreamEntry")
+    DreamFacet = apps.get_model("journal", "DreamFacet")
+    facets = []
+    entries = DreamEntry.objects.only("user_id", *FACET_FIELDS.values())
+    for entry in entries.iterator(chunk_size=500):
+        facets += [
+            DreamFacet(dream_id=entry.pk, user_id=entry.user_id, kind=kind, value=value)
+            for kind, field in FACET_FIELDS.items()
+            for value in _values(getattr(entry, field))
+        ]
+        if len(facets) >= 500:
+            DreamFacet.objects.bulk_create(facets)
+            facets = []
+    DreamFacet.objects.bulk_create(facets)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0011_dreammessage_dream_created_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DreamFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('emotion', 'Emotion'), ('person', 'Person'), ('setting', 'Setting')], max_length=16)),
+                ('value', models.CharField(max_length=120)),
+                ('dream', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='journal.dreamentry')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='dream_facets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'kind', 'value', 'dream'], name='journal_dre_user_id_22a398_idx')],
+                'unique_together': {('dream', 'kind', 'value')},
+            },
+        ),
+        migrations.RunPython(index_existing_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,153 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:05
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Frozen copy of journal.naming.canonical_name as of this migration.
+SPACE_RE = re.compile(r"\s+")
+IRREGULAR_PLURALS = {
+    "buses": "bus", "gases": "gas", "lenses": "lens", "viruses": "virus", "irises": "iris",
+    "teeth": "tooth", "feet": "foot", "mice": "mouse", "geese": "goose", "men": "man",
+    "women": "woman", "children": "child", "wolves": "wolf", "knives": "knife",
+    "wives": "wife", "shelves": "shelf", "thieves": "thief", "heroes": "hero",
+    "potatoes": "potato", "tomatoes": "tomato", "echoes": "echo", "butterflies": "butterfly",
+    "spies": "spy", "flies": "fly", "stories": "story", "cities": "city", "babies": "baby",
+    "bodies": "body", "parties": "party", "enemies": "enemy", "families": "family",
+    "ladies": "lady", "puppies": "puppy", "bunnies": "bunny", "candies": "candy",
+    "skies": "sky",
+}
+INVARIANT_WORDS = frozenset(
+    {
+        "news", "series", "species", "means", "lens", "canvas", "atlas", "bias", "physics",
+        "glasses", "clothes", "pants", "trousers", "jeans", "shorts", "scissors", "woods",
+        "arms", "goods", "savings", "outskirts", "thanks",
+    }
+)
+E_SINGULARS = frozenset(
+    {
+        "ache", "zombie", "movie", "cookie", "hoodie", "selfie", "rookie", "genie", "pixie",
+        "prairie", "calorie", "brownie", "hippie", "smoothie", "niche", "avalanche",
+        "quiche", "psyche", "cliche", "brioche", "tie", "pie", "lie",
+    }
+)
+ACHE_PLURAL_RE = re.compile(r"[^aeiou]aches$")
+ES_PLURAL_ENDINGS = ("sses", "shes", "ches", "xes", "zzes")
+KEEP_ENDINGS = ("ss", "us", "is", "os", "as", "ies", "oes", "ves")
+
+
+def _singular(word):
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if len(word) <= 3 or word in INVARIANT_WORDS or not word.endswith("s"):
+        return word
+    if word[:-1] in E_SINGULARS or ACHE_PLURAL_RE.search(word):
+        return word[:-1]
+    if word.endswith(KEEP_ENDINGS):
+        return word
+    if word.endswith(ES_PLURAL_ENDINGS) and len(word) > 4:
+        return word[:-2]
+    return word[:-1]
+
+
+def canonical_name(name):
+    text = unicodedata.normalize("NFKD", name.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = SPACE_RE.sub(" ", text).strip(" \t.,;:!?'\"()[]{}-_/")
+    if not text:
+        return SPACE_RE.sub(" ", name.casefold()).strip()
+    head, _, last = text.rpartition(" ")
+    return f"{head} {_singular(last)}" if head else _singular(last)
+
+
+def _merge(model, max_length, relink):
+    """Give every row its key; rows sharing one are folded into the oldest.
+
+    Folded rows are deleted, so each merge is reported.
+    """
+    keep = {}
+    for row in model.objects.order_by("pk").only("name"):
+        key = canonical_name(row.name)[:max_length]
+        if key in keep:
+            kept_pk, kept_name = keep[key]
+            relink(row.pk, kept_pk)
+            row.delete()
+            print(f"\n  Merged {model.__name__.lower()} {row.name!r} into {kept_name!r}", end="")
+        else:
+            keep[key] = row.pk, row.name
+            model.objects.filter(pk=row.pk).update(key=key)
+
+
+def fill_keys(apps, schema_editor):
+    Tag = apps.get_model("journal", "Tag")
+    Symbol = apps.get_model("journal", "Symbol")
+    DreamEntry = apps.get_model("journal", "DreamEntry")
+    DreamSymbol = apps.get_model("journal", "DreamSymbol")
+    MonthlyDreamStats = apps.get_model("journal", "MonthlyDreamStats")
+    FeedItem = apps.get_model("journal", "FeedItem")
+    TagLink = DreamEntry.tags.through
+    retagged, resymboled = set(), set()
+
+    def relink_tag(old, new):
+        moved = TagLink.objects.filter(tag_id=old).values_list("dreamentry_id", flat=True)
+        retagged.update(moved)
+        tagged = TagLink.objects.filter(tag_id=new).values("dreamentry_id")
+        TagLink.objects.filter(tag_id=old, dreamentry_id__in=tagged).delete()
+        TagLink.objects.filter(tag_id=old).update(tag_id=new)
+
+    def relink_symbol(old, new):
+        resymboled.update(
+            DreamSymbol.objects.filter(symbol_id=old).values_list("dream_id", flat=True)
+        )
+        linked = DreamSymbol.objects.filter(symbol_id=new).values("dream_id")
+        DreamSymbol.objects.filter(symbol_id=old, dream_id__in=linked).delete()
+        DreamSymbol.objects.filter(symbol_id=old).update(symbol_id=new)
+        # Monthly stats count symbols by id; move the duplicate's counts over.
+        old_key, new_key = str(old), str(new)
+        for stats in MonthlyDreamStats.objects.filter(symbol_counts__has_key=old_key):
+            counts = stats.symbol_counts
+            counts[new_key] = counts.get(new_key, 0) + counts.pop(old_key)
+            stats.save(update_fields=["symbol_counts"])
+
+    _merge(Tag, 64, relink_tag)
+    _merge(Symbol, 120, relink_symbol)
+
+    # Feed items copy tag names; drop the spellings that were merged away.
+    names = {}
+    for dream_id, name in TagLink.objects.filter(dreamentry_id__in=retagged).values_list(
+        "dreamentry_id", "tag__name"
+    ):
+        names.setdefault(dream_id, []).append(name)
+    for item in FeedItem.objects.filter(dream_id__in=retagged).only("dream_id"):
+        item.tag_names = sorted(names.get(item.dream_id, []))
+        item.save(update_fields=["tag_names"])
+    # Cached dream fragments are keyed on updated_at; move it so none keep showing a
+    # spelling that was merged away.
+    DreamEntry.objects.filter(pk__in=retagged | resymboled).update(updated_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0012_dreamfacet'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='key',
+            field=models.CharField(default='', max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='symbol',
+            name='key',
+            field=models.CharField(default='', max_length=120),
+            preserve_default=False,
+        ),
+        # Unique only in 0014: PostgreSQL cannot ALTER a table with the deferred
+        # foreign-key checks this merge leaves pending in the same transaction.
+        migrations.RunPython(fill_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:06
+
+from django.db import migrations, models
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX journal_tag_key_trgm ON journal_tag USING gin (key gin_trgm_ops)",
+    "CREATE INDEX journal_symbol_key_trgm ON journal_symbol USING gin (key gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS journal_tag_key_trgm",
+    "DROP INDEX IF EXISTS journal_symbol_key_trgm",
+]
+
+
+def _run(schema_editor, statements):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def trigram_indexes(apps, schema_editor):
+    _run(schema_editor, POSTGRES_FORWARD)
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    _run(schema_editor, POSTGRES_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0013_tag_symbol_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tag',
+            name='key',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='symbol',
+            name='key',
+            field=models.CharField(max_length=120, unique=True),
+        ),
+        migrations.RunPython(trigram_indexes, drop_trigram_indexes),
+    ]
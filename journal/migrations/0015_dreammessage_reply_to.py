@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0014_tag_symbol_key_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dreammessage',
+            name='reply_to',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='replies', to='journal.dreammessage'),
+        ),
+    ]
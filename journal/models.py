@@ -1,5 +1,8 @@
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+from .naming import canonical_name
 
 
 class UserProfile(models.Model):
@@ -38,6 +41,10 @@ class UserProfile(models.Model):
         choices=PRIVACY_CHOICES,
         default=PRIVACY_PRIVATE,
     )
+    # Per-user AI limits; empty fields use the AI_THROTTLE_* settings.
+    ai_requests_per_minute = models.FloatField(null=True, blank=True)
+    ai_burst = models.PositiveSmallIntegerField(null=True, blank=True)
+    ai_max_in_flight = models.PositiveSmallIntegerField(null=True, blank=True)
 
     def __str__(self) -> str:
         return self.display_name or self.user.get_username()
@@ -45,10 +52,16 @@ class UserProfile(models.Model):
 
 class Tag(models.Model):
     name = models.CharField(max_length=64, unique=True)
+    # canonical_name(name); near-duplicates share it, so only one of them can exist.
+    key = models.CharField(max_length=64, unique=True)
 
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.key = canonical_name(self.name)[:64]
+        super().save(*args, **kwargs)
+
 
 class Symbol(models.Model):
     CATEGORY_ANIMAL = "animal"
@@ -67,12 +80,17 @@ class Symbol(models.Model):
     ]
 
     name = models.CharField(max_length=120, unique=True)
+    key = models.CharField(max_length=120, unique=True)
     category = models.CharField(max_length=16, choices=CATEGORY_CHOICES)
     description = models.TextField(blank=True)
 
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.key = canonical_name(self.name)[:120]
+        super().save(*args, **kwargs)
+
 
 class DreamEntry(models.Model):
     PRIVACY_PRIVATE = "private"
@@ -84,6 +102,17 @@ class DreamEntry(models.Model):
         (PRIVACY_PUBLIC, "Public"),
     ]
 
+    JOB_PENDING = "pending"
+    JOB_PROCESSING = "processing"
+    JOB_READY = "ready"
+    JOB_FAILED = "failed"
+    JOB_STATUS_CHOICES = [
+        (JOB_PENDING, "Pending"),
+        (JOB_PROCESSING, "Processing"),
+        (JOB_READY, "Ready"),
+        (JOB_FAILED, "Failed"),
+    ]
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -103,12 +132,22 @@ class DreamEntry(models.Model):
         choices=PRIVACY_CHOICES,
         default=PRIVACY_PRIVATE,
     )
+    job_status = models.CharField(
+        max_length=16,
+        choices=JOB_STATUS_CHOICES,
+        default=JOB_READY,
+    )
     tags = models.ManyToManyField(Tag, blank=True, related_name="dreams")
     symbols = models.ManyToManyField(
         Symbol,
         through="DreamSymbol",
         related_name="dreams",
     )
+    # Chat context caches (see journal.services.ai.build_chat_context).
+    condensed_narrative = models.TextField(blank=True)
+    condensed_narrative_key = models.CharField(max_length=64, blank=True)
+    chat_summary = models.TextField(blank=True)
+    chat_summary_until = models.PositiveBigIntegerField(blank=True, null=True)
 
     class Meta:
         indexes = [
@@ -119,6 +158,10 @@ class DreamEntry(models.Model):
     def __str__(self) -> str:
         return f"{self.title} ({self.user.get_username()})"
 
+    @property
+    def is_pending(self) -> bool:
+        return self.job_status in (self.JOB_PENDING, self.JOB_PROCESSING)
+
 
 class DreamSymbol(models.Model):
     dream = models.ForeignKey(
@@ -141,6 +184,45 @@ class DreamSymbol(models.Model):
         return f"{self.symbol.name} in {self.dream.title}"
 
 
+class DreamFacet(models.Model):
+    # One row per normalized emotion, person or setting in a dream's JSON lists, so
+    # filters and sidebar counts use an index; kept in sync by services.facets.
+    KIND_EMOTION = "emotion"
+    KIND_PERSON = "person"
+    KIND_SETTING = "setting"
+    KIND_CHOICES = [
+        (KIND_EMOTION, "Emotion"),
+        (KIND_PERSON, "Person"),
+        (KIND_SETTING, "Setting"),
+    ]
+
+    dream = models.ForeignKey(
+        DreamEntry,
+        on_delete=models.CASCADE,
+        related_name="facets",
+        # Covered by unique_together below.
+        db_index=False,
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="dream_facets",
+        # Covered by the (user, kind, value, dream) index below.
+        db_index=False,
+    )
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    value = models.CharField(max_length=120)
+
+    class Meta:
+        unique_together = ("dream", "kind", "value")
+        indexes = [
+            models.Index(fields=["user", "kind", "value", "dream"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind}: {self.value}"
+
+
 class Interpretation(models.Model):
     ANGLE_PSYCH = "psych"
     ANGLE_SPIRITUAL = "spiritual"
@@ -193,13 +275,218 @@ class DreamMessage(models.Model):
         DreamEntry,
         on_delete=models.CASCADE,
         related_name="messages",
+        # Covered by the (dream, created_at, id) index below.
+        db_index=False,
     )
     role = models.CharField(max_length=16, choices=ROLE_CHOICES)
     content = models.TextField()
+    # The user message an assistant message answers; a user message is answered once.
+    # No constraint: both go together when a dream is deleted, which stays a fast delete.
+    reply_to = models.ForeignKey(
+        "self",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="replies",
+        blank=True,
+        null=True,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ["created_at"]
+        ordering = ["created_at", "id"]
+        indexes = [
+            models.Index(fields=["dream", "created_at", "id"]),
+        ]
 
     def __str__(self) -> str:
         return f"{self.get_role_display()} message for {self.dream.title}"
+
+
+class DreamJob(models.Model):
+    KIND_INTERPRET = "interpret"
+    KIND_CHOICES = [
+        (KIND_INTERPRET, "Interpretation"),
+    ]
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    dream = models.ForeignKey(
+        DreamEntry,
+        on_delete=models.CASCADE,
+        related_name="jobs",
+    )
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES, default=KIND_INTERPRET)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=120, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.get_kind_display()} job for {self.dream.title} ({self.status})"
+
+
+class InterpretationCacheEntry(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    model = models.CharField(max_length=80)
+    prompt_version = models.CharField(max_length=32)
+    payload = models.JSONField(default=dict)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["last_used_at"]),
+            models.Index(fields=["created_at"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.key[:12]} ({self.model}, {self.prompt_version})"
+
+
+class MonthlyDreamStats(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="monthly_stats",
+    )
+    month = models.DateField()
+    dream_count = models.PositiveIntegerField(default=0)
+    symbol_counts = models.JSONField(default=dict, blank=True)
+    emotion_counts = models.JSONField(default=dict, blank=True)
+    mood_counts = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("user", "month")
+        verbose_name_plural = "monthly dream stats"
+
+    def __str__(self) -> str:
+        return f"{self.user.get_username()} {self.month:%Y-%m}"
+
+    @staticmethod
+    def _top(counts: dict[str, int]) -> str | None:
+        # Ties go to the smallest key so the panel does not flicker between values.
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[0][0] if ranked and ranked[0][1] > 0 else None
+
+    @property
+    def top_symbol_id(self) -> int | None:
+        top = self._top(self.symbol_counts)
+        return int(top) if top else None
+
+    @property
+    def top_emotion(self) -> str | None:
+        return self._top(self.emotion_counts)
+
+    @property
+    def top_mood(self) -> int | None:
+        top = self._top(self.mood_counts)
+        return int(top) if top else None
+
+
+class DreamEmbedding(models.Model):
+    dream = models.OneToOneField(
+        DreamEntry,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="embedding",
+    )
+    model = models.CharField(max_length=80)
+    dimensions = models.PositiveSmallIntegerField()
+    vector = models.BinaryField()  # little-endian float32, L2-normalised
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.model} embedding for dream {self.dream_id}"
+
+
+class FeedItem(models.Model):
+    # A public dream as the community feed shows it; refreshed by services.feed.
+    dream = models.OneToOneField(
+        DreamEntry,
+        on_delete=models.CASCADE,
+        related_name="feed_item",
+    )
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="feed_items",
+    )
+    author_name = models.CharField(max_length=150)
+    privacy = models.CharField(max_length=16, choices=DreamEntry.PRIVACY_CHOICES)
+    title = models.CharField(max_length=160)
+    excerpt = models.TextField()
+    tag_names = models.JSONField(default=list, blank=True)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["privacy", "created_at", "id"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.title} by {self.author_name}"
+
+
+class Like(models.Model):
+    feed_item = models.ForeignKey(
+        FeedItem,
+        on_delete=models.CASCADE,
+        related_name="likes",
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="feed_likes",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("feed_item", "user")
+
+    def __str__(self) -> str:
+        return f"{self.user.get_username()} likes {self.feed_item.title}"
+
+
+class Comment(models.Model):
+    feed_item = models.ForeignKey(
+        FeedItem,
+        on_delete=models.CASCADE,
+        related_name="comments",
+    )
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="feed_comments",
+    )
+    body = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["feed_item", "created_at"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"Comment by {self.author.get_username()} on {self.feed_item.title}"
@@ -0,0 +1,70 @@
+import re
+import unicodedata
+
+SPACE_RE = re.compile(r"\s+")
+# Only plurals that cannot be mistaken for another word are folded. Anything unsure
+# keeps its plural: a missed merge costs a duplicate row, a wrong one merges two
+# different tags and cannot be undone.
+IRREGULAR_PLURALS = {
+    "buses": "bus", "gases": "gas", "lenses": "lens", "viruses": "virus", "irises": "iris",
+    "teeth": "tooth", "feet": "foot", "mice": "mouse", "geese": "goose", "men": "man",
+    "women": "woman", "children": "child", "wolves": "wolf", "knives": "knife",
+    "wives": "wife", "shelves": "shelf", "thieves": "thief", "heroes": "hero",
+    "potatoes": "potato", "tomatoes": "tomato", "echoes": "echo", "butterflies": "butterfly",
+    "spies": "spy", "flies": "fly", "stories": "story", "cities": "city", "babies": "baby",
+    "bodies": "body", "parties": "party", "enemies": "enemy", "families": "family",
+    "ladies": "lady", "puppies": "puppy", "bunnies": "bunny", "candies": "candy",
+    "skies": "sky",
+}
+# Already singular, the same in both numbers, or a different thing from the singular.
+INVARIANT_WORDS = frozenset(
+    {
+        "news", "series", "species", "means", "lens", "canvas", "atlas", "bias", "physics",
+        "glasses", "clothes", "pants", "trousers", "jeans", "shorts", "scissors", "woods",
+        "arms", "goods", "savings", "outskirts", "thanks",
+    }
+)
+# Singulars ending in -ie or -che, whose plural only adds an "s".
+E_SINGULARS = frozenset(
+    {
+        "ache", "zombie", "movie", "cookie", "hoodie", "selfie", "rookie", "genie", "pixie",
+        "prairie", "calorie", "brownie", "hippie", "smoothie", "niche", "avalanche",
+        "quiche", "psyche", "cliche", "brioche", "tie", "pie", "lie",
+    }
+)
+# headaches, toothaches, caches, moustaches; but beaches, coaches, reaches.
+ACHE_PLURAL_RE = re.compile(r"[^aeiou]aches$")
+# Plurals adding "es" after a hiss: boxes, beaches, dishes, kisses.
+ES_PLURAL_ENDINGS = ("sses", "shes", "ches", "xes", "zzes")
+# Words ending in these are left alone: singulars (glass, cactus, iris, chaos, Texas)
+# and plurals whose singular cannot be told from the spelling (-ies, -oes, -ves).
+KEEP_ENDINGS = ("ss", "us", "is", "os", "as", "ies", "oes", "ves")
+
+
+def _singular(word: str) -> str:
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if len(word) <= 3 or word in INVARIANT_WORDS or not word.endswith("s"):
+        return word
+    if word[:-1] in E_SINGULARS or ACHE_PLURAL_RE.search(word):
+        return word[:-1]
+    if word.endswith(KEEP_ENDINGS):
+        return word
+    if word.endswith(ES_PLURAL_ENDINGS) and len(word) > 4:
+        return word[:-2]
+    return word[:-1]
+
+
+def canonical_name(name: str) -> str:
+    """Key that near-duplicate tag and symbol names share: "Snakes " and "snake" match.
+
+    Case, accents, surrounding punctuation, runs of whitespace and an unambiguous
+    plural final word are folded away.
+    """
+    text = unicodedata.normalize("NFKD", name.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = SPACE_RE.sub(" ", text).strip(" \t.,;:!?'\"()[]{}-_/")
+    if not text:
+        return SPACE_RE.sub(" ", name.casefold()).strip()
+    head, _, last = text.rpartition(" ")
+    return f"{head} {_singular(last)}" if head else _singular(last)
@@ -0,0 +1,109 @@
+import base64
+import json
+from dataclasses import dataclass
+from typing import Any
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connection
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+
+@dataclass
+class KeysetPage:
+    object_list: list[Any]
+    next_cursor: str | None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+
+class KeysetPaginator:
+    """Cursor pagination over a unique ordering such as ("-date_dreamed", "-id").
+
+    Each page is a range scan that starts right after the last row of the previous
+    page, so deep pages cost the same as the first one (unlike OFFSET).
+    """
+
+    def __init__(self, queryset: QuerySet, ordering: tuple[str, ...], page_size: int = 20):
+        self.queryset = queryset
+        self.ordering = ordering
+        self.page_size = page_size
+        self.fields = [name.lstrip("-") for name in ordering]
+
+    def _encode(self, obj: Any) -> str:
+        values = [str(getattr(obj, name)) for name in self.fields]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+    def _decode(self, cursor: str) -> list[Any] | None:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if not isinstance(raw, list) or len(raw) != len(self.fields):
+                return None
+            opts = self.queryset.model._meta
+            return [opts.get_field(name).to_python(value) for name, value in zip(self.fields, raw)]
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def _after(self, values: list[Any]) -> Q:
+        condition = Q()
+        for index, name in enumerate(self.ordering):
+            field = name.lstrip("-")
+            lookup = "lt" if name.startswith("-") else "gt"
+            prefix = Q(**{f: v for f, v in zip(self.fields[:index], values[:index])})
+            condition |= prefix & Q(**{f"{field}__{lookup}": values[index]})
+        return condition
+
+    def page(self, cursor: str | None = None) -> KeysetPage:
+        queryset = self.queryset.order_by(*self.ordering)
+        values = self._decode(cursor) if cursor else None
+        if values is not None:
+            queryset = queryset.filter(self._after(values))
+        rows = list(queryset[: self.page_size + 1])
+        if len(rows) > self.page_size:
+            rows = rows[: self.page_size]
+            return KeysetPage(rows, self._encode(rows[-1]))
+        return KeysetPage(rows, None)
+
+
+def estimated_row_count(model) -> int | None:
+    """The planner's row count for ``model``'s table, or None if there is none yet."""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            # -1 (or 0 before PostgreSQL 14) until the table is first vacuumed/analyzed.
+            cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [table])
+            row = cursor.fetchone()
+            return int(row[0]) if row and row[0] > 0 else None
+        if connection.vendor == "sqlite":
+            # sqlite_stat1 only exists once ANALYZE has run; a row's first number is the
+            # table's row count.
+            try:
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            except DatabaseError:
+                return None
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator for admin changelists over tables too big for COUNT(*).
+
+    An unfiltered table the planner puts above ``ADMIN_EXACT_COUNT_LIMIT`` rows reports
+    that estimate; any other count stops at the limit, so it is a bounded index scan.
+    """
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model)
+            if estimate is not None and estimate > limit:
+                return estimate
+        return queryset.order_by()[: limit + 1].count()
@@ -1,3 +1,95 @@
-from .ai import AIServiceError, dream_chat_reply, interpret_and_extract
+from .ai import (
+    AIServiceError,
+    adream_chat_reply,
+    IncompleteInterpretation,
+    build_chat_context,
+    dream_chat_reply,
+    interpret_and_extract,
+    settle_chat_context,
+    stream_dream_chat_reply,
+)
+from .archive import (
+    ImportResult,
+    JournalImportError,
+    archive_lines,
+    import_journal,
+    ndjson_chunks,
+    zip_chunks,
+)
+from .autocomplete import complete_names, get_completion_backend
+from .cache import interpretation_cache
+from .facets import add_facets, rebuild_facets
+from .feed import add_comment, attach_counters, feed_page, sync_feed_item, toggle_like
+from .filters import DreamFilter, facet_counts
+from .fragments import attach_fragment_versions, missing_fragments
+from .ingest import ingest_dream
+from .jobs import (
+    apply_interpretation,
+    claim_job,
+    enqueue_interpretation,
+    interpretation_progress,
+    interpretations_to_backfill,
+    reinterpret,
+    requeue_stale_jobs,
+    run_job,
+)
+from .resolver import NameResolver, symbol_resolver, tag_resolver
+from .search import get_search_backend, search_dreams
+from .similarity import get_embedding_provider, similarity_index
+from .stats import quick_stats, rebuild_stats, stats_batch
+from .throttle import Throttled, ain_flight, in_flight, limits_for, throttle
 
-__all__ = ["AIServiceError", "dream_chat_reply", "interpret_and_extract"]
+__all__ = [
+    "add_comment",
+    "add_facets",
+    "adream_chat_reply",
+    "ain_flight",
+    "AIServiceError",
+    "apply_interpretation",
+    "archive_lines",
+    "attach_counters",
+    "attach_fragment_versions",
+    "build_chat_context",
+    "claim_job",
+    "complete_names",
+    "dream_chat_reply",
+    "DreamFilter",
+    "enqueue_interpretation",
+    "facet_counts",
+    "feed_page",
+    "get_completion_backend",
+    "get_embedding_provider",
+    "get_search_backend",
+    "import_journal",
+    "ImportResult",
+    "in_flight",
+    "IncompleteInterpretation",
+    "ingest_dream",
+    "interpret_and_extract",
+    "interpretation_cache",
+    "interpretation_progress",
+    "interpretations_to_backfill",
+    "JournalImportError",
+    "limits_for",
+    "missing_fragments",
+    "NameResolver",
+    "ndjson_chunks",
+    "quick_stats",
+    "rebuild_facets",
+    "rebuild_stats",
+    "reinterpret",
+    "requeue_stale_jobs",
+    "run_job",
+    "search_dreams",
+    "settle_chat_context",
+    "similarity_index",
+    "stats_batch",
+    "stream_dream_chat_reply",
+    "symbol_resolver",
+    "sync_feed_item",
+    "tag_resolver",
+    "throttle",
+    "Throttled",
+    "toggle_like",
+    "zip_chunks",
+]
@@ -1,78 +1,395 @@
-import json
+import hashlib
+import logging
+import math
 import os
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass, field
 from typing import Any
 
-from openai import OpenAI
+from django.conf import settings
+from openai import OpenAIError
+
+from ..models import DreamEntry, DreamMessage
+from .cache import interpretation_cache
+from .client import AIServiceError, clients
+from .jsonstream import JSONFieldStream
+from .telemetry import OUTCOME_CACHED, OUTCOME_INCOMPLETE, AICall
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+INTERPRET_PROMPT_VERSION = "interpret-v1"
 
 
-class AIServiceError(RuntimeError):
-    pass
+INTERPRET_INSTRUCTIONS = (
+    "You are NightCipher, a dream interpretation assistant. "
+    "Return JSON only, no markdown, following the schema. "
+    "Keep summaries under 120 words each."
+)
+_STRINGS = {"type": "array", "items": {"type": "string"}}
+# Strict structured output: the provider can only produce JSON matching this.
+# Properties are generated in this order, so title and tags arrive first.
+INTERPRET_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "tags": _STRINGS,
+        "psych_summary": {"type": "string"},
+        "spiritual_summary": {"type": "string"},
+        "symbols": _STRINGS,
+        "emotions": _STRINGS,
+        "people": _STRINGS,
+        "settings": _STRINGS,
+        "followup_question": {"type": "string"},
+    },
+    "required": [
+        "title",
+        "tags",
+        "psych_summary",
+        "spiritual_summary",
+        "symbols",
+        "emotions",
+        "people",
+        "settings",
+        "followup_question",
+    ],
+    "additionalProperties": False,
+}
 
 
-def _client() -> OpenAI:
-    api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
-        raise AIServiceError("OPENAI_API_KEY is not set.")
-    return OpenAI(api_key=api_key)
+class IncompleteInterpretation(AIServiceError):
+    """The interpretation stream was cut off or malformed.
 
+    ``data`` holds the fields that finished before it stopped.
+    """
 
-def _safe_json(text: str) -> dict[str, Any]:
-    if not text:
-        return {}
-    try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        start = text.find("{")
-        end = text.rfind("}")
-        if start != -1 and end != -1 and end > start:
-            try:
-                return json.loads(text[start : end + 1])
-            except json.JSONDecodeError:
-                return {}
-    return {}
-
-
-def interpret_and_extract(narrative: str) -> dict[str, Any]:
-    instructions = (
-        "You are NightCipher, a dream interpretation assistant. "
-        "Return JSON only, no markdown. "
-        "Schema: {"
-        '"title": str, '
-        '"psych_summary": str, '
-        '"spiritual_summary": str, '
-        '"tags": [str], '
-        '"symbols": [str], '
-        '"emotions": [str], '
-        '"people": [str], '
-        '"settings": [str], '
-        '"followup_question": str'
-        "}. Keep summaries under 120 words each."
-    )
-    response = _client().responses.create(
-        model=DEFAULT_MODEL,
-        input=narrative,
-        instructions=instructions,
+    def __init__(self, data: dict[str, Any]):
+        required = len(INTERPRET_SCHEMA["required"])
+        super().__init__(f"Interpretation stopped after {len(data)} of {required} fields.")
+        self.data = data
+
+
+def count_tokens(text: str) -> int:
+    """Estimate tokens as UTF-8 bytes / 4; no tokenizer download, errs on the high side."""
+    return math.ceil(len((text or "").encode("utf-8")) / 4)
+
+
+def _record_usage(call: AICall, usage, prompt: str, reply: str) -> None:
+    # Provider-reported usage when there is any, otherwise the local estimate.
+    input_tokens = getattr(usage, "input_tokens", None)
+    output_tokens = getattr(usage, "output_tokens", None)
+    call.input_tokens = input_tokens if isinstance(input_tokens, int) else count_tokens(prompt)
+    call.output_tokens = output_tokens if isinstance(output_tokens, int) else count_tokens(reply)
+
+
+def _usage(event):
+    return getattr(event.response, "usage", None) if event.type == "response.completed" else None
+
+
+def interpret_and_extract(
+    narrative: str, on_field: Callable[[str, Any], None] | None = None
+) -> dict[str, Any]:
+    """Interpret ``narrative``; ``on_field(key, value)`` runs as each field finishes streaming.
+
+    A response cut short, malformed or missing fields raises ``IncompleteInterpretation``
+    with the fields that did complete, and is not cached.
+    """
+    with AICall("interpret", DEFAULT_MODEL) as call:
+        cached = interpretation_cache.get(narrative, DEFAULT_MODEL, INTERPRET_PROMPT_VERSION)
+        if cached is not None:
+            call.outcome = OUTCOME_CACHED
+            return cached
+        parser = _stream_interpretation(narrative, on_field, call)
+        complete = parser.complete and set(INTERPRET_SCHEMA["required"]) <= parser.data.keys()
+        if not complete:
+            call.outcome = OUTCOME_INCOMPLETE
+    if not complete:
+        raise IncompleteInterpretation(parser.data)
+    interpretation_cache.set(narrative, DEFAULT_MODEL, INTERPRET_PROMPT_VERSION, parser.data)
+    return parser.data
+
+
+def _stream_interpretation(narrative: str, on_field, call: AICall) -> JSONFieldStream:
+    stream = clients.call(
+        lambda client, timeout: client.responses.create(
+            model=DEFAULT_MODEL,
+            input=narrative,
+            instructions=INTERPRET_INSTRUCTIONS,
+            text={
+                "format": {
+                    "type": "json_schema",
+                    "name": "dream_interpretation",
+                    "schema": INTERPRET_SCHEMA,
+                    "strict": True,
+                }
+            },
+            stream=True,
+            timeout=timeout,
+        ),
+        settings.AI_INTERPRET_TIMEOUT,
     )
-    data = _safe_json(getattr(response, "output_text", ""))
-    return data or {}
+    parser = JSONFieldStream()
+    parts, usage = [], None
+    try:
+        for event in stream:
+            usage = _usage(event) or usage
+            if event.type != "response.output_text.delta":
+                continue
+            parts.append(event.delta)
+            for key, value in parser.feed(event.delta):
+                if on_field is not None:
+                    on_field(key, value)
+    except OpenAIError as exc:
+        raise AIServiceError(str(exc)) from exc
+    except ValueError as exc:
+        logger.warning("Interpretation stopped at malformed JSON: %s", exc)
+    finally:
+        stream.close()
+        _record_usage(call, usage, INTERPRET_INSTRUCTIONS + narrative, "".join(parts))
+    return parser
+
+
+CHAT_INSTRUCTIONS = (
+    "You are NightCipher, a calm, professional dream companion. "
+    "Ask gentle questions and reflect both psychological and spiritual angles. "
+    "Keep replies under 120 words."
+)
+CONDENSE_PROMPT_VERSION = "condense-v1"
+MESSAGE_OVERHEAD_TOKENS = 4
 
 
-def dream_chat_reply(narrative: str, history: list[dict[str, str]], message: str) -> str:
-    instructions = (
-        "You are NightCipher, a calm, professional dream companion. "
-        "Ask gentle questions and reflect both psychological and spiritual angles. "
-        "Keep replies under 120 words."
+def _truncate(text: str, max_tokens: int) -> str:
+    # Keep the opening and the ending; dreams tend to matter most at both ends.
+    max_bytes = max_tokens * 4
+    data = text.encode("utf-8")
+    if len(data) <= max_bytes:
+        return text
+    head = data[: max_bytes * 2 // 3].decode("utf-8", "ignore")
+    tail = data[len(data) - max_bytes // 3 :].decode("utf-8", "ignore")
+    return f"{head.rstrip()} … {tail.lstrip()}"
+
+
+def _condense(text: str, max_tokens: int, instructions: str) -> str:
+    words = max(20, max_tokens * 3 // 4)
+    instructions = f"{instructions} Use at most {words} words. Reply with the text only."
+    with AICall("condense", DEFAULT_MODEL) as call:
+        response = clients.call(
+            lambda client, timeout: client.responses.create(
+                model=DEFAULT_MODEL,
+                input=text,
+                instructions=instructions,
+                max_output_tokens=max_tokens,
+                timeout=timeout,
+            ),
+            settings.AI_CHAT_TIMEOUT,
+        )
+        reply = (getattr(response, "output_text", "") or "").strip()
+        _record_usage(call, getattr(response, "usage", None), instructions + text, reply)
+    return _truncate(reply, max_tokens)
+
+
+def condensed_narrative(entry: DreamEntry, condense: bool = True) -> str:
+    """The narrative, or a stored AI condensation of it once it exceeds the token budget.
+
+    With ``condense=False`` a missing condensation is not made; the narrative is
+    truncated instead.
+    """
+    budget = settings.AI_CHAT_NARRATIVE_TOKENS
+    if count_tokens(entry.narrative) <= budget:
+        return entry.narrative
+    key = hashlib.sha256(
+        f"{CONDENSE_PROMPT_VERSION}\n{budget}\n{entry.narrative}".encode()
+    ).hexdigest()
+    if entry.condensed_narrative and entry.condensed_narrative_key == key:
+        return entry.condensed_narrative
+    if not condense:
+        return _truncate(entry.narrative, budget)
+    try:
+        condensed = _condense(
+            entry.narrative,
+            budget,
+            "Condense this dream narrative, keeping every image, person, place, "
+            "emotion and turn of events.",
+        )
+    except AIServiceError:
+        return _truncate(entry.narrative, budget)
+    if not condensed:
+        return _truncate(entry.narrative, budget)
+    DreamEntry.objects.filter(pk=entry.pk).update(
+        condensed_narrative=condensed,
+        condensed_narrative_key=key,
     )
-    input_messages = [
-        {"role": "system", "content": f"Dream narrative: {narrative}"},
-        *history,
-        {"role": "user", "content": message},
-    ]
-    response = _client().responses.create(
-        model=DEFAULT_MODEL,
-        input=input_messages,
-        instructions=instructions,
+    entry.condensed_narrative, entry.condensed_narrative_key = condensed, key
+    return condensed
+
+
+def _fold_into_summary(entry: DreamEntry, messages: list[tuple[int, str, str]]) -> str:
+    transcript = "\n".join(f"{role}: {content}" for _, role, content in messages)
+    previous = entry.chat_summary or "(none yet)"
+    try:
+        summary = _condense(
+            f"Summary so far:\n{previous}\n\nNew messages:\n{transcript}",
+            settings.AI_CHAT_SUMMARY_TOKENS,
+            "Update the running summary of this dream conversation with the new messages. "
+            "Keep what the dreamer revealed about feelings, memories and open questions.",
+        )
+    except AIServiceError:
+        # Leave the summary where it was; the same messages are folded next turn.
+        return entry.chat_summary
+    if not summary:
+        return entry.chat_summary
+    until = messages[-1][0]
+    # Only if no other request folded in the meantime; those messages would count twice.
+    if not DreamEntry.objects.filter(
+        pk=entry.pk, chat_summary_until=entry.chat_summary_until
+    ).update(chat_summary=summary, chat_summary_until=until):
+        return entry.chat_summary
+    entry.chat_summary, entry.chat_summary_until = summary, until
+    return summary
+
+
+@dataclass
+class ChatContext:
+    narrative: str
+    summary: str
+    history: list[dict[str, str]]
+    tokens: int
+    # Messages left for settle_chat_context to fold into the summary.
+    unfolded: list[tuple[int, str, str]] = field(default_factory=list)
+
+
+def build_chat_context(
+    entry: DreamEntry, message: str, before: int | None = None, defer: bool = False
+) -> ChatContext:
+    """Fit narrative, rolling summary and recent turns into AI_CHAT_CONTEXT_TOKENS.
+
+    The newest AI_CHAT_MAX_MESSAGES messages are kept newest-first until the budget
+    runs out. Everything older is folded into ``entry.chat_summary``, oldest first and
+    at most AI_CHAT_MAX_MESSAGES turns per call, so the summary absorbs each message
+    exactly once and ``chat_summary_until`` never skips one. ``before`` excludes the
+    message being answered and anything after it.
+
+    ``defer`` makes no AI calls: the narrative is truncated if it has no condensation
+    yet, the stored summary is used as is, and ``settle_chat_context`` does the rest
+    once the reply is out.
+    """
+    narrative = condensed_narrative(entry, condense=not defer)
+    # The summary slot is reserved up front so folding never pushes the prompt over.
+    used = (
+        count_tokens(CHAT_INSTRUCTIONS)
+        + count_tokens(narrative)
+        + max(count_tokens(entry.chat_summary), settings.AI_CHAT_SUMMARY_TOKENS)
+        + count_tokens(message)
+        + 3 * MESSAGE_OVERHEAD_TOKENS
     )
-    return (getattr(response, "output_text", "") or "").strip()
+    limit = settings.AI_CHAT_MAX_MESSAGES
+    messages = DreamMessage.objects.filter(dream_id=entry.pk)
+    if entry.chat_summary_until:
+        messages = messages.filter(pk__gt=entry.chat_summary_until)
+    if before is not None:
+        messages = messages.filter(pk__lt=before)
+    rows = messages.values_list("pk", "role", "content")
+    recent = list(rows.order_by("-created_at", "-id")[:limit])
+    history, overflow = [], []
+    for row in recent:
+        cost = count_tokens(row[2]) + MESSAGE_OVERHEAD_TOKENS
+        if overflow or used + cost > settings.AI_CHAT_CONTEXT_TOKENS:
+            overflow.append(row)
+            continue
+        used += cost
+        history.append({"role": row[1], "content": row[2]})
+    history.reverse()
+    # Turns older than the window have not been summarised yet either.
+    earlier = []
+    if len(recent) == limit:
+        earlier = list(rows.filter(pk__lt=recent[-1][0]).order_by("created_at", "id")[: limit + 1])
+    if len(earlier) > limit:
+        # A long backlog folds a batch per turn; the rest, still unseen, waits its turn.
+        unfolded = earlier[:limit]
+    else:
+        unfolded = earlier + overflow[::-1]
+    if defer or not unfolded:
+        return ChatContext(narrative, entry.chat_summary, history, used, unfolded)
+    return ChatContext(narrative, _fold_into_summary(entry, unfolded), history, used)
+
+
+def settle_chat_context(entry: DreamEntry, context: ChatContext) -> None:
+    """Condense the narrative and fold the summary as ``build_chat_context(defer=True)``
+    skipped, so the next turn finds both stored."""
+    condensed_narrative(entry)
+    if context.unfolded:
+        _fold_into_summary(entry, context.unfolded)
+
+
+def _chat_request(
+    narrative: str, history: list[dict[str, str]], message: str, summary: str = ""
+) -> dict[str, Any]:
+    input_messages = [{"role": "system", "content": f"Dream narrative: {narrative}"}]
+    if summary:
+        input_messages.append(
+            {"role": "system", "content": f"Earlier in this conversation: {summary}"}
+        )
+    input_messages += [*history, {"role": "user", "content": message}]
+    return {
+        "model": DEFAULT_MODEL,
+        "input": input_messages,
+        "instructions": CHAT_INSTRUCTIONS,
+    }
+
+
+def _prompt_text(request: dict[str, Any]) -> str:
+    return "\n".join([request["instructions"], *(item["content"] for item in request["input"])])
+
+
+def _reply_text(call: AICall, request: dict[str, Any], response) -> str:
+    reply = (getattr(response, "output_text", "") or "").strip()
+    _record_usage(call, getattr(response, "usage", None), _prompt_text(request), reply)
+    return reply
+
+
+def dream_chat_reply(
+    narrative: str, history: list[dict[str, str]], message: str, summary: str = ""
+) -> str:
+    request = _chat_request(narrative, history, message, summary)
+    with AICall("chat", DEFAULT_MODEL) as call:
+        response = clients.call(
+            lambda client, timeout: client.responses.create(**request, timeout=timeout),
+            settings.AI_CHAT_TIMEOUT,
+        )
+        return _reply_text(call, request, response)
+
+
+async def adream_chat_reply(
+    narrative: str, history: list[dict[str, str]], message: str, summary: str = ""
+) -> str:
+    request = _chat_request(narrative, history, message, summary)
+    with AICall("chat", DEFAULT_MODEL) as call:
+        response = await clients.acall(
+            lambda client, timeout: client.responses.create(**request, timeout=timeout),
+            settings.AI_CHAT_TIMEOUT,
+        )
+        return _reply_text(call, request, response)
+
+
+async def stream_dream_chat_reply(
+    narrative: str, history: list[dict[str, str]], message: str, summary: str = ""
+) -> AsyncIterator[str]:
+    request = _chat_request(narrative, history, message, summary)
+    with AICall("chat_stream", DEFAULT_MODEL) as call:
+        stream = await clients.acall(
+            lambda client, timeout: client.responses.create(
+                **request, stream=True, timeout=timeout
+            ),
+            settings.AI_CHAT_TIMEOUT,
+        )
+        parts, usage = [], None
+        try:
+            async for event in stream:
+                usage = _usage(event) or usage
+                if event.type == "response.output_text.delta":
+                    parts.append(event.delta)
+                    yield event.delta
+        except OpenAIError as exc:
+            raise AIServiceError(str(exc)) from exc
+        finally:
+            _record_usage(call, usage, _prompt_text(request), "".join(parts))
@@ -0,0 +1,383 @@
+import io
+import json
+import zipfile
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, BinaryIO
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import DreamEntry, DreamMessage, DreamSymbol, Interpretation, Symbol
+from ..naming import canonical_name
+from .facets import add_facets
+from .feed import sync_feed_item
+from .resolver import symbol_resolver, tag_resolver
+from .stats import rebuild_stats
+
+ARCHIVE_FORMAT = "nightcipher-journal"
+ARCHIVE_VERSION = 1
+ZIP_MEMBER = "journal.ndjson"
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+class JournalImportError(ValueError):
+    pass
+
+
+@dataclass
+class ImportResult:
+    dreams: int = 0
+    messages: int = 0
+    interpretations: int = 0
+
+
+def _iso(value) -> str | None:
+    return value.isoformat() if value else None
+
+
+def _dream_record(entry: DreamEntry) -> dict[str, Any]:
+    messages = entry.messages.all()
+    # Ids do not survive an import, so a reply points at its question's position.
+    positions = {message.pk: position for position, message in enumerate(messages)}
+    return {
+        "type": "dream",
+        "title": entry.title,
+        "narrative": entry.narrative,
+        "date_dreamed": _iso(entry.date_dreamed),
+        "created_at": _iso(entry.created_at),
+        "mood_rating": entry.mood_rating,
+        "emotions": entry.emotions,
+        "people": entry.people,
+        "settings": entry.settings,
+        "privacy": entry.privacy,
+        "tags": [tag.name for tag in entry.tags.all()],
+        "symbols": [
+            {
+                "name": link.symbol.name,
+                "category": link.symbol.category,
+                "confidence": link.confidence,
+                "note": link.note,
+            }
+            for link in entry.dream_symbols.all()
+        ],
+        "interpretations": [
+            {
+                "angle": item.angle,
+                "summary": item.summary,
+                "reflection_questions": item.reflection_questions,
+                "model": item.model,
+                "prompt_version": item.prompt_version,
+            }
+            for item in entry.interpretations.all()
+        ],
+        "messages": [
+            {
+                "role": message.role,
+                "content": message.content,
+                "created_at": _iso(message.created_at),
+                "reply_to": positions.get(message.reply_to_id),
+            }
+            for message in messages
+        ],
+    }
+
+
+def journal_records(user) -> Iterator[dict[str, Any]]:
+    """A header record, then one record per dream with everything hanging off it.
+
+    Dreams are read ``EXPORT_CHUNK_SIZE`` at a time, each chunk with its own
+    prefetches, so memory does not grow with the size of the journal.
+    """
+    yield {
+        "type": "header",
+        "format": ARCHIVE_FORMAT,
+        "version": ARCHIVE_VERSION,
+        "exported_at": timezone.now().isoformat(),
+        "username": user.get_username(),
+    }
+    entries = (
+        DreamEntry.objects.filter(user=user)
+        .defer("condensed_narrative", "condensed_narrative_key", "chat_summary")
+        .order_by("pk")
+        .prefetch_related(
+            "tags",
+            Prefetch("dream_symbols", queryset=DreamSymbol.objects.select_related("symbol")),
+            "interpretations",
+            "messages",
+        )
+    )
+    for entry in entries.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        yield _dream_record(entry)
+
+
+def ndjson_chunks(user) -> Iterator[bytes]:
+    buffer = bytearray()
+    for record in journal_records(user):
+        buffer += json.dumps(record, ensure_ascii=False).encode() + b"\n"
+        if len(buffer) >= STREAM_CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+class _ZipSink(io.RawIOBase):
+    # Write-only and unseekable, so zipfile streams entries with data descriptors.
+    def __init__(self):
+        self.chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def zip_chunks(user) -> Iterator[bytes]:
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(ZIP_MEMBER, "w", force_zip64=True) as member:
+            for chunk in ndjson_chunks(user):
+                member.write(chunk)
+                if data := sink.drain():
+                    yield data
+    yield sink.drain()
+
+
+def archive_lines(stream: BinaryIO) -> Iterator[bytes]:
+    """Lines of an uploaded NDJSON file, or of the NDJSON member of a zip export."""
+    if not zipfile.is_zipfile(stream):
+        stream.seek(0)
+        yield from stream
+        return
+    stream.seek(0)
+    with zipfile.ZipFile(stream) as archive:
+        if ZIP_MEMBER not in archive.namelist():
+            raise JournalImportError(f"The zip file has no {ZIP_MEMBER}.")
+        with archive.open(ZIP_MEMBER) as member:
+            yield from member
+
+
+def _parse(lines: Iterable[bytes | str]) -> Iterator[dict[str, Any]]:
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            raise JournalImportError(f"Line {number} is not valid JSON: {exc}") from exc
+        if not isinstance(record, dict):
+            raise JournalImportError(f"Line {number} is not a JSON object.")
+        if record.get("type") == "header":
+            if record.get("format") != ARCHIVE_FORMAT or record.get("version") != ARCHIVE_VERSION:
+                raise JournalImportError("Not a NightCipher journal export this version can read.")
+            continue
+        if record.get("type") != "dream":
+            continue
+        try:
+            record["date_dreamed"] = date.fromisoformat(record["date_dreamed"])
+        except (KeyError, TypeError, ValueError) as exc:
+            raise JournalImportError(f"Line {number} has no valid date_dreamed.") from exc
+        if not record.get("narrative"):
+            raise JournalImportError(f"Line {number} has no narrative.")
+        yield record
+
+
+def _choice(value, choices, default):
+    return value if value in dict(choices) else default
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _mood(value) -> int | None:
+    return value if isinstance(_number(value), int) else None
+
+
+def _datetime(value) -> datetime | None:
+    try:
+        parsed = parse_datetime(value) if isinstance(value, str) else None
+    except ValueError:
+        return None
+    if parsed and settings.USE_TZ and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _strings(values) -> list[str]:
+    return [str(value) for value in values] if isinstance(values, list) else []
+
+
+def _names(values, max_length: int) -> list[str]:
+    # Cleaned the way NameResolver cleans them, so resolved ids line up with names.
+    names = (value.strip()[:max_length] for value in _strings(values))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def _write_batch(user, records: list[dict[str, Any]], result: ImportResult) -> None:
+    entries = DreamEntry.objects.bulk_create(
+        [
+            DreamEntry(
+                user=user,
+                title=str(record.get("title") or "Untitled Dream")[:160],
+                narrative=str(record["narrative"]),
+                date_dreamed=record["date_dreamed"],
+                mood_rating=_mood(record.get("mood_rating")),
+                emotions=_strings(record.get("emotions")),
+                people=_strings(record.get("people")),
+                settings=_strings(record.get("settings")),
+                privacy=_choice(
+                    record.get("privacy"), DreamEntry.PRIVACY_CHOICES, DreamEntry.PRIVACY_PRIVATE
+                ),
+            )
+            for record in records
+        ]
+    )
+    # auto_now_add overwrites any value given to bulk_create, so the exported times
+    # are written back afterwards.
+    stamped = []
+    for entry, record in zip(entries, records):
+        if created := _datetime(record.get("created_at")):
+            entry.created_at = created
+            stamped.append(entry)
+    DreamEntry.objects.bulk_update(stamped, ["created_at"])
+
+    record_tags = [_names(record.get("tags"), 64) for record in records]
+    record_symbols = [
+        [item for item in record.get("symbols") or [] if isinstance(item, dict)]
+        for record in records
+    ]
+    for items in record_symbols:
+        for item in items:
+            item["name"] = str(item.get("name") or "").strip()[:120]
+    categories = {
+        item["name"]: _choice(
+            item.get("category"), Symbol.CATEGORY_CHOICES, Symbol.CATEGORY_ABSTRACT
+        )
+        for items in record_symbols
+        for item in items
+        if item["name"]
+    }
+    # Keep exported categories for symbols this instance has never seen.
+    Symbol.objects.bulk_create(
+        [
+            Symbol(name=name, key=canonical_name(name), category=category)
+            for name, category in categories.items()
+        ],
+        ignore_conflicts=True,
+    )
+    tag_names = list(dict.fromkeys(name for names in record_tags for name in names))
+    tag_ids = tag_resolver.resolve_map(tag_names)
+    symbol_ids = symbol_resolver.resolve_map(list(categories))
+
+    add_facets(entries)
+    tag_through = DreamEntry.tags.through
+    tag_links, symbol_links, interpretations, messages = [], [], [], []
+    threads: list[tuple[dict[int, DreamMessage], dict[int, dict]]] = []
+    for entry, record, names, items in zip(entries, records, record_tags, record_symbols):
+        tag_links += [tag_through(dreamentry_id=entry.pk, tag_id=tag_ids[name]) for name in names]
+        symbol_links += [
+            DreamSymbol(
+                dream_id=entry.pk,
+                symbol_id=symbol_ids[item["name"]],
+                confidence=_number(item.get("confidence")) or 0.0,
+                note=str(item.get("note") or "")[:240],
+            )
+            for item in items
+            if item["name"]
+        ]
+        interpretations += [
+            Interpretation(
+                dream_id=entry.pk,
+                angle=_choice(
+                    item.get("angle"), Interpretation.ANGLE_CHOICES, Interpretation.ANGLE_COMBINED
+                ),
+                summary=str(item.get("summary") or ""),
+                reflection_questions=_strings(item.get("reflection_questions")),
+                model=str(item.get("model") or "")[:80],
+                prompt_version=str(item.get("prompt_version") or "")[:32],
+            )
+            for item in record.get("interpretations") or []
+            if isinstance(item, dict)
+        ]
+        items = {
+            position: item
+            for position, item in enumerate(record.get("messages") or [])
+            if isinstance(item, dict)
+        }
+        thread = {
+            position: DreamMessage(
+                dream_id=entry.pk,
+                role=_choice(item.get("role"), DreamMessage.ROLE_CHOICES, DreamMessage.ROLE_USER),
+                content=str(item.get("content") or ""),
+            )
+            for position, item in items.items()
+        }
+        messages += thread.values()
+        threads.append((thread, items))
+    tag_through.objects.bulk_create(tag_links, ignore_conflicts=True)
+    DreamSymbol.objects.bulk_create(symbol_links, ignore_conflicts=True)
+    Interpretation.objects.bulk_create(interpretations)
+    DreamMessage.objects.bulk_create(messages, batch_size=settings.IMPORT_BATCH_SIZE)
+    restored = []
+    for thread, items in threads:
+        for position, message in thread.items():
+            created = _datetime(items[position].get("created_at"))
+            question = thread.get(_number(items[position].get("reply_to")))
+            if created:
+                message.created_at = created
+            if question is not None:
+                message.reply_to_id = question.pk
+            if created or question is not None:
+                restored.append(message)
+    DreamMessage.objects.bulk_update(
+        restored, ["created_at", "reply_to"], batch_size=settings.IMPORT_BATCH_SIZE
+    )
+    for entry in entries:
+        if entry.privacy == DreamEntry.PRIVACY_PUBLIC:
+            sync_feed_item(entry, is_new=True)
+
+    result.dreams += len(entries)
+    result.interpretations += len(interpretations)
+    result.messages += len(messages)
+
+
+def import_journal(
+    user, lines: Iterable[bytes | str], batch_size: int | None = None
+) -> ImportResult:
+    """Add the dreams in an export to ``user``'s journal.
+
+    Records are parsed one line at a time and written ``IMPORT_BATCH_SIZE`` dreams
+    per transaction with bulk_create, so a failure keeps the batches before it.
+    Facets are indexed per batch and monthly stats rebuilt at the end; embeddings are
+    left to ``embed_dreams``.
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    result = ImportResult()
+    batch: list[dict[str, Any]] = []
+    try:
+        for record in _parse(lines):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                with transaction.atomic():
+                    _write_batch(user, batch, result)
+                batch = []
+        if batch:
+            with transaction.atomic():
+                _write_batch(user, batch, result)
+    finally:
+        if result.dreams:
+            rebuild_stats([user])
+    return result
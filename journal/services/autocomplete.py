@@ -0,0 +1,143 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, models
+from django.utils.module_loading import import_string
+
+from ..naming import canonical_name
+
+Completion = tuple[int, str]  # (id, name)
+
+
+def _trigrams(text: str) -> set[str]:
+    # pg_trgm pads each word with two spaces in front and one behind.
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[index : index + 3] for index in range(len(padded) - 2))
+    return grams
+
+
+class CompletionBackend:
+    def complete(self, model: type[models.Model], query: str, limit: int) -> list[Completion]:
+        """Rows of ``model`` (Tag or Symbol) whose canonical key starts with, or is
+        similar to, the canonical form of ``query``; prefix matches come first."""
+        raise NotImplementedError
+
+
+class PostgresCompletionBackend(CompletionBackend):
+    # key has a GIN gin_trgm_ops index (see migration 0014) serving both LIKE and %.
+    # Similarities below pg_trgm.similarity_threshold (0.3 by default) never match.
+    def complete(self, model, query, limit):
+        key = canonical_name(query)
+        if not key:
+            return []
+        prefix = key.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        sql = f"""
+            SELECT id, name FROM {model._meta.db_table}
+            WHERE key LIKE %s OR (key %% %s AND similarity(key, %s) >= %s)
+            ORDER BY key LIKE %s DESC, similarity(key, %s) DESC, length(key), key
+            LIMIT %s
+        """
+        params = [prefix, key, key, settings.AUTOCOMPLETE_MIN_SIMILARITY, prefix, key, limit]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [(row[0], row[1]) for row in cursor.fetchall()]
+
+
+@dataclass
+class _Snapshot:
+    keys: list[str]
+    rows: list[Completion]
+    gram_counts: list[int]
+    # trigram -> positions in ``keys`` of the keys containing it
+    postings: dict[str, list[int]] = field(default_factory=dict)
+    loaded_at: float = 0.0
+
+
+class MemoryCompletionBackend(CompletionBackend):
+    """Keys sorted in memory: a bisect finds prefix matches, a trigram index the rest.
+
+    Each model's snapshot is one query, reloaded at most every
+    ``AUTOCOMPLETE_REFRESH_SECONDS``, so names added since the last load appear late.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshots: dict[str, _Snapshot] = {}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+
+    def _load(self, model) -> _Snapshot:
+        rows = model.objects.order_by("key").values_list("key", "id", "name")
+        snapshot = _Snapshot(keys=[], rows=[], gram_counts=[], loaded_at=time.monotonic())
+        for position, (key, pk, name) in enumerate(rows.iterator(chunk_size=5000)):
+            grams = _trigrams(key)
+            snapshot.keys.append(key)
+            snapshot.rows.append((pk, name))
+            snapshot.gram_counts.append(len(grams))
+            for gram in grams:
+                snapshot.postings.setdefault(gram, []).append(position)
+        return snapshot
+
+    def _snapshot(self, model) -> _Snapshot:
+        label = model._meta.label
+        with self._lock:
+            snapshot = self._snapshots.get(label)
+            age = time.monotonic() - snapshot.loaded_at if snapshot else None
+            if age is None or age > settings.AUTOCOMPLETE_REFRESH_SECONDS:
+                snapshot = self._snapshots[label] = self._load(model)
+        return snapshot
+
+    def complete(self, model, query, limit):
+        key = canonical_name(query)
+        if not key:
+            return []
+        snapshot = self._snapshot(model)
+        keys = snapshot.keys
+        found = []
+        position = bisect_left(keys, key)
+        while position < len(keys) and keys[position].startswith(key) and len(found) < limit:
+            found.append(position)
+            position += 1
+        # Prefix hits come out in key order; the rest by similarity, then key length.
+        if len(found) < limit:
+            grams = _trigrams(key)
+            shared = Counter(
+                position for gram in grams for position in snapshot.postings.get(gram, ())
+            )
+            scored = []
+            for position, common in shared.items():
+                if keys[position].startswith(key):
+                    continue
+                score = common / (len(grams) + snapshot.gram_counts[position] - common)
+                if score >= settings.AUTOCOMPLETE_MIN_SIMILARITY:
+                    scored.append((-score, len(keys[position]), keys[position], position))
+            found += [item[-1] for item in sorted(scored)[: limit - len(found)]]
+        return [snapshot.rows[position] for position in found]
+
+
+@lru_cache(maxsize=None)
+def _backend_for(path: str | None, vendor: str) -> CompletionBackend:
+    if path:
+        return import_string(path)()
+    if vendor == "postgresql":
+        return PostgresCompletionBackend()
+    return MemoryCompletionBackend()
+
+
+def get_completion_backend() -> CompletionBackend:
+    return _backend_for(settings.AUTOCOMPLETE_BACKEND, connection.vendor)
+
+
+def complete_names(
+    model: type[models.Model], query: str, limit: int | None = None
+) -> list[Completion]:
+    return get_completion_backend().complete(model, query, limit or settings.AUTOCOMPLETE_LIMIT)
@@ -0,0 +1,103 @@
+import hashlib
+import threading
+from datetime import timedelta
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import InterpretationCacheEntry
+
+CACHE_PREFIX = "interpretation"
+
+
+def normalize_narrative(narrative: str) -> str:
+    return " ".join(narrative.casefold().split())
+
+
+def interpretation_key(narrative: str, model: str, prompt_version: str) -> str:
+    material = "\n".join([model, prompt_version, normalize_narrative(narrative)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class InterpretationCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, narrative: str, model: str, prompt_version: str) -> dict[str, Any] | None:
+        if not settings.AI_CACHE_ENABLED:
+            return None
+        key = interpretation_key(narrative, model, prompt_version)
+        payload = cache.get(f"{CACHE_PREFIX}:{key}")
+        if payload is None:
+            cutoff = timezone.now() - timedelta(seconds=settings.AI_CACHE_TTL)
+            payload = (
+                InterpretationCacheEntry.objects.filter(key=key, created_at__gte=cutoff)
+                .values_list("payload", flat=True)
+                .first()
+            )
+            if payload is not None:
+                cache.set(f"{CACHE_PREFIX}:{key}", payload, settings.AI_CACHE_TTL)
+        if payload is None:
+            self._count(hit=False)
+            return None
+        InterpretationCacheEntry.objects.filter(key=key).update(
+            hits=F("hits") + 1,
+            last_used_at=timezone.now(),
+        )
+        self._count(hit=True)
+        return payload
+
+    def set(self, narrative: str, model: str, prompt_version: str, payload: dict[str, Any]) -> None:
+        if not settings.AI_CACHE_ENABLED or not payload:
+            return
+        key = interpretation_key(narrative, model, prompt_version)
+        InterpretationCacheEntry.objects.update_or_create(
+            key=key,
+            defaults={
+                "model": model,
+                "prompt_version": prompt_version,
+                "payload": payload,
+                "created_at": timezone.now(),
+                "last_used_at": timezone.now(),
+            },
+        )
+        cache.set(f"{CACHE_PREFIX}:{key}", payload, settings.AI_CACHE_TTL)
+        with self._lock:
+            self._writes += 1
+            evict_now = self._writes % settings.AI_CACHE_EVICT_EVERY == 0
+        if evict_now:
+            self.evict()
+
+    def evict(self) -> int:
+        cutoff = timezone.now() - timedelta(seconds=settings.AI_CACHE_TTL)
+        expired, _ = InterpretationCacheEntry.objects.filter(created_at__lt=cutoff).delete()
+        # LRU: everything at or below the first row past the size limit goes.
+        limit = settings.AI_CACHE_MAX_ENTRIES
+        recent = InterpretationCacheEntry.objects.order_by("-last_used_at")
+        boundary = list(recent.values_list("last_used_at", flat=True)[limit : limit + 1])
+        overflow = 0
+        if boundary:
+            overflow, _ = InterpretationCacheEntry.objects.filter(
+                last_used_at__lte=boundary[0]
+            ).delete()
+        return expired + overflow
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+interpretation_cache = InterpretationCache()
@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from typing import TypeVar
+
+import httpx
+import openai
+from django.conf import settings
+from openai import AsyncOpenAI, OpenAI
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Errors that say the provider is degraded rather than that our request is wrong.
+TRANSIENT_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class AIServiceError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    STATE_CLOSED = "closed"
+    STATE_OPEN = "open"
+    STATE_HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int | None = None, reset_timeout: float | None = None):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def failure_threshold(self) -> int:
+        return self._failure_threshold or settings.AI_BREAKER_THRESHOLD
+
+    @property
+    def reset_timeout(self) -> float:
+        return self._reset_timeout or settings.AI_BREAKER_RESET_SECONDS
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return self.STATE_CLOSED
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return self.STATE_OPEN
+            return self.STATE_HALF_OPEN
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Admit one logical call, or raise AIServiceError while the circuit is open.
+
+        In the half-open state exactly one trial call is let through. Its slot is freed
+        however the call ends (cancelled, or failing with an error that records no
+        outcome), so an abandoned trial cannot keep the circuit open for good.
+        """
+        probe = False
+        with self._lock:
+            if self._opened_at is not None:
+                if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                    raise AIServiceError(
+                        "AI provider is temporarily unavailable. Please try again shortly."
+                    )
+                self._probing = probe = True
+        try:
+            yield
+        finally:
+            if probe:
+                with self._lock:
+                    self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning("AI provider circuit opened after %s failures.", self._failures)
+                self._opened_at = time.monotonic()
+
+    def reset(self) -> None:
+        self.record_success()
+        with self._lock:
+            self._probing = False
+
+
+async def _close_with_loop(client: AsyncOpenAI) -> AsyncIterator[None]:
+    # Once started, the loop tracks this generator and closes it, and so the client,
+    # from shutdown_asyncgens(), which asyncio.run() and async_to_sync both call.
+    try:
+        yield
+    finally:
+        await client.close()
+
+
+class ClientManager:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sync_client: OpenAI | None = None
+        self._sync_key: tuple[str, str | None] | None = None
+        self._async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self.breaker = CircuitBreaker()
+
+    @staticmethod
+    def _api_key() -> str:
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            raise AIServiceError("OPENAI_API_KEY is not set.")
+        return api_key
+
+    @staticmethod
+    def _timeout() -> httpx.Timeout:
+        return httpx.Timeout(settings.AI_REQUEST_TIMEOUT, connect=settings.AI_CONNECT_TIMEOUT)
+
+    @staticmethod
+    def _limits() -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.AI_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.AI_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.AI_POOL_KEEPALIVE_EXPIRY,
+        )
+
+    def sync_client(self) -> OpenAI:
+        key = (self._api_key(), settings.OPENAI_BASE_URL)
+        with self._lock:
+            if self._sync_client is None or self._sync_key != key:
+                if self._sync_client is not None:
+                    self._sync_client.close()
+                self._sync_client = OpenAI(
+                    api_key=key[0],
+                    base_url=key[1],
+                    max_retries=0,
+                    timeout=self._timeout(),
+                    http_client=openai.DefaultHttpxClient(
+                        limits=self._limits(),
+                        timeout=self._timeout(),
+                    ),
+                )
+                self._sync_key = key
+            return self._sync_client
+
+    async def async_client(self) -> AsyncOpenAI:
+        """The AsyncOpenAI client for the running event loop.
+
+        httpx async pools are bound to the loop that created them, so each loop gets
+        its own client, closed when the loop shuts down. Under ASGI that is one pool
+        per worker. Under WSGI every async view runs on a fresh loop, so the pool
+        lasts a single request: serve the app with ASGI to pool across requests.
+        """
+        loop = asyncio.get_running_loop()
+        key = (self._api_key(), settings.OPENAI_BASE_URL)
+        cached = self._async_clients.get(loop)
+        if cached is None or cached[0] != key:
+            if cached is not None:
+                await cached[2].aclose()
+            client = AsyncOpenAI(
+                api_key=key[0],
+                base_url=key[1],
+                max_retries=0,
+                timeout=self._timeout(),
+                http_client=openai.DefaultAsyncHttpxClient(
+                    limits=self._limits(),
+                    timeout=self._timeout(),
+                ),
+            )
+            closer = _close_with_loop(client)
+            await anext(closer)
+            cached = (key, client, closer)
+            self._async_clients[loop] = cached
+        return cached[1]
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        ceiling = min(settings.AI_RETRY_BACKOFF_MAX, settings.AI_RETRY_BACKOFF * 2**attempt)
+        return random.uniform(0, ceiling)
+
+    def _next_delay(self, exc: Exception, attempt: int, deadline: float) -> float | None:
+        delay = self._backoff(attempt)
+        if attempt >= settings.AI_MAX_RETRIES or time.monotonic() + delay >= deadline:
+            # The breaker counts logical calls: one failure once the retries are spent.
+            self.breaker.record_failure()
+            return None
+        logger.info("Retrying AI call in %.2fs after %s", delay, exc.__class__.__name__)
+        return delay
+
+    def call(self, request: Callable[[OpenAI, float], T], timeout: float) -> T:
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        with self.breaker.guard():
+            while True:
+                client = self.sync_client()
+                try:
+                    result = request(client, max(deadline - time.monotonic(), 0.1))
+                except TRANSIENT_ERRORS as exc:
+                    delay = self._next_delay(exc, attempt, deadline)
+                    if delay is None:
+                        raise AIServiceError(f"AI provider error: {exc}") from exc
+                    attempt += 1
+                    time.sleep(delay)
+                    continue
+                except openai.OpenAIError as exc:
+                    self.breaker.record_success()
+                    raise AIServiceError(f"AI request failed: {exc}") from exc
+                self.breaker.record_success()
+                return result
+
+    async def acall(self, request: Callable[[AsyncOpenAI, float], Awaitable[T]], timeout: float) -> T:
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        with self.breaker.guard():
+            while True:
+                client = await self.async_client()
+                try:
+                    result = await request(client, max(deadline - time.monotonic(), 0.1))
+                except TRANSIENT_ERRORS as exc:
+                    delay = self._next_delay(exc, attempt, deadline)
+                    if delay is None:
+                        raise AIServiceError(f"AI provider error: {exc}") from exc
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                    continue
+                except openai.OpenAIError as exc:
+                    self.breaker.record_success()
+                    raise AIServiceError(f"AI request failed: {exc}") from exc
+                self.breaker.record_success()
+                return result
+
+    def reset(self) -> None:
+        with self._lock:
+            if self._sync_client is not None:
+                self._sync_client.close()
+            self._sync_client = None
+            self._sync_key = None
+        self._async_clients = weakref.WeakKeyDictionary()
+        self.breaker.reset()
+
+
+clients = ClientManager()
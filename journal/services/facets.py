@@ -0,0 +1,97 @@
+from collections.abc import Iterable
+
+from django.db import transaction
+
+from ..models import DreamEntry, DreamFacet
+
+FACET_FIELDS = {
+    DreamFacet.KIND_EMOTION: "emotions",
+    DreamFacet.KIND_PERSON: "people",
+    DreamFacet.KIND_SETTING: "settings",
+}
+VALUE_MAX_LENGTH = 120
+
+Facet = tuple[str, str]
+
+
+def facet_value(value) -> str:
+    # Same folding as the monthly emotion counts, so "Anxious" and "anxious " match.
+    return str(value).strip().casefold()[:VALUE_MAX_LENGTH]
+
+
+def facet_values(values) -> list[str]:
+    if not isinstance(values, list):
+        return []
+    return [value for value in dict.fromkeys(facet_value(value) for value in values) if value]
+
+
+def entry_facets(entry: DreamEntry) -> set[Facet]:
+    return {
+        (kind, value)
+        for kind, field in FACET_FIELDS.items()
+        for value in facet_values(getattr(entry, field))
+    }
+
+
+def _rows(entry: DreamEntry, facets: Iterable[Facet]) -> list[DreamFacet]:
+    return [
+        DreamFacet(dream_id=entry.pk, user_id=entry.user_id, kind=kind, value=value)
+        for kind, value in sorted(facets)
+    ]
+
+
+def add_facets(entries: Iterable[DreamEntry]) -> None:
+    """Index new dreams written with bulk_create, which sends no post_save signal."""
+    DreamFacet.objects.bulk_create(
+        [row for entry in entries for row in _rows(entry, entry_facets(entry))],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+def sync_facets(entry: DreamEntry) -> None:
+    # A single select when nothing changed; otherwise one delete and/or one insert.
+    wanted = entry_facets(entry)
+    existing = {
+        (kind, value): pk
+        for pk, kind, value in DreamFacet.objects.filter(dream_id=entry.pk).values_list(
+            "pk", "kind", "value"
+        )
+    }
+    stale = [pk for facet, pk in existing.items() if facet not in wanted]
+    if stale:
+        DreamFacet.objects.filter(pk__in=stale).delete()
+    if wanted - existing.keys():
+        DreamFacet.objects.bulk_create(_rows(entry, wanted - existing.keys()), ignore_conflicts=True)
+
+
+def entry_post_save(sender, instance: DreamEntry, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        add_facets([instance])
+        return
+    if update_fields is not None and not set(FACET_FIELDS.values()) & set(update_fields):
+        return
+    sync_facets(instance)
+
+
+def rebuild_facets(users=None) -> int:
+    """Re-index every dream's emotions, people and settings; returns the row count."""
+    entries = DreamEntry.objects.only("user_id", *FACET_FIELDS.values())
+    existing = DreamFacet.objects.all()
+    if users is not None:
+        entries = entries.filter(user__in=users)
+        existing = existing.filter(user__in=users)
+    rows = 0
+    with transaction.atomic():
+        existing.delete()
+        batch = []
+        for entry in entries.iterator(chunk_size=2000):
+            batch += _rows(entry, entry_facets(entry))
+            if len(batch) >= 2000:
+                DreamFacet.objects.bulk_create(batch)
+                rows += len(batch)
+                batch = []
+        DreamFacet.objects.bulk_create(batch)
+    return rows + len(batch)
@@ -0,0 +1,151 @@
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from ..models import Comment, DreamEntry, FeedItem, Like
+from ..pagination import KeysetPage, KeysetPaginator
+
+EXCERPT_LENGTH = 280
+VERSION_KEY = "feed:version"
+ORDERING = ("-created_at", "-id")
+
+
+def feed_version() -> int:
+    return cache.get(VERSION_KEY, 0)
+
+
+def bump_feed_version() -> None:
+    # Old pages are never deleted; a new version just stops anything from reading them.
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, timeout=None)
+
+
+def _author_name(user) -> str:
+    profile = getattr(user, "profile", None)
+    return (profile.display_name if profile else "") or user.get_username()
+
+
+def sync_feed_item(entry: DreamEntry, is_new: bool = False) -> None:
+    """Create, refresh or hide the feed item for ``entry`` after a write.
+
+    Private dreams that were never public cost no queries. A dream made private
+    keeps its item (hidden), so likes and comments survive if it is shared again.
+    """
+    public = entry.privacy == DreamEntry.PRIVACY_PUBLIC
+    if not public:
+        if not is_new and FeedItem.objects.filter(dream=entry).exclude(
+            privacy=entry.privacy
+        ).update(privacy=entry.privacy):
+            transaction.on_commit(bump_feed_version)
+        return
+    fields = {
+        "author_id": entry.user_id,
+        "author_name": _author_name(entry.user),
+        "privacy": entry.privacy,
+        "title": entry.title,
+        "excerpt": entry.narrative[:EXCERPT_LENGTH],
+        "tag_names": sorted(entry.tags.values_list("name", flat=True)),
+    }
+    FeedItem.objects.update_or_create(
+        dream=entry,
+        defaults=fields,
+        create_defaults={**fields, "created_at": entry.created_at},
+    )
+    transaction.on_commit(bump_feed_version)
+
+
+def _serialize(item: FeedItem) -> dict[str, Any]:
+    return {
+        "id": item.pk,
+        "title": item.title,
+        "excerpt": item.excerpt,
+        "truncated": len(item.excerpt) >= EXCERPT_LENGTH,
+        "tag_names": item.tag_names,
+        "author_name": item.author_name,
+        "created_at": item.created_at,
+    }
+
+
+def feed_page(cursor: str | None = None) -> KeysetPage:
+    """One page of public items, cached under the current feed version.
+
+    Counters are left out of the cached copy; see ``attach_counters``.
+    """
+    key = f"feed:v{feed_version()}:{settings.FEED_PAGE_SIZE}:{cursor or 'first'}"
+    page = cache.get(key)
+    if page is None:
+        items = FeedItem.objects.filter(privacy=DreamEntry.PRIVACY_PUBLIC).only(
+            "id", "title", "excerpt", "tag_names", "author_name", "created_at"
+        )
+        page = KeysetPaginator(items, ORDERING, settings.FEED_PAGE_SIZE).page(cursor)
+        page.object_list = [_serialize(item) for item in page.object_list]
+        cache.set(key, page, settings.FEED_CACHE_TTL)
+    return page
+
+
+def attach_counters(items: list[dict[str, Any]], user=None) -> list[dict[str, Any]]:
+    """Fresh like/comment counts (one primary-key lookup) and the viewer's likes."""
+    ids = [item["id"] for item in items]
+    if not ids:
+        return []
+    counts = {
+        pk: (likes, comments)
+        for pk, likes, comments in FeedItem.objects.filter(pk__in=ids).values_list(
+            "pk", "like_count", "comment_count"
+        )
+    }
+    liked = set()
+    if user is not None and user.is_authenticated:
+        liked = set(
+            Like.objects.filter(user=user, feed_item_id__in=ids).values_list(
+                "feed_item_id", flat=True
+            )
+        )
+    rows = []
+    for item in items:
+        if item["id"] not in counts:
+            continue  # deleted since the page was cached
+        likes, comments = counts[item["id"]]
+        rows.append(
+            {**item, "like_count": likes, "comment_count": comments, "liked": item["id"] in liked}
+        )
+    return rows
+
+
+def toggle_like(item: FeedItem, user) -> bool:
+    """Like or unlike ``item``; returns whether the user now likes it."""
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(feed_item=item, user=user).delete()
+        if deleted:
+            FeedItem.objects.filter(pk=item.pk).update(like_count=F("like_count") - 1)
+            return False
+        try:
+            with transaction.atomic():
+                Like.objects.create(feed_item=item, user=user)
+        except IntegrityError:
+            return True  # a concurrent request from the same user got there first
+        FeedItem.objects.filter(pk=item.pk).update(like_count=F("like_count") + 1)
+        return True
+
+
+def add_comment(item: FeedItem, user, body: str) -> Comment:
+    with transaction.atomic():
+        comment = Comment.objects.create(feed_item=item, author=user, body=body)
+        FeedItem.objects.filter(pk=item.pk).update(comment_count=F("comment_count") + 1)
+    return comment
+
+
+def entry_post_save(sender, instance: DreamEntry, created: bool, raw: bool = False, **kwargs):
+    # Every save, not just ingest_dream's: a dream made private in the admin or the
+    # shell must leave the feed too. Deleted dreams take their item with them (CASCADE).
+    if not raw:
+        sync_feed_item(instance, is_new=created)
+
+
+def item_post_delete(sender, instance: FeedItem, **kwargs):
+    transaction.on_commit(bump_feed_version)
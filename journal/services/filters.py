@@ -0,0 +1,143 @@
+from dataclasses import dataclass, fields, replace
+from datetime import date
+
+from django.db.models import CharField, Count, F, QuerySet, Value
+
+from ..models import DreamEntry, DreamFacet, DreamSymbol
+from ..naming import canonical_name
+from .facets import FACET_FIELDS, facet_values
+
+FACET_LIMIT = 12
+# Query-string parameter for each filter field; list fields take repeated values.
+PARAMS = {
+    "date_from": "from",
+    "date_to": "to",
+    "tags": "tag",
+    "symbols": "symbol",
+    "emotions": "emotion",
+    "people": "person",
+    "settings": "setting",
+}
+FACET_KINDS = {field: kind for kind, field in FACET_FIELDS.items()}
+COUNT_FIELDS = {"tag": "tags", "symbol": "symbols", **FACET_FIELDS}
+
+
+def _date(value: str | None) -> date | None:
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def _names(values: list[str]) -> tuple[str, ...]:
+    return tuple(dict.fromkeys(value.strip() for value in values if value.strip()))
+
+
+@dataclass(frozen=True)
+class DreamFilter:
+    """Dreams-list filters; values within a list must all match (AND), as do the lists."""
+
+    date_from: date | None = None
+    date_to: date | None = None
+    tags: tuple[str, ...] = ()
+    symbols: tuple[str, ...] = ()
+    emotions: tuple[str, ...] = ()
+    people: tuple[str, ...] = ()
+    settings: tuple[str, ...] = ()
+
+    @classmethod
+    def from_query(cls, params) -> "DreamFilter":
+        return cls(
+            date_from=_date(params.get(PARAMS["date_from"])),
+            date_to=_date(params.get(PARAMS["date_to"])),
+            tags=_names(params.getlist(PARAMS["tags"])),
+            symbols=_names(params.getlist(PARAMS["symbols"])),
+            **{
+                field: tuple(facet_values(params.getlist(PARAMS[field])))
+                for field in FACET_KINDS
+            },
+        )
+
+    def __bool__(self) -> bool:
+        return any(getattr(self, item.name) for item in fields(self))
+
+    def query_items(self) -> list[tuple[str, str]]:
+        """(parameter, value) pairs for building links that keep these filters."""
+        items = []
+        for item in fields(self):
+            value = getattr(self, item.name)
+            if isinstance(value, tuple):
+                items += [(PARAMS[item.name], name) for name in value]
+            elif value:
+                items.append((PARAMS[item.name], value.isoformat()))
+        return items
+
+    def toggled(self, field: str, value: str) -> "DreamFilter":
+        current = getattr(self, field)
+        if value in current:
+            return replace(self, **{field: tuple(name for name in current if name != value)})
+        return replace(self, **{field: current + (value,)})
+
+    def apply(self, entries: QuerySet, user) -> QuerySet:
+        # Every condition is an indexed lookup: (user, date_dreamed) for the range,
+        # the tag/symbol link tables, and (user, kind, value, dream) for facets.
+        if self.date_from:
+            entries = entries.filter(date_dreamed__gte=self.date_from)
+        if self.date_to:
+            entries = entries.filter(date_dreamed__lte=self.date_to)
+        tag_links = DreamEntry.tags.through.objects
+        for name in self.tags:
+            entries = entries.filter(
+                pk__in=tag_links.filter(tag__key=canonical_name(name)).values("dreamentry_id")
+            )
+        symbol_links = DreamSymbol.objects
+        for name in self.symbols:
+            entries = entries.filter(
+                pk__in=symbol_links.filter(symbol__key=canonical_name(name)).values("dream_id")
+            )
+        for field, kind in FACET_KINDS.items():
+            for value in getattr(self, field):
+                entries = entries.filter(
+                    pk__in=DreamFacet.objects.filter(user=user, kind=kind, value=value).values(
+                        "dream_id"
+                    )
+                )
+        return entries
+
+
+def _counts(queryset: QuerySet, kind, value) -> QuerySet:
+    return (
+        queryset.annotate(facet_kind=kind, facet_value=value)
+        .values("facet_kind", "facet_value")
+        .annotate(dreams=Count("*"))
+        .order_by()
+    )
+
+
+def facet_counts(user, dream_filter: DreamFilter | None = None, limit: int = FACET_LIMIT) -> dict:
+    """Top tags, symbols, emotions, people and settings among ``user``'s filtered dreams.
+
+    One query: a UNION ALL of grouped counts over the link and facet tables.
+    Returns ``{"tags": [(value, count), ...], ...}``, keyed like the filter fields.
+    """
+    matching = DreamEntry.objects.filter(user=user)
+    if dream_filter:
+        matching = dream_filter.apply(matching, user)
+    ids = matching.values("pk")
+    tag_links = DreamEntry.tags.through.objects.filter(dreamentry_id__in=ids)
+    rows = _counts(tag_links, Value("tag", output_field=CharField()), F("tag__name")).union(
+        _counts(
+            DreamSymbol.objects.filter(dream_id__in=ids),
+            Value("symbol", output_field=CharField()),
+            F("symbol__name"),
+        ),
+        _counts(DreamFacet.objects.filter(user=user, dream_id__in=ids), F("kind"), F("value")),
+        all=True,
+    )
+    counts = {field: [] for field in COUNT_FIELDS.values()}
+    for row in rows:
+        counts[COUNT_FIELDS[row["facet_kind"]]].append((row["facet_value"], row["dreams"]))
+    return {
+        field: sorted(values, key=lambda item: (-item[1], item[0]))[:limit]
+        for field, values in counts.items()
+    }
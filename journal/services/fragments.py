@@ -0,0 +1,106 @@
+from collections.abc import Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+
+from ..models import DreamEntry, DreamSymbol
+
+VERSION_KEY = "dream:{}:version"
+DETAIL_FRAGMENTS = ("dream-detail", "dream-context")
+ROW_FRAGMENT = "dream-row"
+
+
+def entry_versions(pks: Iterable[int]) -> dict[int, int]:
+    keys = {VERSION_KEY.format(pk): pk for pk in pks}
+    found = cache.get_many(keys)
+    return {pk: found.get(key, 0) for key, pk in keys.items()}
+
+
+def entry_version(pk: int) -> int:
+    return cache.get(VERSION_KEY.format(pk), 0)
+
+
+def bump_entry_version(pk: int) -> None:
+    # Fragments are keyed on (entry, version); old ones expire after FRAGMENT_CACHE_TTL.
+    key = VERSION_KEY.format(pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def _bump_on_commit(*pks: int) -> None:
+    for pk in pks:
+        transaction.on_commit(lambda pk=pk: bump_entry_version(pk))
+
+
+def fragment_vary_on(entry: DreamEntry) -> list:
+    # updated_at keeps a reused pk (SQLite) from matching a deleted dream's fragments.
+    return [entry.pk, entry.updated_at.timestamp(), entry.fragment_version]
+
+
+def missing_fragments(names: Iterable[str], entries: Iterable[DreamEntry]) -> list[DreamEntry]:
+    """Entries with at least one of ``names`` not cached at their ``fragment_version``.
+
+    Only these need their related rows loaded before rendering.
+    """
+    keys = {
+        make_template_fragment_key(name, fragment_vary_on(entry)): entry
+        for entry in entries
+        for name in names
+    }
+    if not settings.FRAGMENT_CACHE_TTL:
+        return list(dict.fromkeys(keys.values()))
+    found = cache.get_many(keys)
+    return list(dict.fromkeys(entry for key, entry in keys.items() if key not in found))
+
+
+def attach_fragment_versions(entries: Iterable[DreamEntry]) -> None:
+    entries = list(entries)
+    versions = entry_versions(entry.pk for entry in entries)
+    for entry in entries:
+        entry.fragment_version = versions[entry.pk]
+
+
+def entry_changed(sender, instance, **kwargs) -> None:
+    _bump_on_commit(instance.pk)
+
+
+def entry_post_delete(sender, instance, **kwargs) -> None:
+    # Runs after the bumps queued by its cascaded interpretations and symbol links.
+    transaction.on_commit(lambda: cache.delete(VERSION_KEY.format(instance.pk)))
+
+
+def related_changed(sender, instance, **kwargs) -> None:
+    """For rows hanging off a dream (interpretations, symbol links)."""
+    _bump_on_commit(instance.dream_id)
+
+
+def tags_changed(sender, instance, action, reverse, pk_set, **kwargs) -> None:
+    if not reverse:
+        if action.startswith("post_"):
+            _bump_on_commit(instance.pk)
+    elif action == "pre_clear":
+        # tag.dreams.clear() does not say which dreams it unlinks, so ask first.
+        _bump_on_commit(*instance.dreams.values_list("pk", flat=True))
+    elif action in ("post_add", "post_remove"):
+        _bump_on_commit(*pk_set)
+
+
+def tag_changed(sender, instance, created=False, **kwargs) -> None:
+    """A renamed or deleted tag shows in every dream it is on.
+
+    Deleting a tag removes its links without an m2m_changed signal, so this also
+    runs on pre_delete, while the links can still be found.
+    """
+    if not created:
+        _bump_on_commit(*instance.dreams.values_list("pk", flat=True))
+
+
+def symbol_changed(sender, instance, created=False, **kwargs) -> None:
+    if not created:
+        _bump_on_commit(
+            *DreamSymbol.objects.filter(symbol=instance).values_list("dream_id", flat=True)
+        )
@@ -0,0 +1,82 @@
+from collections.abc import Iterable
+
+from django.db import transaction
+
+from ..models import DreamEntry, DreamJob, DreamMessage, DreamSymbol, Interpretation
+from .feed import sync_feed_item
+from .resolver import symbol_resolver, tag_resolver
+from .stats import record_symbols_added, stats_batch
+
+
+def ingest_dream(
+    entry: DreamEntry,
+    *,
+    tags: Iterable[str] = (),
+    symbols: Iterable[str] = (),
+    interpretations: dict[str, str] | None = None,
+    interpretation_model: str = "",
+    prompt_version: str = "",
+    followup: str | None = None,
+    enqueue: bool = False,
+) -> DreamEntry:
+    """Write a dream and everything hanging off it in one transaction.
+
+    ``entry`` may be unsaved (new dream) or saved (filling in a pending one); its
+    scalar fields are written as-is. Tags and symbols replace any existing links, and
+    interpretations replace existing ones for the same angles.
+    The number of round-trips does not depend on how many tags or symbols there are.
+    """
+    is_new = entry.pk is None
+    with transaction.atomic(), stats_batch():
+        entry.save()
+        tag_ids = tag_resolver.resolve(tags)
+        symbol_ids = symbol_resolver.resolve(symbols)
+
+        tag_through = DreamEntry.tags.through
+        new_symbol_ids = symbol_ids
+        if not is_new:
+            tag_through.objects.filter(dreamentry_id=entry.pk).exclude(tag_id__in=tag_ids).delete()
+            linked = DreamSymbol.objects.filter(dream_id=entry.pk)
+            linked.exclude(symbol_id__in=symbol_ids).delete()
+            if symbol_ids:
+                kept = set(linked.values_list("symbol_id", flat=True))
+                new_symbol_ids = [pk for pk in symbol_ids if pk not in kept]
+        if tag_ids:
+            tag_through.objects.bulk_create(
+                [tag_through(dreamentry_id=entry.pk, tag_id=tag_id) for tag_id in tag_ids],
+                ignore_conflicts=True,
+            )
+        if new_symbol_ids:
+            DreamSymbol.objects.bulk_create(
+                [DreamSymbol(dream_id=entry.pk, symbol_id=symbol_id) for symbol_id in new_symbol_ids],
+                ignore_conflicts=True,
+            )
+            # bulk_create sends no post_save, so the monthly stats are told directly.
+            record_symbols_added(entry, new_symbol_ids)
+        if interpretations:
+            if not is_new:
+                Interpretation.objects.filter(dream_id=entry.pk, angle__in=interpretations).delete()
+            Interpretation.objects.bulk_create(
+                [
+                    Interpretation(
+                        dream=entry,
+                        angle=angle,
+                        summary=summary,
+                        model=interpretation_model,
+                        prompt_version=prompt_version,
+                    )
+                    for angle, summary in interpretations.items()
+                ]
+            )
+        if followup:
+            DreamMessage.objects.create(
+                dream=entry,
+                role=DreamMessage.ROLE_ASSISTANT,
+                content=followup,
+            )
+        if enqueue:
+            DreamJob.objects.create(dream=entry, kind=DreamJob.KIND_INTERPRET)
+        if entry.privacy == DreamEntry.PRIVACY_PUBLIC:
+            # entry.save() already synced the item, before the tags above were linked.
+            sync_feed_item(entry, is_new)
+    return entry
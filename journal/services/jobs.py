@@ -0,0 +1,224 @@
+import logging
+from datetime import timedelta
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from ..models import DreamEntry, DreamJob, Interpretation
+from .ai import (
+    DEFAULT_MODEL,
+    INTERPRET_PROMPT_VERSION,
+    IncompleteInterpretation,
+    interpret_and_extract,
+)
+from .fragments import bump_entry_version
+from .ingest import ingest_dream
+from .throttle import Throttled, in_flight
+
+logger = logging.getLogger(__name__)
+
+PENDING_PSYCH_SUMMARY = "Psychological interpretation pending."
+PENDING_SPIRITUAL_SUMMARY = "Spiritual interpretation pending."
+DEFAULT_FOLLOWUP = "What emotion felt strongest in this dream?"
+PROGRESS_KEY = "dream:{}:interpretation"
+
+
+def enqueue_interpretation(entry: DreamEntry) -> DreamJob:
+    if entry.job_status != DreamEntry.JOB_PENDING:
+        entry.job_status = DreamEntry.JOB_PENDING
+        entry.save(update_fields=["job_status"])
+    return DreamJob.objects.create(dream=entry, kind=DreamJob.KIND_INTERPRET)
+
+
+def apply_interpretation(entry: DreamEntry, ai_data: dict[str, Any], job_status: str) -> None:
+    # Placeholders carry no model/prompt version, so the backfill command finds them.
+    interpreted = bool(ai_data.get("psych_summary") and ai_data.get("spiritual_summary"))
+    entry.title = (ai_data.get("title") or entry.title or "Untitled Dream").strip()
+    entry.emotions = ai_data.get("emotions") or []
+    entry.people = ai_data.get("people") or []
+    entry.settings = ai_data.get("settings") or []
+    entry.job_status = job_status
+    ingest_dream(
+        entry,
+        tags=ai_data.get("tags") or [],
+        symbols=ai_data.get("symbols") or [],
+        interpretations={
+            Interpretation.ANGLE_PSYCH: ai_data.get("psych_summary") or PENDING_PSYCH_SUMMARY,
+            Interpretation.ANGLE_SPIRITUAL: (
+                ai_data.get("spiritual_summary") or PENDING_SPIRITUAL_SUMMARY
+            ),
+        },
+        interpretation_model=DEFAULT_MODEL if interpreted else "",
+        prompt_version=INTERPRET_PROMPT_VERSION if interpreted else "",
+        followup=ai_data.get("followup_question") or DEFAULT_FOLLOWUP,
+    )
+
+
+def interpretations_to_backfill():
+    """Dreams stuck on placeholder text or interpreted with an older prompt version."""
+    placeholders = Interpretation.objects.filter(
+        dream=OuterRef("pk"),
+        summary__in=[PENDING_PSYCH_SUMMARY, PENDING_SPIRITUAL_SUMMARY],
+    )
+    outdated = Interpretation.objects.exclude(prompt_version=INTERPRET_PROMPT_VERSION)
+    return (
+        DreamEntry.objects.filter(pk__in=outdated.values("dream_id"))
+        # Dreams still owned by a job worker are left to it.
+        .exclude(job_status__in=[DreamEntry.JOB_PENDING, DreamEntry.JOB_PROCESSING])
+        .annotate(has_placeholders=Exists(placeholders))
+    )
+
+
+def reinterpret(entry: DreamEntry, full: bool) -> bool:
+    """Re-run interpretation for one dream; returns False if the provider gave no summaries.
+
+    ``full`` also fills in title, tags, symbols and the follow-up question, which a
+    dream stuck on placeholders never received.
+    """
+    ai_data = interpret_and_extract(entry.narrative)
+    psych, spiritual = ai_data.get("psych_summary"), ai_data.get("spiritual_summary")
+    if not (psych and spiritual):
+        return False
+    with transaction.atomic():
+        if full:
+            apply_interpretation(entry, ai_data, DreamEntry.JOB_READY)
+            return True
+        Interpretation.objects.filter(
+            dream=entry,
+            angle__in=[Interpretation.ANGLE_PSYCH, Interpretation.ANGLE_SPIRITUAL],
+        ).delete()
+        Interpretation.objects.bulk_create(
+            [
+                Interpretation(
+                    dream=entry,
+                    angle=angle,
+                    summary=summary,
+                    model=DEFAULT_MODEL,
+                    prompt_version=INTERPRET_PROMPT_VERSION,
+                )
+                for angle, summary in (
+                    (Interpretation.ANGLE_PSYCH, psych),
+                    (Interpretation.ANGLE_SPIRITUAL, spiritual),
+                )
+            ]
+        )
+        # bulk_create sends no post_save, so cached fragments are told directly.
+        transaction.on_commit(lambda: bump_entry_version(entry.pk))
+    return True
+
+
+def claim_job(worker_id: str) -> DreamJob | None:
+    now = timezone.now()
+    candidates = list(
+        DreamJob.objects.filter(status=DreamJob.STATUS_QUEUED, run_after__lte=now)
+        .order_by("run_after", "id")
+        .values_list("pk", flat=True)[:10]
+    )
+    for pk in candidates:
+        # The conditional UPDATE is the lock: only one worker sees a row count of 1.
+        claimed = DreamJob.objects.filter(pk=pk, status=DreamJob.STATUS_QUEUED).update(
+            status=DreamJob.STATUS_RUNNING,
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+            updated_at=now,
+        )
+        if claimed:
+            return DreamJob.objects.select_related("dream").get(pk=pk)
+    return None
+
+
+def requeue_stale_jobs() -> int:
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_STALE_SECONDS)
+    return DreamJob.objects.filter(
+        status=DreamJob.STATUS_RUNNING,
+        locked_at__lt=cutoff,
+    ).update(status=DreamJob.STATUS_QUEUED, locked_by="", locked_at=None)
+
+
+def interpretation_progress(pk: int) -> dict[str, Any]:
+    """Fields of a running interpretation that have finished streaming so far."""
+    return cache.get(PROGRESS_KEY.format(pk)) or {}
+
+
+def run_job(job: DreamJob) -> None:
+    entry = job.dream
+    DreamEntry.objects.filter(pk=entry.pk).update(job_status=DreamEntry.JOB_PROCESSING)
+    key = PROGRESS_KEY.format(entry.pk)
+    progress: dict[str, Any] = {}
+
+    def publish(field: str, value: Any) -> None:
+        # Polled by the home session partial; a crashed worker's copy simply expires.
+        progress[field] = value
+        cache.set(key, progress, settings.JOB_STALE_SECONDS)
+
+    try:
+        try:
+            with in_flight(entry.user_id):
+                ai_data = interpret_and_extract(entry.narrative, on_field=publish)
+        except Throttled as exc:
+            _defer(job, exc.retry_after)
+            return
+        except IncompleteInterpretation as exc:
+            logger.warning("Job %s attempt %s cut off: %s", job.pk, job.attempts, exc)
+            _handle_failure(job, str(exc), partial=exc.data)
+            # The finished fields stay on show (they expire) while the retry waits.
+            progress = {}
+            return
+        except Exception as exc:
+            logger.warning("Job %s attempt %s failed: %s", job.pk, job.attempts, exc)
+            _handle_failure(job, str(exc))
+            return
+
+        with transaction.atomic():
+            apply_interpretation(entry, ai_data, DreamEntry.JOB_READY)
+            _finish(job, DreamJob.STATUS_DONE)
+    finally:
+        if progress:
+            cache.delete(key)
+
+
+def _defer(job: DreamJob, delay: float) -> None:
+    # The user already has their share of workers busy; this is not a failed attempt.
+    job.attempts -= 1
+    job.run_after = timezone.now() + timedelta(seconds=delay)
+    DreamEntry.objects.filter(pk=job.dream_id).update(job_status=DreamEntry.JOB_PENDING)
+    _finish(job, DreamJob.STATUS_QUEUED, extra_fields=("attempts",))
+
+
+def _handle_failure(job: DreamJob, error: str, partial: dict[str, Any] | None = None) -> None:
+    entry = job.dream
+    job.last_error = error
+    if job.attempts < settings.JOB_MAX_ATTEMPTS:
+        delay = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+        job.run_after = timezone.now() + timedelta(seconds=delay)
+        DreamEntry.objects.filter(pk=entry.pk).update(job_status=DreamEntry.JOB_PENDING)
+        _finish(job, DreamJob.STATUS_QUEUED)
+        return
+
+    # Out of retries: store what the last attempt finished, placeholders for the rest,
+    # so the dream is still usable.
+    with transaction.atomic():
+        apply_interpretation(entry, partial or {}, DreamEntry.JOB_FAILED)
+        _finish(job, DreamJob.STATUS_FAILED)
+
+
+def _finish(job: DreamJob, status: str, extra_fields: tuple[str, ...] = ()) -> None:
+    job.status = status
+    job.locked_by = ""
+    job.locked_at = None
+    job.save(
+        update_fields=[
+            "status",
+            "last_error",
+            "run_after",
+            "locked_by",
+            "locked_at",
+            "updated_at",
+            *extra_fields,
+        ]
+    )
@@ -0,0 +1,108 @@
+import json
+from typing import Any
+
+
+class JSONFieldStream:
+    """Incremental parser for a JSON object that arrives in pieces.
+
+    ``feed`` returns the top-level ``(key, value)`` pairs completed by the new text,
+    so a caller can act on ``"title"`` before the summaries have been generated.
+    Every character is scanned once; a value is decoded with ``json.loads`` only
+    when its closing character arrives, and consumed text is dropped.
+    Anything before the opening brace (e.g. a code fence) is ignored.
+    """
+
+    def __init__(self):
+        self.data: dict[str, Any] = {}
+        self.complete = False
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._after_colon = False
+        self._start: int | None = None
+        self._key: str | None = None
+
+    def feed(self, chunk: str) -> list[tuple[str, Any]]:
+        """Raises ValueError if the text is not a JSON object."""
+        self._text += chunk
+        text, done = self._text, []
+        index = self._pos
+        while index < len(text) and not self.complete:
+            char = text[index]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._end_token(index + 1, done)
+            elif self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+            elif char == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    self._start = index
+            elif char in "{[":
+                if self._depth == 1:
+                    self._start = index
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 1:
+                    self._end_token(index + 1, done)
+                elif self._depth == 0:
+                    self._end_primitive(index, done)
+                    self.complete = True
+            elif self._depth == 1:
+                if char == ":":
+                    self._after_colon = True
+                elif char == ",":
+                    self._end_primitive(index, done)
+                elif not char.isspace() and self._start is None:
+                    self._start = index
+            index += 1
+        cut = index if self._start is None else self._start
+        self._text = text[cut:]
+        self._pos = index - cut
+        if self._start is not None:
+            self._start -= cut
+        return done
+
+    def _decode(self, raw: str) -> Any:
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Invalid JSON near {raw[:40]!r}: {exc}") from exc
+
+    def _end_token(self, end: int, done: list) -> None:
+        raw = self._text[self._start : end]
+        self._start = None
+        if self._after_colon:
+            self._value(raw, done)
+            return
+        key = self._decode(raw)
+        if not isinstance(key, str):
+            raise ValueError(f"Invalid object key {raw[:40]!r}")
+        self._key = key
+
+    def _end_primitive(self, end: int, done: list) -> None:
+        # Numbers, true, false and null have no closing character; "," or "}" ends them.
+        if self._start is None:
+            return
+        raw = self._text[self._start : end].strip()
+        self._start = None
+        if not self._after_colon:
+            raise ValueError(f"Invalid object key {raw[:40]!r}")
+        self._value(raw, done)
+
+    def _value(self, raw: str, done: list) -> None:
+        value = self._decode(raw)
+        self.data[self._key] = value
+        done.append((self._key, value))
+        self._key = None
+        self._after_colon = False
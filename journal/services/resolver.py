@@ -0,0 +1,101 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from functools import partial
+from typing import Any
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.signals import post_delete
+
+from ..models import Symbol, Tag
+from ..naming import canonical_name
+
+
+class NameResolver:
+    """Map names to primary keys in a fixed number of queries, creating missing rows.
+
+    Names are matched on their canonical key, so "Snakes" resolves to the "snake" row.
+    """
+
+    def __init__(self, model: type[models.Model], defaults: dict[str, Any] | None = None):
+        self.model = model
+        self.defaults = defaults or {}
+        self.max_length = model._meta.get_field("name").max_length
+        self._lock = threading.Lock()
+        # canonical key -> id
+        self._ids: OrderedDict[str, int] = OrderedDict()
+        post_delete.connect(self._forget, sender=model, weak=False)
+
+    def _clean(self, names: Iterable[str]) -> list[str]:
+        cleaned = []
+        for name in names:
+            name = (name or "").strip()[: self.max_length]
+            if name and name not in cleaned:
+                cleaned.append(name)
+        return cleaned
+
+    def _key(self, name: str) -> str:
+        return canonical_name(name)[: self.max_length]
+
+    def _cached(self, keys: list[str]) -> dict[str, int]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._ids:
+                    self._ids.move_to_end(key)
+                    found[key] = self._ids[key]
+        return found
+
+    def _remember(self, found: dict[str, int]) -> None:
+        with self._lock:
+            self._ids.update(found)
+            while len(self._ids) > settings.NAME_RESOLVER_CACHE_SIZE:
+                self._ids.popitem(last=False)
+
+    def _forget(self, sender, instance, **kwargs) -> None:
+        with self._lock:
+            self._ids.pop(instance.key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids.clear()
+
+    def resolve_map(self, names: Iterable[str]) -> dict[str, int]:
+        """Cleaned name -> id; near-duplicate names map to the same id."""
+        names = self._clean(names)
+        keys = {name: self._key(name) for name in names}
+        found = self._cached(list(dict.fromkeys(keys.values())))
+        missing = [key for key in dict.fromkeys(keys.values()) if key not in found]
+        if missing:
+            fetched = dict(self.model.objects.filter(key__in=missing).values_list("key", "id"))
+            # The first spelling seen becomes the display name of a new row.
+            new = {}
+            for name, key in keys.items():
+                if key not in fetched and key not in found:
+                    new.setdefault(key, name)
+            if new:
+                # ignore_conflicts lets a concurrent insert of the same name win quietly;
+                # the re-select below picks up whichever row ended up in the table.
+                self.model.objects.bulk_create(
+                    [
+                        self.model(name=name, key=key, **self.defaults)
+                        for key, name in sorted(new.items())
+                    ],
+                    ignore_conflicts=True,
+                )
+                fetched.update(
+                    self.model.objects.filter(key__in=new).values_list("key", "id")
+                )
+            # Rows created inside a transaction that later rolls back must not be cached.
+            transaction.on_commit(partial(self._remember, fetched))
+            found.update(fetched)
+        return {name: found[key] for name, key in keys.items() if key in found}
+
+    def resolve(self, names: Iterable[str]) -> list[int]:
+        """Distinct ids for ``names``, in the order the names first appear."""
+        return list(dict.fromkeys(self.resolve_map(names).values()))
+
+
+tag_resolver = NameResolver(Tag)
+symbol_resolver = NameResolver(Symbol, defaults={"category": Symbol.CATEGORY_ABSTRACT})
@@ -0,0 +1,176 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from ..models import DreamEntry
+
+FTS_TABLE = "journal_dreamentry_fts"
+TSVECTOR_CONFIG = "english"  # must match the generated column in migration 0005
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Rebuilding journal_dreamentry on SQLite (AlterField, some AddFields) drops its
+# triggers, so they are re-created after every migrate.
+SQLITE_TRIGGERS = {
+    f"{FTS_TABLE}_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON journal_dreamentry BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, narrative)
+            VALUES (new.id, new.title, new.narrative);
+        END
+    """,
+    f"{FTS_TABLE}_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON journal_dreamentry BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, narrative)
+            VALUES ('delete', old.id, old.title, old.narrative);
+        END
+    """,
+    f"{FTS_TABLE}_au": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF title, narrative ON journal_dreamentry BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, narrative)
+            VALUES ('delete', old.id, old.title, old.narrative);
+            INSERT INTO {FTS_TABLE}(rowid, title, narrative)
+            VALUES (new.id, new.title, new.narrative);
+        END
+    """,
+}
+
+
+class SearchBackend:
+    def search(
+        self, query: str, user=None, limit: int = 20, offset: int = 0, within=None
+    ) -> list[int]:
+        """Return DreamEntry ids matching ``query``, best match first.
+
+        ``within`` is an optional DreamEntry queryset (e.g. a filtered list) that
+        results must also belong to.
+        """
+        raise NotImplementedError
+
+
+def _within_sql(within, column: str) -> tuple[str, tuple]:
+    sql, params = within.values("pk").query.sql_with_params()
+    return f"AND {column} IN ({sql})", params
+
+
+class PostgresSearchBackend(SearchBackend):
+    # search_vector is a generated, GIN-indexed tsvector column (see migration 0005).
+    def search(self, query, user=None, limit=20, offset=0, within=None):
+        if not query.strip():
+            return []
+        sql = [
+            "SELECT id FROM journal_dreamentry, websearch_to_tsquery(%s, %s) AS q",
+            "WHERE search_vector @@ q",
+        ]
+        params: list = [TSVECTOR_CONFIG, query]
+        if user is not None:
+            sql.append("AND user_id = %s")
+            params.append(user.pk)
+        if within is not None:
+            condition, within_params = _within_sql(within, "id")
+            sql.append(condition)
+            params += within_params
+        sql.append("ORDER BY ts_rank(search_vector, q) DESC, id DESC LIMIT %s OFFSET %s")
+        params += [limit, offset]
+        with connection.cursor() as cursor:
+            cursor.execute(" ".join(sql), params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+class SQLiteSearchBackend(SearchBackend):
+    # journal_dreamentry_fts is an external-content FTS5 table kept in sync by triggers.
+    @staticmethod
+    def match_expression(query: str) -> str:
+        # Quote every token so user input can never be parsed as FTS5 syntax.
+        return " ".join(f'"{token}"*' for token in TOKEN_RE.findall(query))
+
+    def search(self, query, user=None, limit=20, offset=0, within=None):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        sql = [
+            f"SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE}",
+            f"JOIN journal_dreamentry ON journal_dreamentry.id = {FTS_TABLE}.rowid",
+            f"WHERE {FTS_TABLE} MATCH %s",
+        ]
+        params: list = [expression]
+        if user is not None:
+            sql.append("AND journal_dreamentry.user_id = %s")
+            params.append(user.pk)
+        if within is not None:
+            condition, within_params = _within_sql(within, "journal_dreamentry.id")
+            sql.append(condition)
+            params += within_params
+        sql.append(f"ORDER BY bm25({FTS_TABLE}, 2.0, 1.0), {FTS_TABLE}.rowid DESC LIMIT %s OFFSET %s")
+        params += [limit, offset]
+        with connection.cursor() as cursor:
+            cursor.execute(" ".join(sql), params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+class FallbackSearchBackend(SearchBackend):
+    def search(self, query, user=None, limit=20, offset=0, within=None):
+        tokens = TOKEN_RE.findall(query)
+        if not tokens:
+            return []
+        queryset = DreamEntry.objects.all()
+        if user is not None:
+            queryset = queryset.filter(user=user)
+        if within is not None:
+            queryset = queryset.filter(pk__in=within.values("pk"))
+        for token in tokens:
+            queryset = queryset.filter(Q(title__icontains=token) | Q(narrative__icontains=token))
+        ids = queryset.order_by("-date_dreamed", "-id").values_list("id", flat=True)
+        return list(ids[offset : offset + limit])
+
+
+def _sqlite_objects(cursor, kind: str) -> set[str]:
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = %s", [kind])
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _sqlite_fts_available() -> bool:
+    with connection.cursor() as cursor:
+        return FTS_TABLE in _sqlite_objects(cursor, "table")
+
+
+def ensure_search_triggers(using: str = "default", **kwargs) -> None:
+    db = connections[using]
+    if db.vendor != "sqlite":
+        return
+    with db.cursor() as cursor:
+        if FTS_TABLE not in _sqlite_objects(cursor, "table"):
+            return
+        missing = set(SQLITE_TRIGGERS) - _sqlite_objects(cursor, "trigger")
+        if not missing:
+            return
+        for name in missing:
+            cursor.execute(SQLITE_TRIGGERS[name])
+        # Writes made while the triggers were gone never reached the index.
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+@lru_cache(maxsize=None)
+def _backend_for(path: str | None, vendor: str) -> SearchBackend:
+    if path:
+        return import_string(path)()
+    if vendor == "postgresql":
+        return PostgresSearchBackend()
+    if vendor == "sqlite" and _sqlite_fts_available():
+        return SQLiteSearchBackend()
+    return FallbackSearchBackend()
+
+
+def get_search_backend() -> SearchBackend:
+    return _backend_for(settings.DREAM_SEARCH_BACKEND, connection.vendor)
+
+
+def search_dreams(
+    query: str, user=None, limit: int = 20, offset: int = 0, within=None
+) -> list[int]:
+    return get_search_backend().search(
+        query, user=user, limit=limit, offset=offset, within=within
+    )
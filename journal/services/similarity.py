@@ -0,0 +1,335 @@
+import hashlib
+import logging
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from functools import lru_cache, partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from ..models import DreamEmbedding, DreamEntry
+from .client import clients
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - similar dreams are simply disabled
+    np = None
+
+COMMUNITY = "community"
+TOKEN_RE = re.compile(r"[^\W\d_]{3,}", re.UNICODE)
+STOPWORDS = frozenset(
+    "and are but for had has have her him his its not our she that the then there "
+    "they this was were what when where which while who with you your".split()
+)
+
+
+# Fields read by embedding_text, plus those that decide when and where a dream is indexed.
+EMBEDDED_FIELDS = ("title", "narrative")
+INDEX_STATE_FIELDS = (*EMBEDDED_FIELDS, "privacy", "job_status")
+
+
+def embedding_text(entry: DreamEntry) -> str:
+    return f"{entry.title}\n{entry.narrative}"
+
+
+def _normalized(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class EmbeddingProvider:
+    name: str
+    dimensions: int
+
+    def embed(self, texts: list[str]):
+        """Return a float32 array of shape (len(texts), dimensions) with unit-length rows."""
+        raise NotImplementedError
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """Feature-hashed bag of words and bigrams: deterministic, offline, no model files."""
+
+    def __init__(self, dimensions: int | None = None):
+        self.dimensions = dimensions or settings.DREAM_EMBEDDING_DIMENSIONS
+        self.name = f"hashing-v1-{self.dimensions}"
+
+    def _features(self, text: str) -> Counter:
+        words = [word for word in TOKEN_RE.findall(text.casefold()) if word not in STOPWORDS]
+        return Counter(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in self._features(text).items():
+                # blake2b rather than hash(): the value must not change between processes.
+                digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                sign = 1.0 if value & 1 else -1.0
+                matrix[row, (value >> 1) % self.dimensions] += sign * (1.0 + math.log(count))
+        return _normalized(matrix)
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    def __init__(self, model: str | None = None, dimensions: int | None = None):
+        self.model = model or settings.AI_EMBEDDING_MODEL
+        self.dimensions = dimensions or settings.DREAM_EMBEDDING_DIMENSIONS
+        self.name = f"{self.model}-{self.dimensions}"
+
+    def embed(self, texts):
+        response = clients.call(
+            lambda client, timeout: client.embeddings.create(
+                model=self.model,
+                input=texts,
+                dimensions=self.dimensions,
+                timeout=timeout,
+            ),
+            settings.AI_REQUEST_TIMEOUT,
+        )
+        return _normalized(np.array([item.embedding for item in response.data], dtype=np.float32))
+
+
+@lru_cache(maxsize=None)
+def _provider_for(path: str) -> EmbeddingProvider:
+    return import_string(path)()
+
+
+def get_embedding_provider() -> EmbeddingProvider:
+    return _provider_for(settings.DREAM_EMBEDDING_PROVIDER)
+
+
+@dataclass
+class ScopeMatrix:
+    ids: "np.ndarray"  # int64 dream ids
+    owners: "np.ndarray"  # int64 user ids
+    vectors: "np.ndarray"  # float32, one unit-length row per dream
+    version: int
+
+
+class SimilarityIndex:
+    """Top-k cosine search over per-user (and community) embedding matrices.
+
+    Matrices are loaded once per scope and kept in a bounded LRU. A version
+    counter in the Django cache tells each process when another one has
+    written to a scope; the writing process patches its own copy in place.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._matrices: OrderedDict[str, ScopeMatrix] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return np is not None
+
+    @staticmethod
+    def user_scope(user_id: int) -> str:
+        return f"user:{user_id}"
+
+    @staticmethod
+    def _version_key(scope: str) -> str:
+        return f"similar:{scope}:version"
+
+    def _version(self, scope: str) -> int:
+        return cache.get(self._version_key(scope), 0)
+
+    def _bump(self, scope: str) -> int:
+        key = self._version_key(scope)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            cache.add(key, 0, timeout=None)
+            return cache.incr(key)
+
+    def _load(self, scope: str, version: int) -> ScopeMatrix:
+        rows = DreamEmbedding.objects.filter(model=get_embedding_provider().name)
+        if scope == COMMUNITY:
+            rows = rows.filter(dream__privacy=DreamEntry.PRIVACY_PUBLIC)
+        else:
+            rows = rows.filter(dream__user_id=int(scope.split(":", 1)[1]))
+        ids, owners, blobs = [], [], []
+        for dream_id, user_id, vector in rows.values_list("dream_id", "dream__user_id", "vector"):
+            ids.append(dream_id)
+            owners.append(user_id)
+            blobs.append(bytes(vector))
+        dimensions = get_embedding_provider().dimensions
+        vectors = np.frombuffer(b"".join(blobs), dtype="<f4").reshape(len(ids), dimensions)
+        return ScopeMatrix(
+            np.array(ids, dtype=np.int64),
+            np.array(owners, dtype=np.int64),
+            vectors.copy(),
+            version,
+        )
+
+    def matrix(self, scope: str) -> ScopeMatrix:
+        version = self._version(scope)
+        with self._lock:
+            loaded = self._matrices.get(scope)
+            if loaded is not None and loaded.version == version:
+                self._matrices.move_to_end(scope)
+                return loaded
+        loaded = self._load(scope, version)
+        with self._lock:
+            self._matrices[scope] = loaded
+            self._matrices.move_to_end(scope)
+            while len(self._matrices) > settings.SIMILAR_DREAMS_CACHE_SIZE:
+                self._matrices.popitem(last=False)
+        return loaded
+
+    def index(self, entries: Iterable[DreamEntry]) -> None:
+        """Embed and store ``entries``; loaded matrices are patched once the transaction commits."""
+        entries = [entry for entry in entries if entry.pk is not None]
+        if not self.enabled or not entries:
+            return
+        provider = get_embedding_provider()
+        vectors = provider.embed([embedding_text(entry) for entry in entries])
+        DreamEmbedding.objects.bulk_create(
+            [
+                DreamEmbedding(
+                    dream_id=entry.pk,
+                    model=provider.name,
+                    dimensions=provider.dimensions,
+                    vector=vector.astype("<f4").tobytes(),
+                )
+                for entry, vector in zip(entries, vectors)
+            ],
+            update_conflicts=True,
+            unique_fields=["dream"],
+            update_fields=["model", "dimensions", "vector", "updated_at"],
+        )
+        changes = [
+            (entry.pk, entry.user_id, entry.privacy == DreamEntry.PRIVACY_PUBLIC, vector)
+            for entry, vector in zip(entries, vectors)
+        ]
+        transaction.on_commit(partial(self._apply, changes))
+
+    def index_on_commit(self, entries: Iterable[DreamEntry]) -> None:
+        """Index ``entries`` once the current transaction commits, outside of it.
+
+        The embedding provider may be a network call; if it fails the dreams are left
+        unindexed for ``manage.py embed_dreams`` rather than failing the write.
+        """
+        transaction.on_commit(partial(self._index_or_log, list(entries)))
+
+    def _index_or_log(self, entries: list[DreamEntry]) -> None:
+        try:
+            self.index(entries)
+        except Exception:
+            logger.warning("Could not embed dreams %s.", [e.pk for e in entries], exc_info=True)
+
+    def invalidate_on_commit(self, scope: str) -> None:
+        """Have every process reload ``scope`` once the current transaction commits."""
+        if self.enabled:
+            transaction.on_commit(partial(self._invalidate, scope))
+
+    def _invalidate(self, scope: str) -> None:
+        self._bump(scope)
+        with self._lock:
+            self._matrices.pop(scope, None)
+
+    def forget(self, entry: DreamEntry) -> None:
+        if self.enabled:
+            public = entry.privacy == DreamEntry.PRIVACY_PUBLIC
+            transaction.on_commit(partial(self._apply, [(entry.pk, entry.user_id, public, None)]))
+
+    def _apply(self, changes) -> None:
+        for dream_id, user_id, public, vector in changes:
+            scopes = [(self.user_scope(user_id), vector)]
+            if public:
+                scopes.append((COMMUNITY, vector))
+            for scope, row in scopes:
+                version = self._bump(scope)
+                with self._lock:
+                    loaded = self._matrices.get(scope)
+                    if loaded is None:
+                        continue
+                    if loaded.version != version - 1:
+                        # Someone else wrote to this scope too; reload on next use.
+                        del self._matrices[scope]
+                        continue
+                    self._matrices[scope] = self._patched(loaded, dream_id, user_id, row, version)
+
+    @staticmethod
+    def _patched(loaded: ScopeMatrix, dream_id, user_id, vector, version) -> ScopeMatrix:
+        keep = loaded.ids != dream_id
+        ids, owners, vectors = loaded.ids[keep], loaded.owners[keep], loaded.vectors[keep]
+        if vector is not None:
+            ids = np.append(ids, dream_id)
+            owners = np.append(owners, user_id)
+            vectors = np.vstack([vectors, vector[np.newaxis, :]])
+        return ScopeMatrix(ids, owners, vectors, version)
+
+    def similar(self, entry: DreamEntry, scope: str, limit: int | None = None) -> list[int]:
+        """Dream ids in ``scope`` most similar to ``entry``, best first."""
+        if not self.enabled:
+            return []
+        limit = limit or settings.SIMILAR_DREAMS_LIMIT
+        loaded = self.matrix(scope)
+        if not len(loaded.ids):
+            return []
+        position = np.flatnonzero(loaded.ids == entry.pk)
+        if position.size:
+            query = loaded.vectors[position[0]]
+        else:
+            query = get_embedding_provider().embed([embedding_text(entry)])[0]
+        scores = loaded.vectors @ query
+        scores[loaded.ids == entry.pk] = -np.inf
+        if scope == COMMUNITY:
+            scores[loaded.owners == entry.user_id] = -np.inf
+        k = min(limit, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [int(loaded.ids[i]) for i in top if scores[i] > 0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._matrices.clear()
+
+
+similarity_index = SimilarityIndex()
+
+
+def entry_pre_save(sender, instance: DreamEntry, update_fields=None, raw=False, **kwargs):
+    instance._index_before = None
+    if raw or instance._state.adding or instance.pk is None or not similarity_index.enabled:
+        return
+    if update_fields is not None and not set(INDEX_STATE_FIELDS).intersection(update_fields):
+        return
+    instance._index_before = (
+        DreamEntry.objects.filter(pk=instance.pk).values(*INDEX_STATE_FIELDS).first()
+    )
+
+
+def entry_post_save(sender, instance: DreamEntry, created, raw=False, **kwargs):
+    # Embeddings follow every save, admin edits included: new dreams (an enqueued one
+    # once its interpretation is written back) and changed titles or narratives.
+    if raw:
+        return
+    if created:
+        if not instance.is_pending:
+            similarity_index.index_on_commit([instance])
+        return
+    before = getattr(instance, "_index_before", None)
+    if before is None:
+        return
+    interpreted = (
+        before["job_status"] in (DreamEntry.JOB_PENDING, DreamEntry.JOB_PROCESSING)
+        and not instance.is_pending
+    )
+    if interpreted or any(before[field] != getattr(instance, field) for field in EMBEDDED_FIELDS):
+        similarity_index.index_on_commit([instance])
+    public = DreamEntry.PRIVACY_PUBLIC
+    if (before["privacy"] == public) != (instance.privacy == public):
+        similarity_index.invalidate_on_commit(COMMUNITY)
+
+
+def entry_post_delete(sender, instance: DreamEntry, **kwargs):
+    similarity_index.forget(instance)
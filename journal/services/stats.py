@@ -0,0 +1,276 @@
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from ..models import DreamEntry, DreamSymbol, MonthlyDreamStats, Symbol
+
+TRACKED_FIELDS = {"user", "user_id", "date_dreamed", "emotions", "mood_rating"}
+
+StatsKey = tuple[int, date]
+
+
+def month_of(value) -> date:
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.replace(day=1)
+
+
+def _emotion_key(emotion) -> str:
+    return str(emotion).strip().casefold()
+
+
+@dataclass
+class StatsDelta:
+    dreams: int = 0
+    symbols: Counter = field(default_factory=Counter)
+    emotions: Counter = field(default_factory=Counter)
+    moods: Counter = field(default_factory=Counter)
+
+    def add_entry(self, emotions, mood_rating, symbol_ids: Iterable[int] = (), sign: int = 1):
+        self.dreams += sign
+        self.add_symbols(symbol_ids, sign)
+        for emotion in {_emotion_key(emotion) for emotion in emotions or []} - {""}:
+            self.emotions[emotion] += sign
+        if mood_rating is not None:
+            self.moods[str(mood_rating)] += sign
+
+    def add_symbols(self, symbol_ids: Iterable[int], sign: int = 1):
+        for symbol_id in symbol_ids:
+            self.symbols[str(symbol_id)] += sign
+
+    def apply_to(self, stats: MonthlyDreamStats) -> None:
+        stats.dream_count = max(0, stats.dream_count + self.dreams)
+        stats.symbol_counts = _merged(stats.symbol_counts, self.symbols)
+        stats.emotion_counts = _merged(stats.emotion_counts, self.emotions)
+        stats.mood_counts = _merged(stats.mood_counts, self.moods)
+
+
+def _merged(counts: dict[str, int], delta: Counter) -> dict[str, int]:
+    merged = Counter(counts)
+    merged.update(delta)
+    return {key: value for key, value in sorted(merged.items()) if value > 0}
+
+
+class StatsBatch:
+    def __init__(self):
+        self.deltas: defaultdict[StatsKey, StatsDelta] = defaultdict(StatsDelta)
+        self.dream_keys: dict[int, StatsKey] = {}
+        self.dream_symbols: defaultdict[int, Counter] = defaultdict(Counter)
+
+    def delta(self, user_id: int, month: date) -> StatsDelta:
+        return self.deltas[(user_id, month)]
+
+    def remember(self, entry: DreamEntry) -> None:
+        self.dream_keys[entry.pk] = (entry.user_id, month_of(entry.date_dreamed))
+
+    def add_dream_symbol(self, dream_id: int, symbol_id: int, sign: int) -> None:
+        self.dream_symbols[dream_id][str(symbol_id)] += sign
+
+    def flush(self) -> None:
+        unknown = set(self.dream_symbols) - set(self.dream_keys)
+        if unknown:
+            for pk, user_id, dreamed in DreamEntry.objects.filter(pk__in=unknown).values_list(
+                "pk", "user_id", "date_dreamed"
+            ):
+                self.dream_keys[pk] = (user_id, month_of(dreamed))
+        for dream_id, symbols in self.dream_symbols.items():
+            if dream_id in self.dream_keys:
+                self.deltas[self.dream_keys[dream_id]].symbols.update(symbols)
+        self.dream_symbols.clear()
+
+        changed = {
+            key: delta
+            for key, delta in self.deltas.items()
+            if delta.dreams or any(delta.symbols.values())
+            or any(delta.emotions.values()) or any(delta.moods.values())
+        }
+        self.deltas.clear()
+        if not changed:
+            return
+        with transaction.atomic(savepoint=False):
+            # Sorted so concurrent writers lock rows in the same order.
+            for (user_id, month), delta in sorted(changed.items()):
+                _apply(user_id, month, delta)
+
+
+def _apply(user_id: int, month: date, delta: StatsDelta) -> None:
+    rows = MonthlyDreamStats.objects.select_for_update().filter(user_id=user_id, month=month)
+    stats = rows.first()
+    if stats is None:
+        stats = MonthlyDreamStats(user_id=user_id, month=month)
+        delta.apply_to(stats)
+        try:
+            with transaction.atomic():
+                stats.save(force_insert=True)
+            return
+        except IntegrityError:
+            # Another writer created the row first; fall through and update theirs.
+            stats = rows.get()
+    delta.apply_to(stats)
+    stats.save()
+
+
+_current_batch: ContextVar[StatsBatch | None] = ContextVar("stats_batch", default=None)
+
+
+@contextmanager
+def stats_batch():
+    """Collect stats changes and write them once, with one row update per user-month.
+
+    Nested batches join the outermost one. Nothing is written if the block raises.
+    """
+    batch = _current_batch.get()
+    if batch is not None:
+        yield batch
+        return
+    batch = StatsBatch()
+    token = _current_batch.set(batch)
+    try:
+        yield batch
+    finally:
+        _current_batch.reset(token)
+    batch.flush()
+
+
+def _origin_model(origin):
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+def entry_pre_save(sender, instance: DreamEntry, update_fields=None, raw=False, **kwargs):
+    instance._stats_before = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not TRACKED_FIELDS.intersection(update_fields):
+        return
+    instance._stats_before = (
+        DreamEntry.objects.filter(pk=instance.pk)
+        .values("user_id", "date_dreamed", "emotions", "mood_rating")
+        .first()
+    )
+
+
+def entry_post_save(sender, instance: DreamEntry, created, raw=False, **kwargs):
+    if raw:
+        return
+    before = getattr(instance, "_stats_before", None)
+    if not created and before is None:
+        return
+    with stats_batch() as batch:
+        batch.remember(instance)
+        user_id, month = batch.dream_keys[instance.pk]
+        if created:
+            batch.delta(user_id, month).add_entry(instance.emotions, instance.mood_rating)
+            return
+        old_key = (before["user_id"], month_of(before["date_dreamed"]))
+        symbol_ids = []
+        if old_key != (user_id, month):
+            symbol_ids = list(
+                DreamSymbol.objects.filter(dream_id=instance.pk).values_list("symbol_id", flat=True)
+            )
+        batch.delta(*old_key).add_entry(
+            before["emotions"], before["mood_rating"], symbol_ids, sign=-1
+        )
+        batch.delta(user_id, month).add_entry(instance.emotions, instance.mood_rating, symbol_ids)
+
+
+def entry_pre_delete(sender, instance: DreamEntry, origin=None, **kwargs):
+    # Deleting a user drops their stats rows by cascade; nothing to subtract.
+    if _origin_model(origin) is not DreamEntry:
+        return
+    instance._stats_symbol_ids = list(
+        DreamSymbol.objects.filter(dream_id=instance.pk).values_list("symbol_id", flat=True)
+    )
+
+
+def entry_post_delete(sender, instance: DreamEntry, origin=None, **kwargs):
+    if _origin_model(origin) is not DreamEntry:
+        return
+    with stats_batch() as batch:
+        batch.delta(instance.user_id, month_of(instance.date_dreamed)).add_entry(
+            instance.emotions,
+            instance.mood_rating,
+            getattr(instance, "_stats_symbol_ids", ()),
+            sign=-1,
+        )
+
+
+def symbol_post_save(sender, instance: DreamSymbol, created, raw=False, **kwargs):
+    if created and not raw:
+        with stats_batch() as batch:
+            batch.add_dream_symbol(instance.dream_id, instance.symbol_id, 1)
+
+
+def symbol_post_delete(sender, instance: DreamSymbol, origin=None, **kwargs):
+    # Links removed along with their dream are subtracted by entry_post_delete.
+    if _origin_model(origin) in (DreamEntry, get_user_model()):
+        return
+    with stats_batch() as batch:
+        batch.add_dream_symbol(instance.dream_id, instance.symbol_id, -1)
+
+
+def record_symbols_added(entry: DreamEntry, symbol_ids: Iterable[int]) -> None:
+    """Count links created with bulk_create, which sends no post_save signal."""
+    with stats_batch() as batch:
+        batch.remember(entry)
+        for symbol_id in symbol_ids:
+            batch.add_dream_symbol(entry.pk, symbol_id, 1)
+
+
+def rebuild_stats(users=None) -> int:
+    """Recompute stats rows from scratch; returns the number of rows written."""
+    entries = DreamEntry.objects.all()
+    if users is not None:
+        entries = entries.filter(user__in=users)
+    deltas: defaultdict[StatsKey, StatsDelta] = defaultdict(StatsDelta)
+    for user_id, dreamed, emotions, mood_rating in entries.values_list(
+        "user_id", "date_dreamed", "emotions", "mood_rating"
+    ).iterator(chunk_size=2000):
+        deltas[(user_id, month_of(dreamed))].add_entry(emotions, mood_rating)
+    for user_id, dreamed, symbol_id in (
+        DreamSymbol.objects.filter(dream__in=entries)
+        .values_list("dream__user_id", "dream__date_dreamed", "symbol_id")
+        .iterator(chunk_size=2000)
+    ):
+        deltas[(user_id, month_of(dreamed))].add_symbols([symbol_id])
+
+    rows = []
+    for (user_id, month), delta in deltas.items():
+        stats = MonthlyDreamStats(user_id=user_id, month=month)
+        delta.apply_to(stats)
+        rows.append(stats)
+    with transaction.atomic():
+        existing = MonthlyDreamStats.objects.all()
+        if users is not None:
+            existing = existing.filter(user__in=users)
+        existing.delete()
+        MonthlyDreamStats.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def quick_stats(user) -> dict:
+    """Numbers for the "Quick stats" panel: at most two queries for any journal size."""
+    stats = MonthlyDreamStats.objects.filter(
+        user=user,
+        month=month_of(timezone.localdate()),
+    ).first()
+    if stats is None:
+        return {"month_count": 0, "top_symbol": None, "top_emotion": None, "top_mood": None}
+    top_symbol = None
+    if stats.top_symbol_id is not None:
+        top_symbol = (
+            Symbol.objects.filter(pk=stats.top_symbol_id).values_list("name", flat=True).first()
+        )
+    return {
+        "month_count": stats.dream_count,
+        "top_symbol": top_symbol,
+        "top_emotion": stats.top_emotion,
+        "top_mood": stats.top_mood,
+    }
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+from ..metrics import registry
+from .client import CircuitBreaker, clients
+
+logger = logging.getLogger(__name__)
+
+OUTCOME_OK = "ok"
+OUTCOME_CACHED = "cached"
+OUTCOME_INCOMPLETE = "incomplete"
+OUTCOME_ERROR = "error"
+OUTCOME_CANCELLED = "cancelled"
+
+# Seconds; spans a cached-connection chat reply up to a slow full interpretation.
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+
+AI_REQUESTS = registry.counter(
+    "nightcipher_ai_requests_total",
+    "AI calls by operation, model and outcome.",
+    ("operation", "model", "outcome"),
+)
+AI_LATENCY = registry.histogram(
+    "nightcipher_ai_request_duration_seconds",
+    "Wall time of AI provider calls, retries and streaming included.",
+    ("operation", "model"),
+    LATENCY_BUCKETS,
+)
+AI_TOKENS = registry.counter(
+    "nightcipher_ai_tokens_total",
+    "Tokens sent to (input) and generated by (output) the AI provider.",
+    ("operation", "model", "direction"),
+)
+registry.gauge(
+    "nightcipher_ai_circuit_open",
+    "1 while the AI provider circuit breaker is open or half-open.",
+    lambda: int(clients.breaker.state != CircuitBreaker.STATE_CLOSED),
+)
+
+
+@dataclass
+class AICall:
+    """Times one AI call and records it in the metrics registry when the block exits.
+
+    The block fills in the token counts and may set ``outcome``; an exception makes
+    it ``error``, or ``cancelled`` if the caller went away mid-stream.
+    """
+
+    operation: str
+    model: str
+    outcome: str = OUTCOME_OK
+    input_tokens: int = 0
+    output_tokens: int = 0
+    started: float = 0.0
+
+    def __enter__(self) -> "AICall":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is not None:
+            cancelled = issubclass(exc_type, (GeneratorExit, asyncio.CancelledError))
+            self.outcome = OUTCOME_CANCELLED if cancelled else OUTCOME_ERROR
+        self.record(time.perf_counter() - self.started)
+
+    def record(self, duration: float) -> None:
+        labels = {"operation": self.operation, "model": self.model}
+        AI_REQUESTS.inc(outcome=self.outcome, **labels)
+        if self.outcome == OUTCOME_CACHED:
+            return
+        AI_LATENCY.observe(duration, **labels)
+        AI_TOKENS.inc(self.input_tokens, direction="input", **labels)
+        AI_TOKENS.inc(self.output_tokens, direction="output", **labels)
+        logger.info(
+            "AI %s on %s: %s in %.0fms, %s input / %s output tokens",
+            self.operation,
+            self.model,
+            self.outcome,
+            duration * 1000,
+            self.input_tokens,
+            self.output_tokens,
+        )
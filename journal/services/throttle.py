@@ -0,0 +1,226 @@
+import logging
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from ..models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+IN_FLIGHT_RETRY_SECONDS = 5
+CACHE_DOWN_WARNING = "AI throttle cache unavailable; using per-process limits."
+
+
+class Throttled(Exception):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+@dataclass(frozen=True)
+class ThrottleLimits:
+    per_minute: float
+    burst: int
+    max_in_flight: int
+
+    @property
+    def rate(self) -> float:
+        return self.per_minute / 60
+
+
+def limits_for(user_id: int) -> ThrottleLimits:
+    overrides = (
+        UserProfile.objects.filter(user_id=user_id)
+        .values("ai_requests_per_minute", "ai_burst", "ai_max_in_flight")
+        .first()
+    ) or {}
+
+    def pick(field, default):
+        value = overrides.get(field)
+        return default if value is None else value
+
+    return ThrottleLimits(
+        per_minute=pick("ai_requests_per_minute", settings.AI_THROTTLE_PER_MINUTE),
+        burst=pick("ai_burst", settings.AI_THROTTLE_BURST),
+        max_in_flight=pick("ai_max_in_flight", settings.AI_MAX_IN_FLIGHT),
+    )
+
+
+class ThrottleBackend:
+    def take(self, user_id: int, limits: ThrottleLimits) -> float:
+        """Spend one token; return 0 on success, else seconds until a token is available."""
+        raise NotImplementedError
+
+    def acquire(self, user_id: int, limit: int) -> bool:
+        raise NotImplementedError
+
+    def release(self, user_id: int) -> None:
+        raise NotImplementedError
+
+
+def _refill(tokens: float, stamp: float, now: float, limits: ThrottleLimits) -> float:
+    return min(limits.burst, tokens + (now - stamp) * limits.rate)
+
+
+def _spend(tokens: float, limits: ThrottleLimits) -> tuple[float, float]:
+    # Returns (tokens left, seconds to wait); a wait of 0 means the token was spent.
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / limits.rate
+
+
+class LocalThrottleBackend(ThrottleBackend):
+    """Per-process buckets: limits apply to each worker process separately."""
+
+    MAX_BUCKETS = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: dict[int, tuple[float, float]] = {}
+        self._in_flight: dict[int, int] = {}
+
+    def take(self, user_id, limits):
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp = self._buckets.get(user_id, (limits.burst, now))
+            tokens, wait = _spend(_refill(tokens, stamp, now, limits), limits)
+            if len(self._buckets) >= self.MAX_BUCKETS:
+                self._buckets.clear()  # a forgotten bucket is simply full again
+            self._buckets[user_id] = (tokens, now)
+        return wait
+
+    def acquire(self, user_id, limit):
+        with self._lock:
+            if self._in_flight.get(user_id, 0) >= limit:
+                return False
+            self._in_flight[user_id] = self._in_flight.get(user_id, 0) + 1
+            return True
+
+    def release(self, user_id):
+        with self._lock:
+            count = self._in_flight.pop(user_id, 0) - 1
+            if count > 0:
+                self._in_flight[user_id] = count
+
+
+class CacheThrottleBackend(ThrottleBackend):
+    """Buckets and in-flight counters shared through the Django cache.
+
+    Falls back to per-process limits while the cache is unreachable.
+    """
+
+    def __init__(self):
+        self.local = LocalThrottleBackend()
+
+    @staticmethod
+    def _bucket_key(user_id: int) -> str:
+        return f"ai-throttle:{user_id}:bucket"
+
+    @staticmethod
+    def _in_flight_key(user_id: int) -> str:
+        return f"ai-throttle:{user_id}:in-flight"
+
+    def take(self, user_id, limits):
+        key = self._bucket_key(user_id)
+        now = time.time()
+        try:
+            # Not atomic: two racing requests may both spend the last token. The
+            # in-flight counter, which is atomic, is the hard limit.
+            tokens, stamp = cache.get(key) or (limits.burst, now)
+            tokens, wait = _spend(_refill(tokens, stamp, now, limits), limits)
+            cache.set(key, (tokens, now), math.ceil(limits.burst / limits.rate) + 1)
+        except Exception:
+            logger.warning(CACHE_DOWN_WARNING, exc_info=True)
+            return self.local.take(user_id, limits)
+        return wait
+
+    def acquire(self, user_id, limit):
+        key = self._in_flight_key(user_id)
+        try:
+            try:
+                count = cache.incr(key)
+            except ValueError:
+                # The timeout frees slots leaked by a process that died mid-call.
+                cache.add(key, 0, settings.AI_IN_FLIGHT_TIMEOUT)
+                count = cache.incr(key)
+            if count > limit:
+                cache.decr(key)
+                return False
+            # incr keeps the original expiry; pushing it out on every call means the
+            # counter only expires once the user has been idle for the whole timeout.
+            cache.touch(key, settings.AI_IN_FLIGHT_TIMEOUT)
+            return True
+        except Exception:
+            logger.warning(CACHE_DOWN_WARNING, exc_info=True)
+            return self.local.acquire(user_id, limit)
+
+    def release(self, user_id):
+        key = self._in_flight_key(user_id)
+        try:
+            if cache.decr(key) < 0:
+                # A call that started before the counter expired; never go below zero,
+                # or the user gets extra slots.
+                cache.incr(key)
+        except ValueError:
+            pass  # expired while the call was running
+        except Exception:
+            self.local.release(user_id)
+
+
+@lru_cache(maxsize=None)
+def _backend_for(path: str) -> ThrottleBackend:
+    return import_string(path)()
+
+
+def get_throttle_backend() -> ThrottleBackend:
+    return _backend_for(settings.AI_THROTTLE_BACKEND)
+
+
+def throttle(user_id: int, limits: ThrottleLimits | None = None) -> None:
+    """Spend one of the user's AI tokens or raise ``Throttled``."""
+    limits = limits or limits_for(user_id)
+    if limits.per_minute <= 0 or limits.burst <= 0:
+        return
+    wait = get_throttle_backend().take(user_id, limits)
+    if wait:
+        raise Throttled("You're sending requests faster than NightCipher can keep up.", wait)
+
+
+@contextmanager
+def in_flight(user_id: int, limits: ThrottleLimits | None = None):
+    """Hold one of the user's concurrent AI call slots for the duration of the block."""
+    limits = limits or limits_for(user_id)
+    if limits.max_in_flight <= 0:
+        yield
+        return
+    backend = get_throttle_backend()
+    if not backend.acquire(user_id, limits.max_in_flight):
+        raise Throttled("Another reply is still being written.", IN_FLIGHT_RETRY_SECONDS)
+    try:
+        yield
+    finally:
+        backend.release(user_id)
+
+
+@asynccontextmanager
+async def ain_flight(user_id: int, limits: ThrottleLimits | None = None):
+    """``in_flight`` for async views; the cache round trips run off the event loop."""
+    limits = limits or await sync_to_async(limits_for)(user_id)
+    if limits.max_in_flight <= 0:
+        yield
+        return
+    backend = get_throttle_backend()
+    if not await sync_to_async(backend.acquire)(user_id, limits.max_in_flight):
+        raise Throttled("Another reply is still being written.", IN_FLIGHT_RETRY_SECONDS)
+    try:
+        yield
+    finally:
+        await sync_to_async(backend.release)(user_id)
@@ -0,0 +1,21 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+
+class QueryBudgetTestMixin:
+    """Fail a test when a view runs more queries than its @query_budget allows."""
+
+    def assertWithinQueryBudget(self, method: str, path: str, data=None, **extra):
+        budget = getattr(resolve(path).func, "query_budget", None)
+        if budget is None:
+            self.fail(f"{path} has no declared query budget.")
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method.lower())(path, data or {}, **extra)
+        if len(queries) > budget:
+            statements = "\n".join(query["sql"] for query in queries.captured_queries)
+            self.fail(
+                f"{method.upper()} {path} ran {len(queries)} queries, "
+                f"budget is {budget}:\n{statements}"
+            )
+        return response
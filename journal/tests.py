@@ -1,3 +1,2181 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import re
+import tempfile
+from datetime import timedelta
+import threading
+from io import StringIO
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .benchmarks.fake_llm import CHAT_REPLY, INTERPRETATION, FakeLLMServer
+from .benchmarks.fixtures import FixtureSpec, generate_fixtures
+from .benchmarks.runner import _summary, fake_llm_settings, percentile
+from .admin import DreamMessageAdmin
+from .naming import canonical_name
+from .models import (
+    Comment,
+    DreamEntry,
+    DreamFacet,
+    DreamJob,
+    DreamMessage,
+    DreamSymbol,
+    FeedItem,
+    Interpretation,
+    InterpretationCacheEntry,
+    MonthlyDreamStats,
+    Symbol,
+    Tag,
+    UserProfile,
+)
+from .services import (
+    AIServiceError,
+    adream_chat_reply,
+    archive_lines,
+    build_chat_context,
+    claim_job,
+    dream_chat_reply,
+    DreamFilter,
+    facet_counts,
+    import_journal,
+    ingest_dream,
+    interpret_and_extract,
+    interpretation_progress,
+    JournalImportError,
+    ndjson_chunks,
+    rebuild_stats,
+    requeue_stale_jobs,
+    run_job,
+    stream_dream_chat_reply,
+    zip_chunks,
+)
+from .metrics import MetricsRegistry
+from .services.ai import (
+    DEFAULT_MODEL,
+    INTERPRET_PROMPT_VERSION,
+    INTERPRET_SCHEMA,
+    IncompleteInterpretation,
+    count_tokens,
+)
+from .services.autocomplete import MemoryCompletionBackend, get_completion_backend
+from .services.cache import InterpretationCache
+from .services.feed import feed_page, feed_version
+from .services.jsonstream import JSONFieldStream
+from .services.resolver import NameResolver
+from .services.similarity import (
+    COMMUNITY,
+    HashingEmbeddingProvider,
+    similarity_index,
+)
+from .services.throttle import (
+    CacheThrottleBackend,
+    LocalThrottleBackend,
+    ThrottleLimits,
+    Throttled,
+    ain_flight,
+    in_flight,
+    limits_for,
+)
+from .services.telemetry import AI_LATENCY, AI_REQUESTS, AI_TOKENS
+from .services.search import (
+    FallbackSearchBackend,
+    SQLiteSearchBackend,
+    _backend_for,
+    get_search_backend,
+)
+from .pagination import EstimatedCountPaginator
+from .testing import QueryBudgetTestMixin
+from .urls import urlpatterns
+from .services.client import CircuitBreaker, clients
+
+
+def _response_body(text: str, usage: dict | None = None) -> dict:
+    return {
+        "id": "resp_test",
+        "object": "response",
+        "created_at": 0,
+        "model": "fake-model",
+        "status": "completed",
+        "output": [
+            {
+                "type": "message",
+                "id": "msg_test",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }
+        ],
+        "usage": usage,
+    }
+
+
+TEST_USAGE = {
+    "input_tokens": 12,
+    "input_tokens_details": {"cached_tokens": 0},
+    "output_tokens": 3,
+    "output_tokens_details": {"reasoning_tokens": 0},
+    "total_tokens": 15,
+}
+
+
+def _text_stream(text: str, size: int = 7) -> mock.MagicMock:
+    """Stand-in for a streamed Responses API call that yields ``text`` in small deltas."""
+    stream = mock.MagicMock()
+    stream.__iter__.return_value = iter(
+        SimpleNamespace(type="response.output_text.delta", delta=text[start : start + size])
+        for start in range(0, len(text), size)
+    )
+    return stream
+
+
+class FakeProvider(ThreadingHTTPServer):
+    """Local OpenAI-compatible server that replays a queue of (status, text) replies."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeProviderHandler)
+        self.replies: list[tuple[int, str]] = []
+        self.requests: list[dict] = []
+        self.connections = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        self.server.requests.append(payload)
+        status, text = self.server.replies.pop(0) if self.server.replies else (200, "{}")
+        if status == 200 and payload.get("stream"):
+            self._stream(text)
+            return
+        body = json.dumps(
+            _response_body(text, TEST_USAGE) if status == 200 else {"error": {"message": text}}
+        )
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def _stream(self, text: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        created = {**_response_body(""), "status": "in_progress"}
+        events = [{"type": "response.created", "response": created}]
+        events += [
+            {
+                "type": "response.output_text.delta",
+                "item_id": "msg_test",
+                "output_index": 0,
+                "content_index": 0,
+                "delta": text[start : start + 5],
+            }
+            for start in range(0, len(text), 5)
+        ]
+        completed = _response_body(text, TEST_USAGE)
+        events.append({"type": "response.completed", "response": completed})
+        for sequence, event in enumerate(events):
+            event["sequence_number"] = sequence
+            self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("sleeper", password="pw")
+
+    def _queued(self, narrative="A fox.") -> DreamJob:
+        entry = ingest_dream(
+            DreamEntry(
+                user=self.user,
+                title="Queued",
+                narrative=narrative,
+                date_dreamed=timezone.localdate(),
+            ),
+            enqueue=True,
+        )
+        return entry.jobs.get()
+
+    def test_a_job_is_claimed_once(self):
+        job = self._queued()
+        claimed = claim_job("worker-a")
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(
+            (claimed.status, claimed.locked_by, claimed.attempts),
+            (DreamJob.STATUS_RUNNING, "worker-a", 1),
+        )
+        self.assertIsNone(claim_job("worker-b"))
+
+    def test_a_job_claimed_between_listing_and_update_is_skipped(self):
+        first, second = self._queued("A fox."), self._queued("A river.")
+        real_filter = DreamJob.objects.filter
+
+        def filter_after_race(*args, **kwargs):
+            if kwargs.get("pk") == first.pk:
+                # Another worker claims the first job after this one listed it.
+                real_filter(pk=first.pk).update(status=DreamJob.STATUS_RUNNING, locked_by="worker-b")
+            return real_filter(*args, **kwargs)
+
+        with mock.patch.object(DreamJob.objects, "filter", side_effect=filter_after_race):
+            claimed = claim_job("worker-a")
+        self.assertEqual(claimed.pk, second.pk)
+        first.refresh_from_db()
+        self.assertEqual((first.locked_by, first.attempts), ("worker-b", 0))
+
+    def test_jobs_wait_for_their_run_after(self):
+        job = self._queued()
+        DreamJob.objects.filter(pk=job.pk).update(
+            run_after=timezone.now() + timedelta(seconds=60)
+        )
+        self.assertIsNone(claim_job("worker-a"))
+        DreamJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.assertEqual(claim_job("worker-a").pk, job.pk)
+
+    @override_settings(JOB_STALE_SECONDS=300)
+    def test_stale_running_jobs_are_requeued(self):
+        stale, fresh = self._queued("A fox."), self._queued("A river.")
+        claim_job("worker-a")
+        claim_job("worker-b")
+        DreamJob.objects.filter(pk=stale.pk).update(
+            locked_at=timezone.now() - timedelta(seconds=301)
+        )
+        self.assertEqual(requeue_stale_jobs(), 1)
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((stale.status, stale.locked_by), (DreamJob.STATUS_QUEUED, ""))
+        self.assertEqual(fresh.status, DreamJob.STATUS_RUNNING)
+        self.assertEqual(claim_job("worker-c").pk, stale.pk)
+
+
+class RunJobsCommandTests(TransactionTestCase):
+    # Worker threads use their own connections, so the jobs must be committed. One
+    # worker: the in-memory SQLite test database locks whole tables.
+    def test_once_drains_the_queue(self):
+        user = get_user_model().objects.create_user("drained", password="pw")
+        for i in range(3):
+            ingest_dream(
+                DreamEntry(
+                    user=user,
+                    title="Queued",
+                    narrative=f"Dream {i}.",
+                    date_dreamed=timezone.localdate(),
+                ),
+                enqueue=True,
+            )
+        out = StringIO()
+        with mock.patch(
+            "journal.services.jobs.interpret_and_extract", return_value=INTERPRETATION
+        ):
+            call_command("run_jobs", once=True, concurrency=1, poll_interval=0.01, stdout=out)
+        self.assertIn("Job workers stopped.", out.getvalue())
+        self.assertFalse(DreamJob.objects.exclude(status=DreamJob.STATUS_DONE).exists())
+        self.assertEqual(
+            set(DreamEntry.objects.values_list("job_status", flat=True)), {DreamEntry.JOB_READY}
+        )
+
+
+@override_settings(
+    AI_CACHE_ENABLED=False,
+    AI_RETRY_BACKOFF=0.01,
+    AI_RETRY_BACKOFF_MAX=0.01,
+    AI_MAX_RETRIES=2,
+)
+class AIClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = FakeProvider().__enter__()
+        self.addCleanup(self.server.__exit__)
+        settings_override = override_settings(OPENAI_BASE_URL=self.server.base_url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        env = mock.patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"})
+        env.start()
+        self.addCleanup(env.stop)
+        clients.reset()
+        self.addCleanup(clients.reset)
+
+    def test_client_is_reused_with_keep_alive(self):
+        self.server.replies = [(200, "First"), (200, "Second")]
+        self.assertEqual(dream_chat_reply("narrative", [], "hi"), "First")
+        self.assertEqual(dream_chat_reply("narrative", [], "again"), "Second")
+        self.assertEqual(self.server.connections, 1)
+
+    async def test_async_chat_reply_uses_the_async_client(self):
+        self.server.replies = [(200, "Async hello")]
+        self.assertEqual(await adream_chat_reply("narrative", [], "hi"), "Async hello")
+        self.assertEqual(self.server.requests[0]["input"][-1]["content"], "hi")
+
+    def test_async_clients_close_with_their_event_loop(self):
+        async def client_pair():
+            return await clients.async_client(), await clients.async_client()
+
+        first, again = asyncio.run(client_pair())
+        self.assertIs(first, again)
+        self.assertTrue(first.is_closed())
+        # How a WSGI worker runs an async view: a new loop for each request.
+        second, _ = async_to_sync(client_pair)()
+        self.assertIsNot(second, first)
+        self.assertTrue(second.is_closed())
+
+    def test_transient_errors_are_retried(self):
+        self.server.replies = [(503, "busy"), (200, json.dumps(INTERPRETATION))]
+        self.assertEqual(interpret_and_extract("narrative"), INTERPRETATION)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_interpretation_streams_fields_as_they_finish(self):
+        payload = {key: INTERPRETATION[key] for key in INTERPRET_SCHEMA["required"]}
+        self.server.replies = [(200, json.dumps(payload))]
+        seen = []
+        data = interpret_and_extract("narrative", on_field=lambda key, value: seen.append(key))
+        self.assertEqual(data, payload)
+        self.assertEqual(seen[:3], ["title", "tags", "psych_summary"])
+        self.assertEqual(seen, list(payload))
+        request = self.server.requests[0]
+        self.assertTrue(request["stream"])
+        self.assertEqual(request["text"]["format"]["type"], "json_schema")
+        self.assertTrue(request["text"]["format"]["strict"])
+
+    def test_cut_off_interpretation_raises_with_finished_fields(self):
+        self.server.replies = [
+            (200, '{"title": "Glass city", "psych_summary": "A thre'),
+            (200, '{"title": "Glass city"} trailing'),
+            (200, json.dumps({"title": "Glass city"})),
+        ]
+        for _ in range(3):
+            with self.assertRaises(IncompleteInterpretation) as raised:
+                interpret_and_extract("narrative")
+            self.assertEqual(raised.exception.data, {"title": "Glass city"})
+
+    def test_calls_record_latency_tokens_and_outcome(self):
+        labels = {"operation": "chat", "model": DEFAULT_MODEL}
+        ok, errors = (AI_REQUESTS.value(outcome=o, **labels) for o in ("ok", "error"))
+        input_tokens = AI_TOKENS.value(direction="input", **labels)
+        output_tokens = AI_TOKENS.value(direction="output", **labels)
+        timed = AI_LATENCY.count(**labels)
+        self.server.replies = [(200, "Hello"), (400, "bad request")]
+        dream_chat_reply("narrative", [], "hi")
+        with self.assertRaises(AIServiceError):
+            dream_chat_reply("narrative", [], "hi")
+        self.assertEqual(AI_REQUESTS.value(outcome="ok", **labels), ok + 1)
+        self.assertEqual(AI_REQUESTS.value(outcome="error", **labels), errors + 1)
+        self.assertEqual(AI_TOKENS.value(direction="input", **labels), input_tokens + 12)
+        self.assertEqual(AI_TOKENS.value(direction="output", **labels), output_tokens + 3)
+        self.assertEqual(AI_LATENCY.count(**labels), timed + 2)
+
+    def test_streamed_interpretation_records_usage_and_cut_offs(self):
+        labels = {"operation": "interpret", "model": DEFAULT_MODEL}
+        incomplete = AI_REQUESTS.value(outcome="incomplete", **labels)
+        output_tokens = AI_TOKENS.value(direction="output", **labels)
+        self.server.replies = [(200, '{"title": "Glass city", "psych_summary": "A thre')]
+        with self.assertRaises(IncompleteInterpretation):
+            interpret_and_extract("narrative")
+        self.assertEqual(AI_REQUESTS.value(outcome="incomplete", **labels), incomplete + 1)
+        self.assertEqual(AI_TOKENS.value(direction="output", **labels), output_tokens + 3)
+
+    def test_client_errors_are_not_retried(self):
+        self.server.replies = [(400, "bad request")]
+        with self.assertRaises(AIServiceError):
+            dream_chat_reply("narrative", [], "hi")
+        self.assertEqual(len(self.server.requests), 1)
+
+    @override_settings(AI_BREAKER_THRESHOLD=2, AI_MAX_RETRIES=0)
+    def test_breaker_fails_fast_when_provider_is_degraded(self):
+        self.server.replies = [(500, "down"), (500, "down")]
+        for _ in range(2):
+            with self.assertRaises(AIServiceError):
+                dream_chat_reply("narrative", [], "hi")
+        self.assertEqual(clients.breaker.state, CircuitBreaker.STATE_OPEN)
+        with self.assertRaisesMessage(AIServiceError, "temporarily unavailable"):
+            dream_chat_reply("narrative", [], "hi")
+        self.assertEqual(len(self.server.requests), 2)
+
+    @override_settings(AI_BREAKER_THRESHOLD=2)
+    def test_retries_count_as_one_breaker_failure(self):
+        self.server.replies = [(500, "down")] * 3
+        with self.assertRaises(AIServiceError):
+            dream_chat_reply("narrative", [], "hi")
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(clients.breaker.state, CircuitBreaker.STATE_CLOSED)
+
+    @override_settings(AI_BREAKER_THRESHOLD=1, AI_BREAKER_RESET_SECONDS=0.05, AI_MAX_RETRIES=0)
+    async def test_cancelled_half_open_probe_frees_the_breaker(self):
+        self.server.replies = [(500, "down"), (200, "Back")]
+        with self.assertRaises(AIServiceError):
+            await adream_chat_reply("narrative", [], "hi")
+        await asyncio.sleep(0.06)
+        self.assertEqual(clients.breaker.state, CircuitBreaker.STATE_HALF_OPEN)
+        started, hang = asyncio.Event(), asyncio.Event()
+
+        async def disconnected_client(client, timeout):
+            started.set()
+            await hang.wait()
+
+        probe = asyncio.create_task(clients.acall(disconnected_client, 5))
+        await started.wait()
+        probe.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await probe
+        self.assertEqual(await adream_chat_reply("narrative", [], "hi"), "Back")
+        self.assertEqual(clients.breaker.state, CircuitBreaker.STATE_CLOSED)
+
+    @override_settings(AI_CHAT_TIMEOUT=0.3, AI_MAX_RETRIES=0)
+    def test_hung_provider_hits_the_deadline(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        with mock.patch.object(FakeProviderHandler, "do_POST", lambda handler: release.wait(5)):
+            with self.assertRaises(AIServiceError):
+                dream_chat_reply("narrative", [], "hi")
+
+
+@override_settings(
+    AI_CHAT_CONTEXT_TOKENS=400,
+    AI_CHAT_NARRATIVE_TOKENS=100,
+    AI_CHAT_SUMMARY_TOKENS=50,
+)
+class ChatContextTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("talker", password="pw")
+        self.entry = DreamEntry.objects.create(
+            user=self.user,
+            title="Long dream",
+            narrative="short",
+            date_dreamed=timezone.localdate(),
+        )
+        condense = mock.patch(
+            "journal.services.ai._condense",
+            side_effect=lambda text, max_tokens, instructions: f"condensed({len(text)})",
+        )
+        self.condense = condense.start()
+        self.addCleanup(condense.stop)
+
+    def _say(self, count: int, start: int = 0, words: int = 40):
+        DreamMessage.objects.bulk_create(
+            [
+                DreamMessage(
+                    dream=self.entry,
+                    role=DreamMessage.ROLE_USER if i % 2 == 0 else DreamMessage.ROLE_ASSISTANT,
+                    content=f"turn {i} " + "word " * words,
+                )
+                for i in range(start, start + count)
+            ]
+        )
+
+    def test_short_dreams_are_sent_as_is(self):
+        self._say(2)
+        context = build_chat_context(self.entry, "Why stairs?")
+        self.assertEqual(context.narrative, "short")
+        self.assertEqual(len(context.history), 2)
+        self.assertEqual(context.summary, "")
+        self.condense.assert_not_called()
+
+    def test_long_narratives_are_condensed_once(self):
+        self.entry.narrative = "The hallway went on. " * 200
+        self.entry.save()
+        context = build_chat_context(self.entry, "Why?")
+        self.assertTrue(context.narrative.startswith("condensed("))
+        entry = DreamEntry.objects.get(pk=self.entry.pk)
+        self.assertEqual(build_chat_context(entry, "And?").narrative, context.narrative)
+        self.assertEqual(self.condense.call_count, 1)
+
+    def test_narrative_falls_back_to_truncation_when_ai_is_down(self):
+        self.entry.narrative = "Start. " + "middle " * 500 + "The end."
+        self.condense.side_effect = AIServiceError("down")
+        context = build_chat_context(self.entry, "Why?")
+        self.assertTrue(context.narrative.startswith("Start."))
+        self.assertTrue(context.narrative.endswith("The end."))
+        self.assertLessEqual(count_tokens(context.narrative), 110)
+
+    def test_older_turns_fold_into_a_rolling_summary_within_budget(self):
+        self._say(30)
+        context = build_chat_context(self.entry, "What now?")
+        self.assertLessEqual(context.tokens, 400)
+        self.assertTrue(context.history[-1]["content"].startswith("turn 29 "))
+        self.assertNotIn("turn 0 ", json.dumps(context.history))
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.chat_summary, context.summary)
+        summary, folded_until = self.entry.chat_summary, self.entry.chat_summary_until
+        self.assertIsNotNone(folded_until)
+        self.assertIn("turn 0 ", self.condense.call_args.args[0])
+
+        # Later turns only fold messages the summary has not absorbed yet.
+        self._say(6, start=30)
+        context = build_chat_context(self.entry, "And then?")
+        self.assertLessEqual(context.tokens, 400)
+        previous, new_messages = self.condense.call_args.args[0].split("New messages:")
+        self.assertIn(summary, previous)
+        self.assertNotIn("turn 0 ", new_messages)
+        self.entry.refresh_from_db()
+        self.assertGreater(self.entry.chat_summary_until, folded_until)
+
+    @override_settings(AI_CHAT_MAX_MESSAGES=10)
+    def test_turns_older_than_the_message_window_reach_the_summary(self):
+        self._say(15, words=1)
+        context = build_chat_context(self.entry, "What now?")
+        self.assertEqual(len(context.history), 10)
+        self.assertTrue(context.history[0]["content"].startswith("turn 5 "))
+        self.assertIn("turn 0 ", self.condense.call_args.args[0])
+        self.entry.refresh_from_db()
+        self.assertEqual(
+            self.entry.chat_summary_until,
+            self.entry.messages.get(content__startswith="turn 4 ").pk,
+        )
+
+        # A backlog longer than the window is folded in order over several turns.
+        self._say(25, start=15, words=1)
+        for question in ("And then?", "And after?", "And finally?"):
+            build_chat_context(self.entry, question)
+        folded = "".join(call.args[0] for call in self.condense.call_args_list)
+        for turn in range(30):
+            self.assertIn(f"turn {turn} ", folded)
+        self.entry.refresh_from_db()
+        self.assertEqual(
+            self.entry.chat_summary_until,
+            self.entry.messages.get(content__startswith="turn 29 ").pk,
+        )
+
+    def test_the_message_being_answered_is_not_repeated(self):
+        self._say(3)
+        last = self.entry.messages.order_by("-pk").first()
+        context = build_chat_context(self.entry, last.content, before=last.pk)
+        self.assertEqual(len(context.history), 2)
+
+    def test_plain_post_waits_for_the_async_reply(self):
+        self.client.force_login(self.user)
+        reply = mock.AsyncMock(return_value="Foxes mean cunning.")
+        with mock.patch("journal.views.adream_chat_reply", reply):
+            response = self.client.post(f"/dreams/{self.entry.pk}/", {"message": "Why a fox?"})
+        self.assertRedirects(response, f"/dreams/{self.entry.pk}/", fetch_redirect_response=False)
+        self.assertEqual(
+            list(self.entry.messages.values_list("role", "content")),
+            [
+                (DreamMessage.ROLE_USER, "Why a fox?"),
+                (DreamMessage.ROLE_ASSISTANT, "Foxes mean cunning."),
+            ],
+        )
+
+
+class InterpretationCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_resubmitted_narrative_skips_the_provider(self):
+        payload = INTERPRETATION
+        with mock.patch("journal.services.ai.clients.call") as call:
+            call.side_effect = lambda *args: _text_stream(json.dumps(payload))
+            self.assertEqual(interpret_and_extract("A fox by the river."), payload)
+            self.assertEqual(interpret_and_extract("  a FOX by the\nriver. "), payload)
+            cache.clear()
+            self.assertEqual(interpret_and_extract("A fox by the river."), payload)
+        self.assertEqual(call.call_count, 1)
+        self.assertEqual(InterpretationCacheEntry.objects.get().hits, 2)
+
+    def test_key_includes_model_and_prompt_version(self):
+        store = InterpretationCache()
+        store.set("narrative", "model-a", "v1", {"title": "A"})
+        self.assertIsNone(store.get("narrative", "model-b", "v1"))
+        self.assertIsNone(store.get("narrative", "model-a", "v2"))
+        self.assertEqual(store.get("narrative", "model-a", "v1"), {"title": "A"})
+        self.assertEqual(store.stats(), {"hits": 1, "misses": 2})
+
+    @override_settings(AI_CACHE_MAX_ENTRIES=2, AI_CACHE_EVICT_EVERY=1)
+    def test_least_recently_used_rows_are_evicted(self):
+        store = InterpretationCache()
+        for name in ("one", "two", "three"):
+            store.set(name, "model", "v1", {"title": name})
+        self.assertEqual(
+            set(InterpretationCacheEntry.objects.values_list("payload__title", flat=True)),
+            {"two", "three"},
+        )
+
+
+class NameResolverTests(TestCase):
+    def test_resolves_any_number_of_names_in_constant_queries(self):
+        Tag.objects.create(name="water")
+        resolver = NameResolver(Tag)
+        names = ["water", "fox", " river ", "fox", "night", "glass", "train", "mirror"]
+        with self.assertNumQueries(3):
+            ids = resolver.resolve(names)
+        self.assertEqual(
+            [Tag.objects.get(pk=pk).name for pk in ids],
+            ["water", "fox", "river", "night", "glass", "train", "mirror"],
+        )
+
+    def test_hot_names_are_served_from_memory(self):
+        resolver = NameResolver(Symbol, defaults={"category": Symbol.CATEGORY_ABSTRACT})
+        with self.captureOnCommitCallbacks(execute=True):
+            first = resolver.resolve(["snake", "door"])
+        with self.assertNumQueries(0):
+            self.assertEqual(resolver.resolve(["door", "snake"]), first[::-1])
+        Symbol.objects.filter(name="door").get().delete()
+        with self.assertNumQueries(3):
+            resolver.resolve(["door"])
+
+    def test_near_duplicate_names_share_one_row(self):
+        Tag.objects.create(name="Snake")
+        resolver = NameResolver(Tag)
+        ids = resolver.resolve_map(["snakes", " SNAKE ", "Butterflies", "butterfly"])
+        self.assertEqual(len(set(ids.values())), 2)
+        self.assertEqual(
+            resolver.resolve(["snakes", "Snake", "butterfly"]), list(dict.fromkeys(ids.values()))
+        )
+        self.assertEqual(
+            sorted(Tag.objects.values_list("name", "key")),
+            [("Butterflies", "butterfly"), ("Snake", "snake")],
+        )
+
+
+class IngestDreamTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("dreamer", password="pw")
+
+    def _ingest(self, tag_count: int, symbol_count: int) -> int:
+        entry = DreamEntry(
+            user=self.user,
+            title="Glass city",
+            narrative="A fox led me to a river.",
+            date_dreamed=timezone.localdate(),
+        )
+        with CaptureQueriesContext(connection) as queries:
+            ingest_dream(
+                entry,
+                tags=[f"tag-{tag_count}-{i}" for i in range(tag_count)],
+                symbols=[f"symbol-{symbol_count}-{i}" for i in range(symbol_count)],
+                interpretations={
+                    Interpretation.ANGLE_PSYCH: "Psych.",
+                    Interpretation.ANGLE_SPIRITUAL: "Spiritual.",
+                },
+                followup="What felt strongest?",
+                enqueue=True,
+            )
+        self.assertEqual(entry.tags.count(), tag_count)
+        self.assertEqual(entry.symbols.count(), symbol_count)
+        return len(queries)
+
+    def test_round_trips_do_not_grow_with_tags_or_symbols(self):
+        self._ingest(tag_count=0, symbol_count=0)  # creates this month's stats row
+        small = self._ingest(tag_count=1, symbol_count=1)
+        large = self._ingest(tag_count=8, symbol_count=10)
+        huge = self._ingest(tag_count=40, symbol_count=60)
+        self.assertEqual(small, large)
+        self.assertEqual(large, huge)
+        # savepoint + entry + 2 x (lookup, insert, re-select) + 2 through inserts
+        # + interpretations + message + job + stats select/update + release; an enqueued
+        # dream is embedded by its job.
+        self.assertEqual(huge, 16)
+
+    def test_refilling_a_pending_entry_replaces_links(self):
+        entry = ingest_dream(
+            DreamEntry(
+                user=self.user,
+                title="Untitled Dream",
+                narrative="Snakes in a hallway.",
+                date_dreamed=timezone.localdate(),
+                job_status=DreamEntry.JOB_PENDING,
+            ),
+            tags=["old"],
+            enqueue=True,
+        )
+        entry.job_status = DreamEntry.JOB_READY
+        ingest_dream(entry, tags=["hallway", "snake"], symbols=["snake"])
+        entry.refresh_from_db()
+        self.assertEqual(entry.job_status, DreamEntry.JOB_READY)
+        self.assertEqual(sorted(entry.tags.values_list("name", flat=True)), ["hallway", "snake"])
+        self.assertEqual(list(entry.symbols.values_list("name", flat=True)), ["snake"])
+        self.assertEqual(DreamJob.objects.filter(dream=entry).count(), 1)
+
+
+class DreamsListTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("journaler", password="pw")
+        today = timezone.localdate()
+        DreamEntry.objects.bulk_create(
+            [
+                DreamEntry(
+                    user=self.user,
+                    title=f"Dream {i}",
+                    narrative="word " * 200,
+                    date_dreamed=today - timedelta(days=i // 3),
+                )
+                for i in range(45)
+            ]
+        )
+        self.client.force_login(self.user)
+
+    def test_infinite_scroll_walks_every_entry_once(self):
+        expected = list(
+            DreamEntry.objects.order_by("-date_dreamed", "-id").values_list("id", flat=True)
+        )
+        seen = []
+        response = self.client.get("/dreams/")
+        while True:
+            body = response.content.decode()
+            seen += [int(pk) for pk in re.findall(r'href="/dreams/(\d+)/"', body)]
+            cursor = re.search(r"after=([\w-]+)", body)
+            if not cursor:
+                break
+            with self.assertNumQueries(4):
+                response = self.client.get(
+                    f"/dreams/?after={cursor.group(1)}",
+                    HTTP_HX_REQUEST="true",
+                )
+        self.assertEqual(seen, expected)
+        self.assertLess(len(response.content), 20_000)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get("/dreams/?after=not-a-cursor")
+        self.assertContains(response, "Dream 0")
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("budget", password="pw")
+        self.entry = ingest_dream(
+            DreamEntry(
+                user=self.user,
+                title="Glass city",
+                narrative="A fox led me to a river.",
+                date_dreamed=timezone.localdate(),
+            ),
+            tags=[f"tag-{i}" for i in range(8)],
+            symbols=[f"symbol-{i}" for i in range(10)],
+            interpretations={
+                Interpretation.ANGLE_PSYCH: "Psych.",
+                Interpretation.ANGLE_SPIRITUAL: "Spiritual.",
+            },
+        )
+        DreamMessage.objects.bulk_create(
+            [
+                DreamMessage(dream=self.entry, role=DreamMessage.ROLE_USER, content=f"m{i}")
+                for i in range(12)
+            ]
+        )
+
+    def test_every_view_declares_a_budget(self):
+        for pattern in urlpatterns:
+            with self.subTest(pattern.name):
+                self.assertIsNotNone(getattr(pattern.callback, "query_budget", None))
+
+    def test_anonymous_pages_stay_within_budget(self):
+        for path in ("/", "/community/", "/login/", "/register/"):
+            with self.subTest(path):
+                self.assertWithinQueryBudget("get", path)
+
+    def test_journal_pages_stay_within_budget(self):
+        self.client.force_login(self.user)
+        detail = f"/dreams/{self.entry.pk}/"
+        self.assertWithinQueryBudget("get", "/")
+        self.assertWithinQueryBudget("post", "/", {"narrative": "Stairs."}, HTTP_HX_REQUEST="true")
+        self.assertWithinQueryBudget("get", f"{detail}session/")
+        self.assertWithinQueryBudget("get", "/dreams/")
+        self.assertWithinQueryBudget("get", "/dreams/new/")
+        self.assertWithinQueryBudget(
+            "post",
+            "/dreams/new/",
+            {
+                "title": "Stairs",
+                "date_dreamed": "2026-02-01",
+                "narrative": "Endless stairs.",
+                "privacy": "private",
+                "tags_input": "a, b, c, d",
+                "symbols_input": "stairs, door, light",
+            },
+        )
+        self.assertWithinQueryBudget("get", detail)
+        self.assertWithinQueryBudget("post", detail, {"message": "Why?"}, HTTP_HX_REQUEST="true")
+        self.assertWithinQueryBudget("get", f"{detail}delete/")
+        self.entry.privacy = DreamEntry.PRIVACY_PUBLIC
+        ingest_dream(self.entry)
+        item = self.entry.feed_item
+        self.assertWithinQueryBudget("get", "/community/")
+        self.assertWithinQueryBudget("post", f"/community/{item.pk}/like/")
+        self.assertWithinQueryBudget("post", f"/community/{item.pk}/like/")
+        self.assertWithinQueryBudget("post", f"/community/{item.pk}/comments/", {"body": "Lovely."})
+        self.assertWithinQueryBudget("get", f"/community/{item.pk}/comments/")
+        self.assertWithinQueryBudget("post", f"{detail}delete/")
+        self.assertWithinQueryBudget("post", "/logout/")
+
+    def test_filtered_search_stays_within_budget(self):
+        self.client.force_login(self.user)
+        # The first search in a process also picks the backend.
+        _backend_for.cache_clear()
+        self.addCleanup(_backend_for.cache_clear)
+        response = self.assertWithinQueryBudget("get", "/dreams/", {"q": "fox", "tag": "tag-0"})
+        self.assertContains(response, "Glass city")
+        self.assertWithinQueryBudget(
+            "get", "/dreams/", {"q": "fox", "tag": "tag-0", "emotion": "calm"}, HTTP_HX_REQUEST="true"
+        )
+
+    def test_middleware_reports_query_count(self):
+        self.client.force_login(self.user)
+        response = self.client.get("/dreams/")
+        self.assertEqual(response["X-Query-Budget"], "9")
+        self.assertLessEqual(int(response["X-Query-Count"]), 9)
+        self.assertIn("X-Query-Time-Ms", response)
+
+    @override_settings(QUERY_BUDGETS_STRICT=True)
+    def test_strict_mode_raises_when_over_budget(self):
+        from .instrumentation import QueryBudgetExceeded
+
+        self.client.force_login(self.user)
+        with mock.patch("journal.views.dreams.query_budget", 1, create=True):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get("/dreams/")
+
+
+class BackfillInterpretationsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("backfill", password="pw")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint = os.path.join(directory.name, "checkpoint.json")
+
+    def _dream(self, narrative, interpretations, prompt_version=""):
+        return ingest_dream(
+            DreamEntry(
+                user=self.user,
+                title="Untitled Dream",
+                narrative=narrative,
+                date_dreamed=timezone.localdate(),
+            ),
+            interpretations=interpretations,
+            prompt_version=prompt_version,
+        )
+
+    def _run(self, **options):
+        out = StringIO()
+        call_command(
+            "backfill_interpretations",
+            checkpoint=self.checkpoint,
+            concurrency=1,
+            rate=0,
+            stdout=out,
+            stderr=StringIO(),
+            **options,
+        )
+        return out.getvalue()
+
+    def test_placeholders_and_old_prompt_versions_are_reprocessed(self):
+        from .services.jobs import PENDING_PSYCH_SUMMARY, PENDING_SPIRITUAL_SUMMARY
+
+        pending = self._dream(
+            "Stuck on placeholders.",
+            {
+                Interpretation.ANGLE_PSYCH: PENDING_PSYCH_SUMMARY,
+                Interpretation.ANGLE_SPIRITUAL: PENDING_SPIRITUAL_SUMMARY,
+            },
+        )
+        old = self._dream("Interpreted long ago.", {Interpretation.ANGLE_PSYCH: "Old."})
+        current = self._dream(
+            "Up to date.",
+            {Interpretation.ANGLE_PSYCH: "Fine."},
+            prompt_version=INTERPRET_PROMPT_VERSION,
+        )
+        ai_data = {
+            "title": "Found",
+            "psych_summary": "New psych.",
+            "spiritual_summary": "New spiritual.",
+            "tags": ["found"],
+        }
+        with mock.patch("journal.services.jobs.interpret_and_extract", return_value=ai_data) as ai:
+            output = self._run()
+        self.assertEqual(ai.call_count, 2)
+        self.assertIn("Backfilled 2 dream(s), 0 error(s)", output)
+
+        pending.refresh_from_db()
+        self.assertEqual(pending.title, "Found")
+        self.assertEqual(list(pending.tags.values_list("name", flat=True)), ["found"])
+        for entry in (pending, old):
+            self.assertEqual(
+                sorted(entry.interpretations.values_list("summary", "prompt_version")),
+                [
+                    ("New psych.", INTERPRET_PROMPT_VERSION),
+                    ("New spiritual.", INTERPRET_PROMPT_VERSION),
+                ],
+            )
+        old.refresh_from_db()
+        self.assertEqual(old.title, "Untitled Dream")
+        self.assertEqual(list(current.interpretations.values_list("summary", flat=True)), ["Fine."])
+
+    def test_interrupted_runs_resume_from_the_checkpoint(self):
+        entries = [
+            self._dream(f"Dream {i}.", {Interpretation.ANGLE_PSYCH: "Old."}) for i in range(5)
+        ]
+        ai_data = {"psych_summary": "P.", "spiritual_summary": "S."}
+        with mock.patch("journal.services.jobs.interpret_and_extract", return_value=ai_data):
+            output = self._run(batch_size=2, limit=2)
+        self.assertIn("2 dream(s), 0 error(s)", output)
+        with open(self.checkpoint) as handle:
+            self.assertEqual(json.load(handle)["last_pk"], entries[1].pk)
+
+        with mock.patch("journal.services.jobs.interpret_and_extract", return_value=ai_data) as ai:
+            output = self._run(batch_size=2)
+        self.assertIn(f"Resuming after dream {entries[1].pk}", output)
+        self.assertEqual(
+            [call.args[0] for call in ai.call_args_list], [f"Dream {i}." for i in range(2, 5)]
+        )
+        Interpretation.objects.update(prompt_version="")
+        with mock.patch("journal.services.jobs.interpret_and_extract", return_value=ai_data) as ai:
+            self._run(restart=True)
+        self.assertEqual(ai.call_count, 5)
+
+    def test_failed_dreams_stay_in_the_checkpoint_until_they_succeed(self):
+        entries = [
+            self._dream(f"Dream {i}.", {Interpretation.ANGLE_PSYCH: "Old."}) for i in range(4)
+        ]
+        ai_data = {"psych_summary": "P.", "spiritual_summary": "S."}
+
+        def flaky(narrative, **kwargs):
+            if narrative in ("Dream 0.", "Dream 2."):
+                raise AIServiceError("provider down")
+            return ai_data
+
+        with mock.patch("journal.services.jobs.interpret_and_extract", side_effect=flaky):
+            output = self._run(batch_size=2, limit=4)
+        self.assertIn("2 dream(s), 2 error(s)", output)
+        self.assertIn(f"Failed dream ids: {entries[0].pk}, {entries[2].pk}.", output)
+        with open(self.checkpoint) as handle:
+            state = json.load(handle)
+        self.assertEqual(state["last_pk"], entries[3].pk)
+        self.assertEqual(state["failed"], [entries[0].pk, entries[2].pk])
+
+        with mock.patch("journal.services.jobs.interpret_and_extract", return_value=ai_data) as ai:
+            output = self._run(batch_size=2)
+        self.assertIn("Retrying 2 dream(s) that failed before.", output)
+        self.assertIn("Backfilled 2 dream(s), 0 error(s)", output)
+        self.assertNotIn("Failed dream ids", output)
+        self.assertEqual([call.args[0] for call in ai.call_args_list], ["Dream 0.", "Dream 2."])
+        with open(self.checkpoint) as handle:
+            self.assertEqual(
+                json.load(handle),
+                {"prompt_version": INTERPRET_PROMPT_VERSION, "last_pk": 0, "failed": []},
+            )
+
+    def test_a_finished_pass_starts_over_for_dreams_a_job_held(self):
+        held = self._dream("Held by a job.", {Interpretation.ANGLE_PSYCH: "Old."})
+        DreamEntry.objects.filter(pk=held.pk).update(job_status=DreamEntry.JOB_PROCESSING)
+        self._dream("Free.", {Interpretation.ANGLE_PSYCH: "Old."})
+        ai_data = {"psych_summary": "P.", "spiritual_summary": "S."}
+        with mock.patch("journal.services.jobs.interpret_and_extract", return_value=ai_data) as ai:
+            self._run()
+        self.assertEqual([call.args[0] for call in ai.call_args_list], ["Free."])
+
+        # The job gave up after the pass had gone by.
+        DreamEntry.objects.filter(pk=held.pk).update(job_status=DreamEntry.JOB_FAILED)
+        with mock.patch("journal.services.jobs.interpret_and_extract", return_value=ai_data) as ai:
+            output = self._run()
+        self.assertNotIn("Resuming", output)
+        self.assertEqual([call.args[0] for call in ai.call_args_list], ["Held by a job."])
+
+
+class MonthlyStatsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("counter", password="pw")
+        self.today = timezone.localdate()
+
+    def _dream(self, emotions=(), mood=None, symbols=(), dreamed=None):
+        return ingest_dream(
+            DreamEntry(
+                user=self.user,
+                title="Dream",
+                narrative="...",
+                date_dreamed=dreamed or self.today,
+                emotions=list(emotions),
+                mood_rating=mood,
+            ),
+            symbols=symbols,
+        )
+
+    def _snapshot(self):
+        return sorted(
+            MonthlyDreamStats.objects.values_list(
+                "user_id", "month", "dream_count", "symbol_counts", "emotion_counts", "mood_counts"
+            )
+        )
+
+    def test_writes_are_counted_incrementally(self):
+        self._dream(["Fear", "joy"], 4, ["snake", "door"])
+        second = self._dream(["fear"], 4, ["snake"])
+        stats = MonthlyDreamStats.objects.get(user=self.user)
+        self.assertEqual(stats.dream_count, 2)
+        self.assertEqual(stats.emotion_counts, {"fear": 2, "joy": 1})
+        self.assertEqual(stats.mood_counts, {"4": 2})
+        self.assertEqual(stats.top_emotion, "fear")
+        self.assertEqual(Symbol.objects.get(pk=stats.top_symbol_id).name, "snake")
+
+        second.date_dreamed = self.today.replace(day=1) - timedelta(days=1)
+        second.mood_rating = 7
+        second.save()
+        second.dream_symbols.all().delete()
+        DreamEntry.objects.get(mood_rating=4).delete()
+        rows = MonthlyDreamStats.objects.order_by("month").values_list(
+            "month", "dream_count", "symbol_counts", "mood_counts"
+        )
+        self.assertEqual(
+            list(rows),
+            [
+                (second.date_dreamed.replace(day=1), 1, {}, {"7": 1}),
+                (self.today.replace(day=1), 0, {}, {}),
+            ],
+        )
+
+    def test_rebuild_matches_incremental_counts(self):
+        self._dream(["awe"], 3, ["tower", "bird"])
+        self._dream(["Awe", "dread"], 8, ["bird"], dreamed=self.today - timedelta(days=40))
+        entry = self._dream([], None, ["tower"])
+        ingest_dream(entry, symbols=["moon"])
+        incremental = self._snapshot()
+        MonthlyDreamStats.objects.all().delete()
+        self.assertEqual(rebuild_stats(), 2)
+        self.assertEqual(self._snapshot(), incremental)
+        call_command("rebuild_dream_stats", user=["counter"], stdout=StringIO())
+        self.assertEqual(self._snapshot(), incremental)
+
+    def test_quick_stats_panel_cost_does_not_grow(self):
+        for _ in range(30):
+            self._dream(["calm"], 6, ["river"])
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/dreams/")
+        self.assertContains(response, "river")
+        self.assertContains(response, "6/10")
+        self.assertEqual(
+            sum("journal_monthlydreamstats" in query["sql"] for query in queries), 1
+        )
+
+
+@skipUnless(similarity_index.enabled, "NumPy is not installed")
+class SimilarDreamsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        similarity_index.clear()
+        self.user = get_user_model().objects.create_user("sleeper", password="pw")
+        self.other = get_user_model().objects.create_user("neighbour", password="pw")
+
+    def _dream(self, title, narrative, user=None, privacy=DreamEntry.PRIVACY_PRIVATE):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ingest_dream(
+                DreamEntry(
+                    user=user or self.user,
+                    title=title,
+                    narrative=narrative,
+                    date_dreamed=timezone.localdate(),
+                    privacy=privacy,
+                )
+            )
+
+    def test_hashing_provider_is_deterministic_and_normalised(self):
+        provider = HashingEmbeddingProvider(dimensions=64)
+        first, second, empty = provider.embed(["Snakes in the hallway", "Snakes in the hallway", ""])
+        self.assertEqual(first.tobytes(), second.tobytes())
+        self.assertAlmostEqual(float(first @ first), 1.0, places=5)
+        self.assertEqual(float(empty @ empty), 0.0)
+
+    def test_similar_dreams_are_ranked_and_scoped(self):
+        entry = self._dream("Serpent hallway", "A green snake followed me down a dark hallway.")
+        close = self._dream("Hallway again", "The dark hallway had a snake in it again.")
+        self._dream("Beach", "Warm waves and bright sunshine on the beach.")
+        far = self._dream("Snake", "A snake.")
+        self._dream("Their snake", "A green snake in a dark hallway.", user=self.other)
+
+        ids = similarity_index.similar(entry, similarity_index.user_scope(self.user.pk), limit=5)
+        self.assertEqual(ids, [close.pk, far.pk])
+
+        self.client.force_login(self.user)
+        response = self.client.get(f"/dreams/{entry.pk}/similar/")
+        self.assertContains(response, "Hallway again")
+        self.assertNotContains(response, "Their snake")
+
+    def test_public_dreams_also_match_the_community(self):
+        entry = self._dream(
+            "Serpent hallway", "A snake in a dark hallway.", privacy=DreamEntry.PRIVACY_PUBLIC
+        )
+        self._dream("Their snake", "A snake in a dark hallway.", user=self.other)
+        shared = self._dream(
+            "Shared snake",
+            "A snake in a dark hallway.",
+            user=self.other,
+            privacy=DreamEntry.PRIVACY_PUBLIC,
+        )
+        self.assertEqual(similarity_index.similar(entry, COMMUNITY), [shared.pk])
+        self.client.force_login(self.user)
+        response = self.client.get(f"/dreams/{entry.pk}/similar/")
+        self.assertContains(response, "From the community")
+        self.assertContains(response, "Shared snake")
+
+    def test_loaded_matrices_are_patched_in_place(self):
+        scope = similarity_index.user_scope(self.user.pk)
+        entry = self._dream("Tower", "Climbing a tower made of glass.")
+        similarity_index.similar(entry, scope)
+        added = self._dream("Glass tower", "The glass tower again, higher this time.")
+        with self.assertNumQueries(0):
+            self.assertEqual(similarity_index.similar(entry, scope), [added.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            added.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(similarity_index.similar(entry, scope), [])
+
+    def test_edits_outside_ingest_refresh_the_index(self):
+        entry = self._dream("Tower", "Climbing a tower made of glass.")
+        other = self._dream("Ocean", "Swimming far out in a cold ocean.")
+        theirs = self._dream(
+            "Their ocean",
+            "Swimming far out in a cold ocean.",
+            user=self.other,
+            privacy=DreamEntry.PRIVACY_PUBLIC,
+        )
+        scope = similarity_index.user_scope(self.user.pk)
+        self.assertEqual(similarity_index.similar(entry, scope), [])
+        self.assertEqual(similarity_index.similar(theirs, COMMUNITY), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.narrative = "Swimming far out in a cold ocean again."
+            entry.save()
+        self.assertEqual(similarity_index.similar(entry, scope), [other.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.privacy = DreamEntry.PRIVACY_PUBLIC
+            other.save(update_fields=["privacy"])
+        self.assertEqual(similarity_index.similar(theirs, COMMUNITY), [other.pk])
+
+    def test_ingest_embeds_a_new_dream_once(self):
+        embed = mock.patch.object(
+            HashingEmbeddingProvider, "embed", wraps=HashingEmbeddingProvider().embed
+        )
+        with embed as spy:
+            self._dream("Tower", "Climbing a tower made of glass.")
+        self.assertEqual(spy.call_count, 1)
+
+    def test_embedding_failure_keeps_the_dream(self):
+        embed = mock.patch.object(
+            HashingEmbeddingProvider, "embed", side_effect=AIServiceError("down")
+        )
+        with embed, self.assertLogs("journal.services.similarity", "WARNING"):
+            entry = self._dream("Tower", "Climbing a tower made of glass.")
+        self.assertTrue(DreamEntry.objects.filter(pk=entry.pk).exists())
+        scope = similarity_index.user_scope(self.user.pk)
+        self.assertEqual(similarity_index.matrix(scope).ids.size, 0)
+
+    @override_settings(SIMILAR_DREAMS_CACHE_SIZE=1)
+    def test_least_recently_used_matrix_is_evicted(self):
+        mine = self._dream("Tower", "Climbing a tower made of glass.")
+        theirs = self._dream("Tower", "Climbing a tower made of glass.", user=self.other)
+        similarity_index.similar(mine, similarity_index.user_scope(self.user.pk))
+        similarity_index.similar(theirs, similarity_index.user_scope(self.other.pk))
+        with self.assertNumQueries(1):
+            similarity_index.similar(mine, similarity_index.user_scope(self.user.pk))
+
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("spammer", password="pw")
+
+    def test_local_bucket_refills_at_the_configured_rate(self):
+        backend = LocalThrottleBackend()
+        limits = ThrottleLimits(per_minute=60, burst=2, max_in_flight=1)
+        with mock.patch("journal.services.throttle.time.monotonic", return_value=100.0):
+            self.assertEqual(backend.take(1, limits), 0)
+            self.assertEqual(backend.take(1, limits), 0)
+            self.assertAlmostEqual(backend.take(1, limits), 1.0)
+            self.assertEqual(backend.take(2, limits), 0)
+        with mock.patch("journal.services.throttle.time.monotonic", return_value=101.5):
+            self.assertEqual(backend.take(1, limits), 0)
+
+    def test_profile_overrides_settings(self):
+        self.assertEqual(limits_for(self.user.pk).burst, 5)
+        UserProfile.objects.create(user=self.user, ai_burst=1, ai_max_in_flight=4)
+        limits = limits_for(self.user.pk)
+        self.assertEqual((limits.burst, limits.max_in_flight, limits.per_minute), (1, 4, 6))
+
+    def test_in_flight_calls_are_capped_per_user(self):
+        other = get_user_model().objects.create_user("patient", password="pw")
+        limits = ThrottleLimits(per_minute=6, burst=5, max_in_flight=1)
+        with in_flight(self.user.pk, limits):
+            with self.assertRaises(Throttled):
+                with in_flight(self.user.pk, limits):
+                    pass
+            with in_flight(other.pk, limits):
+                pass
+        with in_flight(self.user.pk, limits):
+            pass
+
+    @override_settings(AI_IN_FLIGHT_TIMEOUT=60)
+    def test_shared_in_flight_counter_survives_busy_users_and_expiry(self):
+        backend = CacheThrottleBackend()
+        with mock.patch("time.time", return_value=1000.0):
+            self.assertTrue(backend.acquire(self.user.pk, 2))
+        with mock.patch("time.time", return_value=1050.0):
+            self.assertTrue(backend.acquire(self.user.pk, 2))
+        # Past the first call's expiry, but the second call pushed it out.
+        with mock.patch("time.time", return_value=1070.0):
+            self.assertFalse(backend.acquire(self.user.pk, 2))
+            backend.release(self.user.pk)
+            backend.release(self.user.pk)
+
+        key = backend._in_flight_key(self.user.pk)
+        self.assertTrue(backend.acquire(self.user.pk, 1))
+        cache.delete(key)  # expires mid-call
+        self.assertTrue(backend.acquire(self.user.pk, 1))
+        backend.release(self.user.pk)
+        backend.release(self.user.pk)
+        self.assertEqual(cache.get(key), 0)
+        self.assertTrue(backend.acquire(self.user.pk, 1))
+        self.assertFalse(backend.acquire(self.user.pk, 1))
+
+    async def test_async_in_flight_shares_the_slots(self):
+        limits = ThrottleLimits(per_minute=6, burst=5, max_in_flight=1)
+        async with ain_flight(self.user.pk, limits):
+            with self.assertRaises(Throttled):
+                with in_flight(self.user.pk, limits):
+                    pass
+        with in_flight(self.user.pk, limits):
+            pass
+
+    @override_settings(AI_THROTTLE_BURST=1)
+    def test_home_answers_htmx_with_a_slow_down_notice(self):
+        self.client.force_login(self.user)
+        self.client.post("/", {"narrative": "A fox."}, HTTP_HX_REQUEST="true")
+        response = self.client.post("/", {"narrative": "A fox again."}, HTTP_HX_REQUEST="true")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["HX-Retarget"], "#ai-notice")
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+        self.assertContains(response, "Slow down", status_code=429)
+        self.assertEqual(DreamEntry.objects.filter(user=self.user).count(), 1)
+
+    @override_settings(AI_MAX_IN_FLIGHT=1)
+    def test_busy_users_jobs_are_deferred_without_using_an_attempt(self):
+        entry = ingest_dream(
+            DreamEntry(
+                user=self.user,
+                title="Queued",
+                narrative="A fox.",
+                date_dreamed=timezone.localdate(),
+            ),
+            enqueue=True,
+        )
+        job = entry.jobs.get()
+        DreamJob.objects.filter(pk=job.pk).update(status=DreamJob.STATUS_RUNNING, attempts=1)
+        job.refresh_from_db()
+        with in_flight(self.user.pk), mock.patch("journal.services.jobs.interpret_and_extract") as ai:
+            run_job(job)
+        ai.assert_not_called()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (DreamJob.STATUS_QUEUED, 0))
+        self.assertGreater(job.run_after, timezone.now())
+
+
+class CommunityFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("sharer", password="pw")
+        self.reader = get_user_model().objects.create_user("reader", password="pw")
+
+    def _dream(self, title, privacy=DreamEntry.PRIVACY_PUBLIC, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ingest_dream(
+                DreamEntry(
+                    user=self.user,
+                    title=title,
+                    narrative=f"{title} narrative",
+                    date_dreamed=timezone.localdate(),
+                    privacy=privacy,
+                ),
+                **kwargs,
+            )
+
+    def test_only_public_dreams_are_published(self):
+        entry = self._dream("Lighthouse", tags=["sea", "light"])
+        self._dream("Secret", privacy=DreamEntry.PRIVACY_PRIVATE)
+        item = FeedItem.objects.get()
+        self.assertEqual((item.dream, item.title, item.tag_names), (entry, "Lighthouse", ["light", "sea"]))
+        self.assertEqual(item.author_name, "sharer")
+
+        entry.privacy = DreamEntry.PRIVACY_PRIVATE
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_dream(entry)
+        self.assertEqual(feed_page().object_list, [])
+
+        entry.privacy = DreamEntry.PRIVACY_PUBLIC
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_dream(entry)
+        self.assertEqual([row["id"] for row in feed_page().object_list], [item.pk])
+
+    def test_any_save_that_hides_a_dream_drops_it_from_the_feed(self):
+        entry = self._dream("Lighthouse")
+        self.assertEqual(len(feed_page().object_list), 1)
+        entry.privacy = DreamEntry.PRIVACY_PRIVATE
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.save()  # as the admin or a shell session would
+        self.assertEqual(feed_page().object_list, [])
+
+        entry.privacy = DreamEntry.PRIVACY_PUBLIC
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.save()
+        self.assertEqual(len(feed_page().object_list), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            DreamEntry.objects.filter(pk=entry.pk).delete()
+        self.assertEqual(feed_page().object_list, [])
+        self.assertFalse(FeedItem.objects.exists())
+
+    def test_pages_are_cached_until_the_feed_changes(self):
+        self._dream("First")
+        feed_page()
+        version = feed_version()
+        with self.assertNumQueries(0):
+            feed_page()
+        entry = self._dream("Second")
+        self.assertGreater(feed_version(), version)
+        self.assertEqual([row["title"] for row in feed_page().object_list], ["Second", "First"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.delete()
+        self.assertEqual([row["title"] for row in feed_page().object_list], ["First"])
+
+    @override_settings(FEED_PAGE_SIZE=2)
+    def test_cursor_walks_every_item_once(self):
+        for i in range(5):
+            self._dream(f"Dream {i}")
+        titles, cursor = [], None
+        while True:
+            page = feed_page(cursor)
+            titles += [row["title"] for row in page.object_list]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(titles, [f"Dream {i}" for i in reversed(range(5))])
+
+    def test_likes_and_comments_keep_counters(self):
+        item = self._dream("Owl").feed_item
+        self.client.force_login(self.reader)
+        response = self.client.post(f"/community/{item.pk}/like/")
+        self.assertContains(response, "Liked 1")
+        self.client.post(f"/community/{item.pk}/comments/", {"body": "Owls mean wisdom."})
+        self.client.post(f"/community/{item.pk}/comments/", {"body": "  "})
+        item.refresh_from_db()
+        self.assertEqual((item.like_count, item.comment_count), (1, 1))
+
+        response = self.client.post(f"/community/{item.pk}/like/")
+        self.assertContains(response, "Like 0")
+        item.refresh_from_db()
+        self.assertEqual(item.like_count, 0)
+        self.assertEqual(Comment.objects.get().body, "Owls mean wisdom.")
+
+    def test_feed_reads_never_count_rows(self):
+        for i in range(3):
+            self._dream(f"Dream {i}")
+        self.client.force_login(self.reader)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/community/")
+        self.assertContains(response, "Dream 2")
+        self.assertFalse([q for q in queries if "COUNT(" in q["sql"].upper()])
+
+    def test_hidden_items_cannot_be_liked(self):
+        entry = self._dream("Hidden")
+        entry.privacy = DreamEntry.PRIVACY_UNLISTED
+        ingest_dream(entry)
+        self.client.force_login(self.reader)
+        response = self.client.post(f"/community/{entry.feed_item.pk}/like/")
+        self.assertEqual(response.status_code, 404)
+
+
+class DreamSearchTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("seeker", password="pw")
+        other = get_user_model().objects.create_user("other", password="pw")
+        today = timezone.localdate()
+        for user, title, narrative in [
+            (self.user, "Glass city", "A fox guided me to a quiet river."),
+            (self.user, "Train", "I kept missing stations, but it felt calm."),
+            (self.user, "Rivers", "The river became a staircase."),
+            (other, "Other fox", "A fox in someone else's journal."),
+        ]:
+            DreamEntry.objects.create(
+                user=user, title=title, narrative=narrative, date_dreamed=today
+            )
+        self.client.force_login(self.user)
+
+    def test_sqlite_uses_fts5(self):
+        self.assertIsInstance(get_search_backend(), SQLiteSearchBackend)
+
+    def test_search_is_scoped_to_user_and_tracks_edits(self):
+        response = self.client.get("/dreams/", {"q": "fox"})
+        self.assertContains(response, "Glass city")
+        self.assertNotContains(response, "Other fox")
+        entry = DreamEntry.objects.get(title="Train")
+        entry.narrative = "A fox boarded the train."
+        entry.save()
+        response = self.client.get("/dreams/", {"q": "fox"}, HTTP_HX_REQUEST="true")
+        self.assertContains(response, "Train")
+        entry.delete()
+        response = self.client.get("/dreams/", {"q": "boarded"}, HTTP_HX_REQUEST="true")
+        self.assertContains(response, "No dreams match")
+
+    def test_title_matches_rank_first_and_syntax_is_escaped(self):
+        ids = SQLiteSearchBackend().search("river", user=self.user)
+        self.assertEqual(DreamEntry.objects.get(pk=ids[0]).title, "Rivers")
+        self.assertEqual(
+            SQLiteSearchBackend().search('fox" (', user=self.user),
+            SQLiteSearchBackend().search("fox", user=self.user),
+        )
+
+    def test_fallback_backend_matches_the_same_entries(self):
+        self.assertEqual(
+            sorted(FallbackSearchBackend().search("river", user=self.user)),
+            sorted(SQLiteSearchBackend().search("river", user=self.user)),
+        )
+
+
+class BenchmarkTests(TestCase):
+    def test_fixtures_create_dreams_messages_and_feed(self):
+        users = generate_fixtures(FixtureSpec(users=2, dreams=30, messages=4, public_ratio=0.5))
+        self.assertEqual([user.username for user in users], ["bench-0", "bench-1"])
+        dreams = DreamEntry.objects.filter(user=users[0])
+        self.assertEqual(dreams.count(), 30)
+        self.assertEqual(DreamMessage.objects.filter(dream__user=users[0]).count(), 120)
+        self.assertEqual(
+            FeedItem.objects.filter(author=users[0]).count(),
+            dreams.filter(privacy=DreamEntry.PRIVACY_PUBLIC).count(),
+        )
+        self.assertEqual(
+            sum(
+                MonthlyDreamStats.objects.filter(user=users[0]).values_list(
+                    "dream_count", flat=True
+                )
+            ),
+            30,
+        )
+        generate_fixtures(FixtureSpec(users=1, dreams=5, messages=0))
+        self.assertEqual(DreamEntry.objects.filter(user__username__startswith="bench-").count(), 5)
+
+    def test_percentiles_use_nearest_rank(self):
+        values = [float(value) for value in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertIsNone(percentile([], 50))
+        self.assertEqual(_summary([3.0, 1.0, 2.0])["max"], 3.0)
+
+    async def test_fake_llm_streams_chat_and_interpretations(self):
+        with FakeLLMServer(latency=0, token_delay=0) as llm, fake_llm_settings(llm):
+            chunks = [chunk async for chunk in stream_dream_chat_reply("narrative", [], "hi")]
+            self.assertGreater(len(chunks), 1)
+            self.assertEqual("".join(chunks), CHAT_REPLY)
+            data = await sync_to_async(interpret_and_extract)("A fox on a glass bridge.")
+        self.assertEqual(data["title"], "Glass bridge")
+        self.assertEqual(llm.requests, 2)
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("fragments", password="pw")
+        self.entry = ingest_dream(
+            DreamEntry(
+                user=self.user,
+                title="Glass city",
+                narrative="A fox led me to a river.",
+                date_dreamed=timezone.localdate(),
+            ),
+            tags=["lucid"],
+            symbols=["fox"],
+            interpretations={Interpretation.ANGLE_PSYCH: "Crossing over."},
+        )
+        self.client.force_login(self.user)
+        self.detail = f"/dreams/{self.entry.pk}/"
+
+    def queries_for(self, path: str, **headers) -> list[str]:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, **headers)
+        self.assertEqual(response.status_code, 200)
+        return [query["sql"] for query in queries]
+
+    def list_rows(self):
+        return self.client.get("/dreams/", HTTP_HX_REQUEST="true")
+
+    def test_cached_detail_skips_related_queries(self):
+        cold = self.queries_for(self.detail)
+        self.assertTrue(any("journal_interpretation" in sql for sql in cold))
+        warm = self.queries_for(self.detail)
+        self.assertLess(len(warm), len(cold))
+        for table in ("journal_interpretation", "journal_symbol", "journal_tag"):
+            self.assertFalse(any(f'FROM "{table}"' in sql for sql in warm), table)
+        self.assertContains(self.client.get(self.detail), "Crossing over.")
+
+    def test_related_changes_invalidate_the_detail(self):
+        self.client.get(self.detail)
+        with self.captureOnCommitCallbacks(execute=True):
+            Interpretation.objects.filter(dream=self.entry).update(summary="Stale")
+        self.assertNotContains(self.client.get(self.detail), "Stale")
+        with self.captureOnCommitCallbacks(execute=True):
+            Interpretation.objects.create(
+                dream=self.entry,
+                angle=Interpretation.ANGLE_SPIRITUAL,
+                summary="A guide appears.",
+            )
+            DreamSymbol.objects.create(
+                dream=self.entry,
+                symbol=Symbol.objects.create(name="lantern", category=Symbol.CATEGORY_OBJECT),
+            )
+        response = self.client.get(self.detail)
+        self.assertContains(response, "A guide appears.")
+        self.assertContains(response, "lantern")
+
+    def test_list_rows_follow_tag_changes(self):
+        self.queries_for("/dreams/")
+        warm = self.queries_for("/dreams/", HTTP_HX_REQUEST="true")
+        self.assertFalse(any('FROM "journal_tag"' in sql for sql in warm))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.entry.tags.add(Tag.objects.create(name="recurring"))
+        self.assertContains(self.client.get("/dreams/", HTTP_HX_REQUEST="true"), "recurring")
+        tag = Tag.objects.get(name="lucid")
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.dreams.clear()
+        self.assertNotContains(self.client.get("/dreams/", HTTP_HX_REQUEST="true"), "lucid")
+
+    def test_renamed_and_deleted_names_leave_the_cache(self):
+        self.assertContains(self.client.get(self.detail), ">fox<")
+        self.assertContains(self.list_rows(), "lucid")
+        tag = Tag.objects.get(name="lucid")
+        symbol = Symbol.objects.get(name="fox")
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name = "vivid"
+            tag.save()
+            symbol.name = "vixen"
+            symbol.save()
+        self.assertContains(self.client.get(self.detail), ">vixen<")
+        self.assertContains(self.list_rows(), "vivid")
+        self.assertNotContains(self.list_rows(), "lucid")
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.delete()
+        self.assertNotContains(self.list_rows(), "vivid")
+
+
+class ChatDeltaTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("delta", password="pw")
+        UserProfile.objects.create(user=self.user, ai_requests_per_minute=0, ai_max_in_flight=0)
+        self.entry = DreamEntry.objects.create(
+            user=self.user,
+            title="Glass city",
+            narrative="A fox led me to a river.",
+            date_dreamed=timezone.localdate(),
+        )
+        self.client.force_login(self.user)
+        self.detail = f"/dreams/{self.entry.pk}/"
+
+    def say(self, *contents: str) -> list[DreamMessage]:
+        return [
+            DreamMessage.objects.create(
+                dream=self.entry, role=DreamMessage.ROLE_USER, content=content
+            )
+            for content in contents
+        ]
+
+    def post(self, message: str, **data):
+        return self.client.post(
+            self.detail, {"message": message, **data}, HTTP_HX_REQUEST="true"
+        )
+
+    def test_htmx_post_returns_only_newer_messages(self):
+        _, seen = self.say("First turn", "Second turn")
+        self.say("From another tab")
+        response = self.post("Third turn", after=seen.pk)
+        body = response.content.decode()
+        self.assertNotIn("First turn", body)
+        self.assertNotIn("Second turn", body)
+        self.assertIn("From another tab", body)
+        self.assertIn("Third turn", body)
+        self.assertLess(body.index("From another tab"), body.index("Third turn"))
+        self.assertIn("data-chat-stream=", body)
+        self.assertNotIn('id="dream-messages"', body)
+        self.assertNotIn("dream-messages-empty", body)
+
+    def test_first_message_drops_the_empty_notice(self):
+        self.assertContains(self.client.get(self.detail), 'id="dream-messages-empty"')
+        response = self.post("Hello", after=0)
+        self.assertContains(response, 'id="dream-messages-empty" hx-swap-oob="true"')
+
+    def test_without_after_the_whole_panel_is_rendered(self):
+        self.say("First turn")
+        response = self.post("Second turn")
+        self.assertContains(response, 'id="dream-messages"')
+        self.assertContains(response, "First turn")
+
+    async def test_stream_done_event_carries_the_reply_id(self):
+        (question,) = await sync_to_async(self.say)("Why a fox?")
+        await self.async_client.aforce_login(self.user)
+
+        async def reply(*args):
+            for part in ("Foxes ", "guide."):
+                yield part
+
+        with mock.patch("journal.views.stream_dream_chat_reply", reply):
+            response = await self.async_client.get(
+                f"{self.detail}chat/stream/", {"message": question.pk}
+            )
+            body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        saved = await DreamMessage.objects.aget(role=DreamMessage.ROLE_ASSISTANT)
+        self.assertEqual(saved.content, "Foxes guide.")
+        self.assertIn(f'id: {saved.pk}\nevent: done\ndata: "Foxes guide."', body)
+
+
+    async def stream(self, message: DreamMessage, reply=("Foxes ", "guide.")):
+        async def stream_reply(*args):
+            for part in reply:
+                yield part
+
+        with mock.patch("journal.views.stream_dream_chat_reply", stream_reply):
+            response = await self.async_client.get(
+                f"{self.detail}chat/stream/", {"message": message.pk}
+            )
+            if response.status_code != 200:
+                return response.status_code, ""
+            body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        return response.status_code, body
+
+    async def test_each_of_two_quick_messages_gets_its_reply(self):
+        first, second = await sync_to_async(self.say)("Why a fox?", "And the river?")
+        await self.async_client.aforce_login(self.user)
+        self.assertEqual((await self.stream(second, ["River."]))[0], 200)
+        self.assertEqual((await self.stream(first, ["Fox."]))[0], 200)
+        self.assertEqual((await self.stream(first))[0], 204)
+        replies = DreamMessage.objects.filter(role=DreamMessage.ROLE_ASSISTANT)
+        self.assertEqual(
+            {(reply.reply_to_id, reply.content) async for reply in replies},
+            {(first.pk, "Fox."), (second.pk, "River.")},
+        )
+
+    @override_settings(AI_CHAT_NARRATIVE_TOKENS=20)
+    async def test_condensing_waits_until_the_reply_is_sent(self):
+        self.entry.narrative = "The hallway went on and on. " * 20
+        await self.entry.asave()
+        (question,) = await sync_to_async(self.say)("Why a hallway?")
+        await self.async_client.aforce_login(self.user)
+        calls = []
+
+        def condense(text, max_tokens, instructions):
+            calls.append("condense")
+            return "A long hallway."
+
+        async def stream_reply(narrative, *args):
+            calls.append("reply")
+            self.assertIn("…", narrative)  # truncated for now, not condensed
+            yield "Hallways are transitions."
+
+        with (
+            mock.patch("journal.services.ai._condense", side_effect=condense),
+            mock.patch("journal.views.stream_dream_chat_reply", stream_reply),
+        ):
+            response = await self.async_client.get(
+                f"{self.detail}chat/stream/", {"message": question.pk}
+            )
+            body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn("event: done", body)
+        self.assertEqual(calls, ["reply", "condense"])
+        await self.entry.arefresh_from_db()
+        self.assertEqual(self.entry.condensed_narrative, "A long hallway.")
+
+
+class JournalArchiveTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user("archivist", password="pw")
+        self.other = User.objects.create_user("restorer", password="pw")
+        self.entry = DreamEntry.objects.create(
+            user=self.user,
+            title="Glass city",
+            narrative="A fox led me across a glass bridge.",
+            date_dreamed=timezone.localdate() - timedelta(days=40),
+            mood_rating=7,
+            emotions=["curious"],
+            privacy=DreamEntry.PRIVACY_PUBLIC,
+        )
+        self.entry.tags.add(Tag.objects.create(name="lucid"))
+        DreamSymbol.objects.create(
+            dream=self.entry,
+            symbol=Symbol.objects.create(name="Fox", category=Symbol.CATEGORY_ANIMAL),
+            confidence=0.9,
+        )
+        Interpretation.objects.create(
+            dream=self.entry, angle=Interpretation.ANGLE_PSYCH, summary="A guide."
+        )
+        question = DreamMessage.objects.create(
+            dream=self.entry, role=DreamMessage.ROLE_USER, content="Why a fox?"
+        )
+        DreamMessage.objects.create(
+            dream=self.entry,
+            role=DreamMessage.ROLE_ASSISTANT,
+            content="Foxes guide.",
+            reply_to=question,
+        )
+        DreamEntry.objects.create(
+            user=self.user, narrative="Stairs without end.", date_dreamed=timezone.localdate()
+        )
+        # Written a while ago, so restored times are told apart from the import time.
+        self.written = timezone.now() - timedelta(days=40)
+        DreamEntry.objects.filter(pk=self.entry.pk).update(created_at=self.written)
+        self.entry.messages.update(created_at=self.written)
+
+    def export(self) -> bytes:
+        return b"".join(ndjson_chunks(self.user))
+
+    def test_round_trip_into_another_journal(self):
+        result = import_journal(self.other, io.BytesIO(self.export()))
+        self.assertEqual((result.dreams, result.interpretations, result.messages), (2, 1, 2))
+        restored = DreamEntry.objects.get(user=self.other, title="Glass city")
+        self.assertEqual(restored.date_dreamed, self.entry.date_dreamed)
+        self.assertEqual(restored.emotions, ["curious"])
+        self.assertEqual([tag.name for tag in restored.tags.all()], ["lucid"])
+        link = restored.dream_symbols.select_related("symbol").get()
+        self.assertEqual((link.symbol.name, link.confidence), ("Fox", 0.9))
+        self.assertEqual(restored.created_at, self.written)
+        question, reply = restored.messages.all()
+        self.assertEqual((question.content, reply.content), ("Why a fox?", "Foxes guide."))
+        self.assertEqual((question.created_at, reply.created_at), (self.written, self.written))
+        self.assertIsNone(question.reply_to_id)
+        self.assertEqual(reply.reply_to_id, question.pk)
+        self.assertEqual(FeedItem.objects.get(dream=restored).created_at, self.written)
+        counts = MonthlyDreamStats.objects.filter(user=self.other).values_list(
+            "dream_count", flat=True
+        )
+        self.assertEqual(sum(counts), 2)
+
+    def test_unknown_symbols_keep_their_exported_category(self):
+        record = {
+            "type": "dream",
+            "narrative": "An owl.",
+            "date_dreamed": "2026-01-02",
+            "symbols": [{"name": "Owl", "category": Symbol.CATEGORY_ANIMAL}],
+        }
+        import_journal(self.other, [json.dumps(record)])
+        self.assertEqual(Symbol.objects.get(name="Owl").category, Symbol.CATEGORY_ANIMAL)
+
+    def test_zip_export_reads_back(self):
+        data = b"".join(zip_chunks(self.user))
+        records = [json.loads(line) for line in archive_lines(io.BytesIO(data))]
+        self.assertEqual(records[0]["type"], "header")
+        self.assertEqual(
+            [record["narrative"] for record in records[1:]],
+            [self.entry.narrative, "Stairs without end."],
+        )
+
+    def test_bad_line_keeps_earlier_batches(self):
+        lines = self.export().splitlines() + [b"{not json"]
+        with self.assertRaisesMessage(JournalImportError, "Line 4 is not valid JSON"):
+            import_journal(self.other, lines, batch_size=1)
+        self.assertEqual(DreamEntry.objects.filter(user=self.other).count(), 2)
+        self.assertTrue(MonthlyDreamStats.objects.filter(user=self.other).exists())
+
+    def test_rejects_other_formats(self):
+        header = {"type": "header", "format": "something-else", "version": 1}
+        with self.assertRaises(JournalImportError):
+            import_journal(self.other, [json.dumps(header)])
+
+    async def test_export_view_streams_an_attachment(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get("/dreams/export/")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertIn("attachment;", response["Content-Disposition"])
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(records[0]["format"], "nightcipher-journal")
+        self.assertEqual(records[1]["narrative"], self.entry.narrative)
+
+    def test_import_view_accepts_a_zip(self):
+        self.client.force_login(self.other)
+        upload = SimpleUploadedFile("journal.zip", b"".join(zip_chunks(self.user)))
+        response = self.client.post("/dreams/import/", {"archive": upload})
+        self.assertContains(response, "Imported 2 dreams")
+        self.assertEqual(DreamEntry.objects.filter(user=self.other).count(), 2)
+
+    def test_import_view_reports_errors(self):
+        self.client.force_login(self.other)
+        upload = SimpleUploadedFile("journal.ndjson", b'{"type": "dream"}\n')
+        response = self.client.post("/dreams/import/", {"archive": upload})
+        self.assertContains(response, "Line 1 has no valid date_dreamed.")
+
+    def test_import_command(self):
+        with tempfile.NamedTemporaryFile(suffix=".ndjson") as handle:
+            handle.write(self.export())
+            handle.flush()
+            out = StringIO()
+            call_command("import_journal", "restorer", handle.name, stdout=out)
+        self.assertIn("Imported 2 dream(s)", out.getvalue())
+        with self.assertRaisesMessage(CommandError, "No user named 'nobody'."):
+            call_command("import_journal", "nobody", "-")
+
+
+class DreamFilterTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("filters", password="pw")
+        today = timezone.localdate()
+        self.fox = ingest_dream(
+            DreamEntry(
+                user=self.user,
+                title="Fox bridge",
+                narrative="A fox crossed the glass bridge.",
+                date_dreamed=today,
+                emotions=["Anxious", "anxious ", "curious"],
+                people=["Mother"],
+            ),
+            tags=["lucid"],
+            symbols=["fox"],
+        )
+        self.river = ingest_dream(
+            DreamEntry(
+                user=self.user,
+                title="River",
+                narrative="The river sang below the bridge.",
+                date_dreamed=today - timedelta(days=60),
+                emotions=["calm"],
+                settings=["Forest"],
+            ),
+            tags=["lucid", "recurring"],
+        )
+        self.client.force_login(self.user)
+
+    def facets(self, entry) -> set:
+        return set(DreamFacet.objects.filter(dream=entry).values_list("kind", "value"))
+
+    def matching(self, **filters) -> list[str]:
+        entries = DreamFilter(**filters).apply(DreamEntry.objects.filter(user=self.user), self.user)
+        return sorted(entries.values_list("title", flat=True))
+
+    def test_facets_follow_entry_writes(self):
+        self.assertEqual(
+            self.facets(self.fox),
+            {("emotion", "anxious"), ("emotion", "curious"), ("person", "mother")},
+        )
+        self.fox.emotions = ["joyful", "curious"]
+        self.fox.save()
+        self.assertIn(("emotion", "joyful"), self.facets(self.fox))
+        self.assertNotIn(("emotion", "anxious"), self.facets(self.fox))
+        with CaptureQueriesContext(connection) as queries:
+            self.fox.save(update_fields=["title"])
+        self.assertFalse(any("journal_dreamfacet" in q["sql"] for q in queries))
+
+    def test_filters_combine(self):
+        self.assertEqual(self.matching(tags=("lucid",)), ["Fox bridge", "River"])
+        self.assertEqual(self.matching(tags=("lucid", "recurring")), ["River"])
+        self.assertEqual(self.matching(emotions=("anxious",), symbols=("fox",)), ["Fox bridge"])
+        self.assertEqual(self.matching(settings=("forest",), people=("mother",)), [])
+        self.assertEqual(
+            self.matching(date_from=timezone.localdate() - timedelta(days=7)), ["Fox bridge"]
+        )
+
+    def test_facet_counts_take_one_query(self):
+        with self.assertNumQueries(1):
+            counts = facet_counts(self.user)
+        self.assertEqual(counts["tags"], [("lucid", 2), ("recurring", 1)])
+        self.assertEqual(counts["symbols"], [("fox", 1)])
+        self.assertEqual(counts["emotions"], [("anxious", 1), ("calm", 1), ("curious", 1)])
+        filtered = facet_counts(self.user, DreamFilter(settings=("forest",)))
+        self.assertEqual(filtered["tags"], [("lucid", 1), ("recurring", 1)])
+        self.assertEqual(filtered["emotions"], [("calm", 1)])
+
+    def test_list_view_filters_and_links_facets(self):
+        response = self.client.get("/dreams/", {"emotion": "Anxious", "tag": "lucid"})
+        self.assertContains(response, "Fox bridge")
+        self.assertNotContains(response, ">River<")
+        self.assertContains(response, 'href="/dreams/?tag=lucid"')
+        response = self.client.get("/dreams/", {"setting": "nowhere"}, HTTP_HX_REQUEST="true")
+        self.assertContains(response, "No dreams match these filters.")
+
+    def test_search_respects_filters(self):
+        response = self.client.get("/dreams/", {"q": "bridge", "tag": "recurring"})
+        self.assertContains(response, "The river sang")
+        self.assertNotContains(response, "A fox crossed")
+
+    def test_rebuild_command(self):
+        DreamFacet.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_dream_facets", stdout=out)
+        self.assertIn("Rebuilt 5 facet row(s).", out.getvalue())
+        self.assertEqual(self.facets(self.river), {("emotion", "calm"), ("setting", "forest")})
+
+
+class JSONFieldStreamTests(SimpleTestCase):
+    def feed(self, text: str, size: int) -> tuple[JSONFieldStream, list]:
+        parser, done = JSONFieldStream(), []
+        for start in range(0, len(text), size):
+            done += parser.feed(text[start : start + size])
+        return parser, done
+
+    def test_fields_complete_in_order_whatever_the_chunking(self):
+        payload = {
+            "title": 'Glass "city" }{',
+            "tags": ["a", "b]"],
+            "mood": 7,
+            "lucid": True,
+            "nested": {"items": [1, {"x": "}"}]},
+            "note": "caf\u00e9 \\ done",
+            "last": None,
+        }
+        text = "```json\n" + json.dumps(payload, indent=2) + "\n```"
+        for size in (1, 3, 7, len(text)):
+            parser, done = self.feed(text, size)
+            self.assertTrue(parser.complete)
+            self.assertEqual(parser.data, payload)
+            self.assertEqual([key for key, _ in done], list(payload))
+
+    def test_partial_text_yields_only_finished_fields(self):
+        parser = JSONFieldStream()
+        self.assertEqual(parser.feed('{"title": "A", "tags": ["x"'), [("title", "A")])
+        self.assertFalse(parser.complete)
+        self.assertEqual(parser.feed(', "y"]}'), [("tags", ["x", "y"])])
+        self.assertTrue(parser.complete)
+
+    def test_malformed_json_raises(self):
+        for text in ('{"a": tru,', '{"a" 1}', "{1: 2}"):
+            with self.assertRaises(ValueError):
+                JSONFieldStream().feed(text)
+
+
+class InterpretationProgressTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("progress", password="pw")
+        UserProfile.objects.create(user=self.user, ai_requests_per_minute=0, ai_max_in_flight=0)
+        self.entry = ingest_dream(
+            DreamEntry(
+                user=self.user,
+                title="Untitled Dream",
+                narrative="A fox on a glass bridge.",
+                date_dreamed=timezone.localdate(),
+                job_status=DreamEntry.JOB_PENDING,
+            ),
+            enqueue=True,
+        )
+        self.client.force_login(self.user)
+
+    def test_session_partial_fills_in_while_the_job_streams(self):
+        pages = []
+
+        def interpret(narrative, on_field):
+            on_field("title", "Glass bridge")
+            on_field("tags", ["threshold"])
+            pages.append(self.client.get(f"/dreams/{self.entry.pk}/session/"))
+            on_field("psych_summary", "Crossing something fragile.")
+            pages.append(self.client.get(f"/dreams/{self.entry.pk}/session/"))
+            return {"title": "Glass bridge", "psych_summary": "Crossing something fragile."}
+
+        job = DreamJob.objects.get(dream=self.entry)
+        with mock.patch("journal.services.jobs.interpret_and_extract", side_effect=interpret):
+            run_job(job)
+        self.assertContains(pages[0], "Glass bridge")
+        self.assertContains(pages[0], "threshold")
+        self.assertNotContains(pages[0], "Crossing something fragile.")
+        self.assertContains(pages[1], "Crossing something fragile.")
+        self.assertEqual(interpretation_progress(self.entry.pk), {})
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.title, "Glass bridge")
+
+    @override_settings(JOB_MAX_ATTEMPTS=2)
+    def test_cut_off_stream_is_retried_then_keeps_its_finished_fields(self):
+        def interpret(narrative, on_field):
+            on_field("title", "Glass bridge")
+            raise IncompleteInterpretation({"title": "Glass bridge"})
+
+        job = DreamJob.objects.get(dream=self.entry)
+        with mock.patch("journal.services.jobs.interpret_and_extract", side_effect=interpret):
+            for attempt in (1, 2):
+                DreamJob.objects.filter(pk=job.pk).update(attempts=attempt)
+                job.refresh_from_db()
+                run_job(job)
+                job.refresh_from_db()
+                self.entry.refresh_from_db()
+                if attempt == 1:
+                    self.assertEqual(job.status, DreamJob.STATUS_QUEUED)
+                    self.assertEqual(self.entry.job_status, DreamEntry.JOB_PENDING)
+                    self.assertEqual(
+                        interpretation_progress(self.entry.pk), {"title": "Glass bridge"}
+                    )
+        self.assertEqual(job.status, DreamJob.STATUS_FAILED)
+        self.assertIn("stopped after 1 of", job.last_error)
+        self.assertEqual(self.entry.job_status, DreamEntry.JOB_FAILED)
+        self.assertEqual(self.entry.title, "Glass bridge")
+        self.assertTrue(self.entry.interpretations.filter(prompt_version="").exists())
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        for name in ["Snake", "Snail", "Sea snake", "Stairs", "Glass city", "Fox"]:
+            Symbol.objects.create(name=name, category=Symbol.CATEGORY_OBJECT)
+        self.backend = MemoryCompletionBackend()
+
+    def names(self, query, limit=10):
+        return [name for _, name in self.backend.complete(Symbol, query, limit)]
+
+    def test_canonical_name_folds_case_accents_and_plurals(self):
+        self.assertEqual(canonical_name("  Snakes! "), "snake")
+        self.assertEqual(canonical_name("Butterflies"), "butterfly")
+        self.assertEqual(canonical_name("Café  boxes"), "cafe box")
+        self.assertEqual(canonical_name("bus"), "bus")
+        for plural, singular in (
+            ("zombies", "zombie"),
+            ("movies", "movie"),
+            ("headaches", "headache"),
+            ("aches", "ache"),
+            ("niches", "niche"),
+            ("beaches", "beach"),
+            ("churches", "church"),
+            ("stories", "story"),
+            ("ties", "tie"),
+            ("buses", "bus"),
+            ("horses", "horse"),
+            ("kisses", "kiss"),
+            ("wolves", "wolf"),
+        ):
+            self.assertEqual(canonical_name(plural), canonical_name(singular))
+            self.assertEqual(canonical_name(plural), singular)
+        for word in ("news", "series", "species", "lens", "texas", "atlas", "glasses", "woods"):
+            self.assertEqual(canonical_name(word), word)
+
+    def test_canonical_name_keeps_different_words_apart(self):
+        for first, second in (("Glasses", "glass"), ("Woods", "wood"), ("Arms", "arm")):
+            self.assertNotEqual(canonical_name(first), canonical_name(second))
+        # Plurals whose singular cannot be told from the spelling stay as they are.
+        for word in ("caves", "shoes", "goalies"):
+            self.assertEqual(canonical_name(word), word)
+
+    def test_prefix_matches_come_before_fuzzy_ones(self):
+        self.assertEqual(self.names("sn"), ["Snail", "Snake"])
+        self.assertEqual(self.names("snakes"), ["Snake", "Sea snake", "Snail"])
+        self.assertEqual(self.names("snake", limit=1), ["Snake"])
+        self.assertEqual(self.names("glas citty"), ["Glass city"])
+        self.assertEqual(self.names("?"), [])
+
+    def test_index_is_loaded_once_per_refresh_interval(self):
+        with self.assertNumQueries(1):
+            self.names("fox")
+            self.names("stair")
+        Symbol.objects.create(name="Foxglove", category=Symbol.CATEGORY_OBJECT)
+        self.assertEqual(self.names("fox"), ["Fox"])
+        with override_settings(AUTOCOMPLETE_REFRESH_SECONDS=-1):
+            self.assertEqual(self.names("fox"), ["Fox", "Foxglove"])
+
+    def test_view_returns_json_for_known_kinds(self):
+        get_completion_backend().clear()
+        Tag.objects.create(name="Recurring")
+        self.client.force_login(get_user_model().objects.create_user("typist", password="pw"))
+        response = self.client.get("/autocomplete/tags/", {"q": "recur"})
+        self.assertEqual(
+            response.json(),
+            {"results": [{"id": Tag.objects.get().pk, "name": "Recurring"}]},
+        )
+        self.assertEqual(self.client.get("/autocomplete/users/", {"q": "a"}).status_code, 404)
+
+
+class LargeTableAdminTests(TestCase):
+    def setUp(self):
+        admin_user = get_user_model().objects.create_superuser("keeper", password="pw")
+        self.entry = DreamEntry.objects.create(
+            user=admin_user, title="Night train", narrative="A slow train.",
+            date_dreamed=timezone.localdate(),
+        )
+        self.messages = DreamMessage.objects.bulk_create(
+            DreamMessage(dream=self.entry, role=DreamMessage.ROLE_USER, content=f"message {n}")
+            for n in range(5)
+        )
+        self.client.force_login(admin_user)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=3)
+    def test_counts_use_planner_estimates_or_stop_at_the_limit(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE journal_dreammessage")
+        DreamMessage.objects.create(dream=self.entry, role=DreamMessage.ROLE_USER, content="late")
+        self.assertEqual(EstimatedCountPaginator(DreamMessage.objects.all(), 2).count, 5)
+        filtered = DreamMessage.objects.filter(dream=self.entry)
+        self.assertEqual(EstimatedCountPaginator(filtered, 2).count, 4)
+
+    @mock.patch.object(DreamMessageAdmin, "list_per_page", 3)
+    def test_message_changelist_pages_by_id_and_is_read_only(self):
+        newest = [message.pk for message in reversed(self.messages)]
+        response = self.client.get("/admin/journal/dreammessage/")
+        self.assertContains(response, "message 4")
+        self.assertNotContains(response, "message 1")
+        self.assertContains(response, f"?id__lt={newest[2]}")
+        response = self.client.get("/admin/journal/dreammessage/", {"id__lt": newest[2]})
+        self.assertContains(response, "message 1")
+        self.assertNotContains(response, "message 2")
+        self.assertNotContains(response, "id__lt=")
+        self.assertContains(response, "Newest")
+        self.assertEqual(self.client.get("/admin/journal/dreammessage/add/").status_code, 403)
+
+    def test_dream_changelist_searches_through_the_index(self):
+        response = self.client.get("/admin/journal/dreamentry/", {"q": "slow"})
+        self.assertContains(response, "Night train")
+        response = self.client.get("/admin/journal/dreammessage/", {"q": "slow"})
+        self.assertContains(response, "message 0")
+
+
+class MetricsTests(TestCase):
+    def test_registry_renders_prometheus_text(self):
+        registry = MetricsRegistry()
+        calls = registry.counter("calls_total", "Calls.", ("model",))
+        latency = registry.histogram("latency_seconds", "Latency.", ("model",), (0.5, 1))
+        calls.inc(model='say "hi"')
+        for value in (0.2, 0.5, 3):
+            latency.observe(value, model="m")
+        self.assertEqual(
+            registry.render(),
+            "# HELP calls_total Calls.\n"
+            "# TYPE calls_total counter\n"
+            'calls_total{model="say \\"hi\\""} 1\n'
+            "# HELP latency_seconds Latency.\n"
+            "# TYPE latency_seconds histogram\n"
+            'latency_seconds_bucket{model="m",le="0.5"} 2\n'
+            'latency_seconds_bucket{model="m",le="1"} 2\n'
+            'latency_seconds_bucket{model="m",le="+Inf"} 3\n'
+            'latency_seconds_sum{model="m"} 3.7\n'
+            'latency_seconds_count{model="m"} 3\n',
+        )
+        with self.assertRaises(ValueError):
+            calls.inc(operation="chat")
+
+    @override_settings(METRICS_TOKEN="scrape-me")
+    def test_endpoint_needs_the_token_or_a_staff_session(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(
+            self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 403
+        )
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-me")
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        self.assertContains(response, "# TYPE nightcipher_ai_request_duration_seconds histogram")
+        self.assertContains(response, "nightcipher_ai_circuit_open 0")
+        staff = get_user_model().objects.create_user("ops", password="pw", is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
@@ -2,15 +2,25 @@ from django.contrib.auth import views as auth_views
 from django.urls import path
 
 from . import views
+from .instrumentation import query_budget
 
 urlpatterns = [
     path("", views.home, name="home"),
     path("community/", views.community, name="community"),
+    path("community/<int:pk>/like/", views.feed_like, name="feed_like"),
+    path("community/<int:pk>/comments/", views.feed_comments, name="feed_comments"),
     path("dreams/", views.dreams, name="dreams"),
     path("dreams/new/", views.dream_new, name="dream_new"),
+    path("dreams/export/", views.journal_export, name="journal_export"),
+    path("dreams/import/", views.journal_import, name="journal_import"),
     path("dreams/<int:pk>/", views.dream_detail, name="dream_detail"),
+    path("dreams/<int:pk>/chat/stream/", views.dream_chat_stream, name="dream_chat_stream"),
+    path("dreams/<int:pk>/session/", views.home_session, name="home_session"),
+    path("dreams/<int:pk>/similar/", views.dream_similar, name="dream_similar"),
     path("dreams/<int:pk>/delete/", views.dream_delete, name="dream_delete"),
-    path("login/", auth_views.LoginView.as_view(), name="login"),
-    path("logout/", auth_views.LogoutView.as_view(), name="logout"),
+    path("autocomplete/<str:kind>/", views.autocomplete, name="autocomplete"),
+    path("login/", query_budget(8)(auth_views.LoginView.as_view()), name="login"),
+    path("logout/", query_budget(6)(auth_views.LogoutView.as_view()), name="logout"),
     path("register/", views.register, name="register"),
+    path("metrics", views.metrics, name="metrics"),
 ]
@@ -1,91 +1,152 @@
+import hmac
+import json
+import zipfile
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
-from django.shortcuts import get_object_or_404, redirect, render
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q, Subquery, aprefetch_related_objects, prefetch_related_objects
+from django.db.models.functions import Left
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
 from django.utils import timezone
 
 from .forms import DreamEntryForm
-from .models import DreamEntry, DreamMessage, Interpretation, Symbol, Tag
-from .services import AIServiceError, dream_chat_reply, interpret_and_extract
+from .instrumentation import query_budget
+from .metrics import CONTENT_TYPE, registry
+from .models import Comment, DreamEntry, DreamMessage, FeedItem, Symbol, Tag
+from .pagination import KeysetPage, KeysetPaginator
+from .services import (
+    AIServiceError,
+    DreamFilter,
+    JournalImportError,
+    Throttled,
+    add_comment,
+    adream_chat_reply,
+    ain_flight,
+    archive_lines,
+    attach_counters,
+    attach_fragment_versions,
+    build_chat_context,
+    complete_names,
+    facet_counts,
+    feed_page,
+    import_journal,
+    ingest_dream,
+    interpretation_progress,
+    limits_for,
+    missing_fragments,
+    ndjson_chunks,
+    quick_stats,
+    search_dreams,
+    settle_chat_context,
+    similarity_index,
+    stream_dream_chat_reply,
+    throttle,
+    toggle_like,
+    zip_chunks,
+)
+from .services.fragments import DETAIL_FRAGMENTS, ROW_FRAGMENT
+from .services.similarity import COMMUNITY
 
+CHAT_FALLBACK_REPLY = "Thanks. I’ll incorporate that into your dream context."
+DREAMS_PAGE_SIZE = 20
+NARRATIVE_PREVIEW_LENGTH = 240
+FEED_COMMENTS_LIMIT = 20
+COMMENT_MAX_LENGTH = 1000
+FACET_LABELS = {
+    "tags": "Tags",
+    "symbols": "Symbols",
+    "emotions": "Emotions",
+    "people": "People",
+    "settings": "Settings",
+}
+EXPORT_FORMATS = {
+    "ndjson": (ndjson_chunks, "application/x-ndjson"),
+    "zip": (zip_chunks, "application/zip"),
+}
 
-def home(request):
-    latest_dream = None
+
+async def _auser(request):
+    # Templates read request.user; resolving it here keeps them off the sync ORM.
+    request.user = await request.auser()
+    return request.user
+
+
+async def _session_context(latest_dream) -> dict:
     interpretations = []
     messages = []
     ai_error = None
+    progress = {}
+    if latest_dream and latest_dream.is_pending:
+        # Fields the job worker has already received; see services.jobs.run_job.
+        progress = interpretation_progress(latest_dream.pk)
+    if latest_dream:
+        interpretations = [row async for row in latest_dream.interpretations.all()]
+        messages = [row async for row in latest_dream.messages.all()]
+        if latest_dream.job_status == DreamEntry.JOB_FAILED:
+            ai_error = await (
+                latest_dream.jobs.order_by("-created_at")
+                .values_list("last_error", flat=True)
+                .afirst()
+            )
+    return {
+        "latest_dream": latest_dream,
+        "interpretations": interpretations,
+        "messages": messages,
+        "ai_error": ai_error,
+        "progress": progress,
+    }
+
+
+def _slow_down(request, exc: Throttled) -> HttpResponse:
+    context = {"message": str(exc), "retry_after": exc.retry_after}
+    if request.headers.get("HX-Request") == "true":
+        response = render(request, "journal/partials/slow_down.html", context, status=429)
+        # Show the notice next to the form instead of replacing what the form targets.
+        response["HX-Retarget"] = "#ai-notice"
+        response["HX-Reswap"] = "innerHTML"
+    else:
+        response = render(request, "journal/slow_down.html", context, status=429)
+    response["Retry-After"] = str(exc.retry_after)
+    return response
+
+
+@query_budget(14)
+async def home(request):
+    user = await _auser(request)
+    latest_dream = None
 
     if request.method == "POST":
-        if not request.user.is_authenticated:
+        if not user.is_authenticated:
             return redirect("login")
         narrative = request.POST.get("narrative", "").strip()
         if narrative:
             try:
-                ai_data = interpret_and_extract(narrative)
-            except AIServiceError as exc:
-                ai_error = str(exc)
-                ai_data = {}
-
-            title = (ai_data.get("title") or "Untitled Dream").strip()
-            entry = DreamEntry.objects.create(
-                user=request.user,
-                title=title,
-                narrative=narrative,
-                date_dreamed=timezone.localdate(),
-                emotions=ai_data.get("emotions") or [],
-                people=ai_data.get("people") or [],
-                settings=ai_data.get("settings") or [],
-            )
-            psych_summary = ai_data.get("psych_summary") or "Psychological interpretation pending."
-            spiritual_summary = ai_data.get("spiritual_summary") or "Spiritual interpretation pending."
-            Interpretation.objects.create(
-                dream=entry,
-                angle=Interpretation.ANGLE_PSYCH,
-                summary=psych_summary,
+                await sync_to_async(throttle)(user.pk)
+            except Throttled as exc:
+                return _slow_down(request, exc)
+            # ingest_dream needs a transaction, which the async ORM cannot open.
+            latest_dream = await sync_to_async(ingest_dream)(
+                DreamEntry(
+                    user=user,
+                    title="Untitled Dream",
+                    narrative=narrative,
+                    date_dreamed=timezone.localdate(),
+                    job_status=DreamEntry.JOB_PENDING,
+                ),
+                enqueue=True,
             )
-            Interpretation.objects.create(
-                dream=entry,
-                angle=Interpretation.ANGLE_SPIRITUAL,
-                summary=spiritual_summary,
-            )
-            tags = ai_data.get("tags") or []
-            if tags:
-                tag_objs = [Tag.objects.get_or_create(name=name)[0] for name in tags]
-                entry.tags.set(tag_objs)
-            symbols = ai_data.get("symbols") or []
-            if symbols:
-                symbol_objs = [
-                    Symbol.objects.get_or_create(
-                        name=name, defaults={"category": Symbol.CATEGORY_ABSTRACT}
-                    )[0]
-                    for name in symbols
-                ]
-                entry.symbols.set(symbol_objs)
-            followup = ai_data.get("followup_question") or (
-                "What emotion felt strongest in this dream?"
-            )
-            DreamMessage.objects.create(
-                dream=entry,
-                role=DreamMessage.ROLE_ASSISTANT,
-                content=followup,
-            )
-            latest_dream = entry
 
-    if request.user.is_authenticated and latest_dream is None:
-        latest_dream = (
-            DreamEntry.objects.filter(user=request.user).order_by("-created_at").first()
-        )
+    if user.is_authenticated and latest_dream is None:
+        latest_dream = await DreamEntry.objects.filter(user=user).order_by("-created_at").afirst()
 
-    if latest_dream:
-        interpretations = list(latest_dream.interpretations.all())
-        messages = list(latest_dream.messages.all())
-
-    context = {
-        "latest_dream": latest_dream,
-        "interpretations": interpretations,
-        "messages": messages,
-        "ai_error": ai_error,
-    }
+    context = await _session_context(latest_dream)
 
     if request.headers.get("HX-Request") == "true" and request.method == "POST":
         return render(request, "journal/partials/home_session.html", context)
@@ -93,16 +154,165 @@ def home(request):
     return render(request, "journal/home.html", context)
 
 
+@query_budget(6)
+@login_required
+async def home_session(request, pk: int):
+    user = await _auser(request)
+    entry = await aget_object_or_404(DreamEntry, pk=pk, user=user)
+    return render(request, "journal/partials/home_session.html", await _session_context(entry))
+
+
+@query_budget(5)
 def community(request):
-    return render(request, "journal/community.html")
+    page = feed_page(request.GET.get("after"))
+    next_url = None
+    if page.has_next:
+        next_url = f"/community/?{urlencode({'after': page.next_cursor})}"
+    context = {
+        "items": attach_counters(page.object_list, request.user),
+        "next_url": next_url,
+    }
+    if request.headers.get("HX-Request") == "true":
+        return render(request, "journal/partials/feed_items.html", context)
+    return render(request, "journal/community.html", context)
 
 
+def _public_feed_item(pk: int) -> FeedItem:
+    return get_object_or_404(
+        FeedItem.objects.only("id", "like_count", "comment_count"),
+        pk=pk,
+        privacy=DreamEntry.PRIVACY_PUBLIC,
+    )
+
+
+@query_budget(11)
+@login_required
+def feed_like(request, pk: int):
+    item = _public_feed_item(pk)
+    if request.method != "POST":
+        return redirect("community")
+    liked = toggle_like(item, request.user)
+    item.refresh_from_db(fields=["like_count", "comment_count"])
+    context = {
+        "item": {
+            "id": item.pk,
+            "like_count": item.like_count,
+            "comment_count": item.comment_count,
+            "liked": liked,
+        }
+    }
+    return render(request, "journal/partials/feed_item_actions.html", context)
+
+
+@query_budget(9)
+def feed_comments(request, pk: int):
+    item = _public_feed_item(pk)
+    error = None
+    if request.method == "POST":
+        if not request.user.is_authenticated:
+            return redirect("login")
+        body = request.POST.get("body", "").strip()
+        if not body:
+            error = "Write something first."
+        elif len(body) > COMMENT_MAX_LENGTH:
+            error = f"Comments are limited to {COMMENT_MAX_LENGTH} characters."
+        else:
+            add_comment(item, request.user, body)
+    comments = list(
+        Comment.objects.filter(feed_item=item)
+        .select_related("author__profile")
+        .order_by("-created_at", "-id")[:FEED_COMMENTS_LIMIT]
+    )
+    context = {"item": item, "comments": comments[::-1], "error": error}
+    return render(request, "journal/partials/feed_comments.html", context)
+
+
+# Worst case is a search with filters: the id search plus in_bulk, and once per process
+# the probe that picks the search backend.
+@query_budget(9)
 @login_required
 def dreams(request):
-    entries = DreamEntry.objects.filter(user=request.user).order_by("-date_dreamed")
-    return render(request, "journal/dreams_list.html", {"entries": entries})
+    entries = (
+        DreamEntry.objects.filter(user=request.user)
+        .only("id", "title", "date_dreamed", "privacy", "updated_at")
+        .annotate(narrative_preview=Left("narrative", NARRATIVE_PREVIEW_LENGTH))
+    )
+    dream_filter = DreamFilter.from_query(request.GET)
+    if dream_filter:
+        entries = dream_filter.apply(entries, request.user)
+    query = request.GET.get("q", "").strip()
+    cursor = request.GET.get("after")
+    if query:
+        page = _search_page(entries, request.user, query, cursor, filtered=bool(dream_filter))
+    else:
+        page = KeysetPaginator(entries, ("-date_dreamed", "-id"), DREAMS_PAGE_SIZE).page(cursor)
+    attach_fragment_versions(page.object_list)
+    # Rows already cached at their current version never touch their tags.
+    prefetch_related_objects(missing_fragments([ROW_FRAGMENT], page.object_list), "tags")
+    filter_params = dream_filter.query_items()
+    next_url = None
+    if page.has_next:
+        params = [("q", query)] if query else []
+        next_url = f"/dreams/?{urlencode(params + filter_params + [('after', page.next_cursor)])}"
+    context = {
+        "page": page,
+        "query": query,
+        "dream_filter": dream_filter,
+        "filter_params": filter_params,
+        "next_url": next_url,
+        "preview_length": NARRATIVE_PREVIEW_LENGTH,
+        "fragment_ttl": settings.FRAGMENT_CACHE_TTL,
+    }
+    if request.headers.get("HX-Request") == "true":
+        return render(request, "journal/partials/dream_rows.html", context)
+
+    context["stats"] = quick_stats(request.user)
+    context["facets"] = _facet_links(dream_filter, facet_counts(request.user, dream_filter), query)
+    context["last_30_days_url"] = (
+        f"/dreams/?{urlencode({'from': (timezone.localdate() - timedelta(days=30)).isoformat()})}"
+    )
+    return render(request, "journal/dreams_list.html", context)
+
+
+def _facet_links(dream_filter: DreamFilter, counts: dict, query: str) -> list[dict]:
+    # Each value links to the list with that value toggled in or out of the filter.
+    groups = []
+    for field, label in FACET_LABELS.items():
+        values = []
+        for value, count in counts[field]:
+            params = [("q", query)] if query else []
+            params += dream_filter.toggled(field, value).query_items()
+            values.append(
+                {
+                    "value": value,
+                    "count": count,
+                    "active": value in getattr(dream_filter, field),
+                    "url": f"/dreams/?{urlencode(params)}",
+                }
+            )
+        if values:
+            groups.append({"label": label, "values": values})
+    return groups
+
 
+def _search_page(entries, user, query: str, cursor: str | None, filtered: bool) -> KeysetPage:
+    # Ranked results have no stable keyset, so the cursor is a plain offset.
+    offset = int(cursor) if cursor and cursor.isdigit() else 0
+    ids = search_dreams(
+        query,
+        user=user,
+        limit=DREAMS_PAGE_SIZE + 1,
+        offset=offset,
+        within=entries if filtered else None,
+    )
+    has_next = len(ids) > DREAMS_PAGE_SIZE
+    ids = ids[:DREAMS_PAGE_SIZE]
+    found = entries.in_bulk(ids)
+    rows = [found[pk] for pk in ids if pk in found]
+    return KeysetPage(rows, str(offset + DREAMS_PAGE_SIZE) if has_next else None)
 
+
+@query_budget(18)
 @login_required
 def dream_new(request):
     if request.method == "POST":
@@ -115,40 +325,179 @@ def dream_new(request):
     return render(request, "journal/dream_form.html", {"form": form})
 
 
+@query_budget(9)
 @login_required
-def dream_detail(request, pk: int):
-    entry = get_object_or_404(DreamEntry, pk=pk, user=request.user)
+async def dream_detail(request, pk: int):
+    user = await _auser(request)
     if request.method == "POST":
+        entry = await aget_object_or_404(DreamEntry, pk=pk, user=user)
         message = request.POST.get("message", "").strip()
+        is_htmx = request.headers.get("HX-Request") == "true"
+        stream_message = None
         if message:
-            DreamMessage.objects.create(
+            limits = await sync_to_async(limits_for)(user.pk)
+            try:
+                await sync_to_async(throttle)(user.pk, limits)
+            except Throttled as exc:
+                return _slow_down(request, exc)
+            user_message = await DreamMessage.objects.acreate(
                 dream=entry,
                 role=DreamMessage.ROLE_USER,
                 content=message,
             )
-            history = [
-                {"role": msg.role, "content": msg.content}
-                for msg in entry.messages.all().order_by("-created_at")[:8][::-1]
-            ]
-            try:
-                reply = dream_chat_reply(entry.narrative, history, message)
-            except AIServiceError as exc:
-                reply = f"AI unavailable: {exc}"
-            DreamMessage.objects.create(
-                dream=entry,
-                role=DreamMessage.ROLE_ASSISTANT,
-                content=reply or "Thanks. I’ll incorporate that into your dream context.",
-            )
-        if request.headers.get("HX-Request") == "true":
-            return render(
-                request,
-                "journal/partials/dream_messages.html",
-                {"entry": entry},
-            )
+            if is_htmx:
+                # The reply is produced by dream_chat_stream once the partial connects.
+                stream_message = user_message
+            else:
+                try:
+                    async with ain_flight(user.pk, limits):
+                        context = await sync_to_async(build_chat_context)(
+                            entry, message, before=user_message.pk
+                        )
+                        reply = await adream_chat_reply(
+                            context.narrative, context.history, message, context.summary
+                        )
+                except Throttled as exc:
+                    reply = f"{exc} Try again in {exc.retry_after}s."
+                except AIServiceError as exc:
+                    reply = f"AI unavailable: {exc}"
+                await DreamMessage.objects.acreate(
+                    dream=entry,
+                    role=DreamMessage.ROLE_ASSISTANT,
+                    content=reply or CHAT_FALLBACK_REPLY,
+                    reply_to=user_message,
+                )
+        if is_htmx:
+            after = request.POST.get("after", "")
+            if not after.isdigit():
+                await aprefetch_related_objects([entry], "messages")
+                return render(
+                    request,
+                    "journal/partials/dream_messages.html",
+                    {"entry": entry, "stream_message": stream_message},
+                )
+            context = {
+                "entry": entry,
+                "chat_messages": [row async for row in _messages_after(entry, int(after))],
+                "stream_message": stream_message,
+                "drop_empty_notice": after == "0",
+            }
+            return render(request, "journal/partials/chat_messages.html", context)
         return redirect("dream_detail", pk=entry.pk)
-    return render(request, "journal/dream_detail.html", {"entry": entry})
+    entry = await aget_object_or_404(
+        DreamEntry.objects.prefetch_related("messages"), pk=pk, user=user
+    )
+    return await sync_to_async(_render_dream_detail)(request, entry)
+
+
+def _messages_after(entry: DreamEntry, after: int):
+    # Bounding created_at too keeps this a range scan on the (dream, created_at, id) index.
+    messages = entry.messages.filter(pk__gt=after)
+    if after:
+        seen = DreamMessage.objects.filter(pk=after, dream=entry).values("created_at")[:1]
+        messages = messages.filter(created_at__gte=Subquery(seen))
+    return messages.order_by("created_at", "id")
+
+
+def _render_dream_detail(request, entry: DreamEntry) -> HttpResponse:
+    # Sync, so a fragment evicted between the check and the render can still query lazily.
+    attach_fragment_versions([entry])
+    if missing_fragments(DETAIL_FRAGMENTS, [entry]):
+        prefetch_related_objects([entry], "symbols", "tags", "interpretations")
+    return render(
+        request,
+        "journal/dream_detail.html",
+        {"entry": entry, "fragment_ttl": settings.FRAGMENT_CACHE_TTL},
+    )
+
+
+@query_budget(5)
+@login_required
+def dream_similar(request, pk: int):
+    entry = get_object_or_404(
+        DreamEntry.objects.only("id", "user_id", "title", "narrative", "privacy"),
+        pk=pk,
+        user=request.user,
+    )
+    own_ids = similarity_index.similar(entry, similarity_index.user_scope(request.user.pk))
+    community_ids = []
+    if entry.privacy == DreamEntry.PRIVACY_PUBLIC:
+        community_ids = similarity_index.similar(entry, COMMUNITY)
+    found = {}
+    if own_ids or community_ids:
+        # The privacy filter also hides dreams made private since the matrix was loaded.
+        found = (
+            DreamEntry.objects.filter(
+                Q(pk__in=own_ids, user=request.user)
+                | Q(pk__in=community_ids, privacy=DreamEntry.PRIVACY_PUBLIC)
+            )
+            .only("id", "title", "date_dreamed")
+            .in_bulk()
+        )
+    context = {
+        "own_similar": [found[pk] for pk in own_ids if pk in found],
+        "community_similar": [found[pk] for pk in community_ids if pk in found],
+    }
+    return render(request, "journal/partials/similar_dreams.html", context)
+
+
+def _sse(event: str, data: str, event_id: int | None = None) -> str:
+    id_line = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{id_line}event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
+@query_budget(9)
+@login_required
+async def dream_chat_stream(request, pk: int):
+    user = await request.auser()
+    entry = await aget_object_or_404(DreamEntry, pk=pk, user=user)
+    user_message = await aget_object_or_404(
+        DreamMessage,
+        pk=request.GET.get("message") or 0,
+        dream=entry,
+        role=DreamMessage.ROLE_USER,
+    )
+    if await user_message.replies.aexists():
+        # Already answered; 204 also stops EventSource from reconnecting.
+        return HttpResponse(status=204)
+
+    async def events():
+        # Runs once the response has started. No AI call comes before the reply's
+        # own: condensing and folding happen after "done".
+        context = await sync_to_async(build_chat_context)(
+            entry, user_message.content, before=user_message.pk, defer=True
+        )
+        limits = await sync_to_async(limits_for)(user.pk)
+        parts = []
+        try:
+            async with ain_flight(user.pk, limits):
+                async for delta in stream_dream_chat_reply(
+                    context.narrative, context.history, user_message.content, context.summary
+                ):
+                    parts.append(delta)
+                    yield _sse("token", delta)
+        except Throttled as exc:
+            parts = [f"{exc} Try again in {exc.retry_after}s."]
+        except AIServiceError as exc:
+            parts = [f"AI unavailable: {exc}"]
+        reply = "".join(parts).strip() or CHAT_FALLBACK_REPLY
+        saved = await DreamMessage.objects.acreate(
+            dream=entry,
+            role=DreamMessage.ROLE_ASSISTANT,
+            content=reply,
+            reply_to=user_message,
+        )
+        # The id lets the page skip this reply when it next asks for newer messages.
+        yield _sse("done", reply, saved.pk)
+        await sync_to_async(settle_chat_context)(entry, context)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@query_budget(20)
 @login_required
 def dream_delete(request, pk: int):
     entry = get_object_or_404(DreamEntry, pk=pk, user=request.user)
@@ -158,6 +507,73 @@ def dream_delete(request, pk: int):
     return render(request, "journal/dream_delete.html", {"entry": entry})
 
 
+async def _drain(chunks):
+    # Under ASGI a plain iterator is read into memory in full before anything is sent.
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
+
+
+@query_budget(2)
+@login_required
+async def journal_export(request):
+    user = await _auser(request)
+    archive_format = request.GET.get("format", "ndjson")
+    if archive_format not in EXPORT_FORMATS:
+        archive_format = "ndjson"
+    chunks, content_type = EXPORT_FORMATS[archive_format]
+    response = StreamingHttpResponse(_drain(chunks(user)), content_type=content_type)
+    filename = f"nightcipher-journal-{timezone.localdate().isoformat()}.{archive_format}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+# Per batch of IMPORT_BATCH_SIZE dreams; big journals go through manage.py import_journal.
+@query_budget(40)
+@login_required
+def journal_import(request):
+    context = {}
+    if request.method == "POST":
+        upload = request.FILES.get("archive")
+        if upload is None:
+            context["error"] = "Choose an export file to import."
+        else:
+            try:
+                context["result"] = import_journal(request.user, archive_lines(upload))
+            except (JournalImportError, zipfile.BadZipFile) as exc:
+                context["error"] = str(exc)
+    return render(request, "journal/import.html", context)
+
+
+AUTOCOMPLETE_MODELS = {"tags": Tag, "symbols": Symbol}
+
+
+# Session and user, plus one query when the in-memory index is (re)loaded.
+@query_budget(3)
+@login_required
+def autocomplete(request, kind: str):
+    model = AUTOCOMPLETE_MODELS.get(kind)
+    if model is None:
+        raise Http404
+    completions = complete_names(model, request.GET.get("q", ""))
+    return JsonResponse({"results": [{"id": pk, "name": name} for pk, name in completions]})
+
+
+def _metrics_token_ok(request) -> bool:
+    token = settings.METRICS_TOKEN
+    supplied = request.headers.get("Authorization", "")
+    return bool(token) and hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode())
+
+
+# Scrapers send "Authorization: Bearer <METRICS_TOKEN>"; staff can also look in a browser.
+@query_budget(2)
+def metrics(request):
+    if not (_metrics_token_ok(request) or request.user.is_staff):
+        raise PermissionDenied
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
+
+
+@query_budget(10)
 def register(request):
     if request.method == "POST":
         form = UserCreationForm(request.POST)
@@ -2,6 +2,8 @@
 ASGI config for nightcipher project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Run it under an ASGI server (e.g. ``uvicorn nightcipher.asgi:application``) so
+the streaming chat endpoint does not hold a worker thread per open connection.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
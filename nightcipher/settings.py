@@ -58,6 +58,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'journal.instrumentation.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -84,6 +85,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'nightcipher.wsgi.application'
+ASGI_APPLICATION = 'nightcipher.asgi.application'
 
 
 # Database
@@ -101,6 +103,17 @@ DATABASES = {
 }
 
 
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "nightcipher"),
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -152,3 +165,90 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 LOGIN_URL = "login"
 LOGIN_REDIRECT_URL = "dreams"
 LOGOUT_REDIRECT_URL = "home"
+
+# Background interpretation jobs (see `manage.py run_jobs`)
+JOB_WORKER_CONCURRENCY = int(os.environ.get("JOB_WORKER_CONCURRENCY", "4"))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "1.0"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY = float(os.environ.get("JOB_RETRY_DELAY", "5"))
+JOB_STALE_SECONDS = int(os.environ.get("JOB_STALE_SECONDS", "300"))
+
+# AI provider client (see journal.services.client)
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL") or None
+AI_CONNECT_TIMEOUT = float(os.environ.get("AI_CONNECT_TIMEOUT", "5"))
+AI_REQUEST_TIMEOUT = float(os.environ.get("AI_REQUEST_TIMEOUT", "60"))
+AI_INTERPRET_TIMEOUT = float(os.environ.get("AI_INTERPRET_TIMEOUT", "45"))
+AI_CHAT_TIMEOUT = float(os.environ.get("AI_CHAT_TIMEOUT", "30"))
+AI_MAX_RETRIES = int(os.environ.get("AI_MAX_RETRIES", "2"))
+AI_RETRY_BACKOFF = float(os.environ.get("AI_RETRY_BACKOFF", "0.5"))
+AI_RETRY_BACKOFF_MAX = float(os.environ.get("AI_RETRY_BACKOFF_MAX", "8"))
+AI_POOL_MAX_CONNECTIONS = int(os.environ.get("AI_POOL_MAX_CONNECTIONS", "20"))
+AI_POOL_MAX_KEEPALIVE = int(os.environ.get("AI_POOL_MAX_KEEPALIVE", "10"))
+AI_POOL_KEEPALIVE_EXPIRY = float(os.environ.get("AI_POOL_KEEPALIVE_EXPIRY", "30"))
+AI_BREAKER_THRESHOLD = int(os.environ.get("AI_BREAKER_THRESHOLD", "5"))
+AI_BREAKER_RESET_SECONDS = float(os.environ.get("AI_BREAKER_RESET_SECONDS", "30"))
+
+# Interpretation cache (see journal.services.cache)
+AI_CACHE_ENABLED = env_bool("AI_CACHE_ENABLED", True)
+AI_CACHE_TTL = int(os.environ.get("AI_CACHE_TTL", str(60 * 60 * 24 * 30)))
+AI_CACHE_MAX_ENTRIES = int(os.environ.get("AI_CACHE_MAX_ENTRIES", "10000"))
+AI_CACHE_EVICT_EVERY = int(os.environ.get("AI_CACHE_EVICT_EVERY", "50"))
+
+# In-process name -> id cache for Tag/Symbol lookups (see journal.services.resolver)
+NAME_RESOLVER_CACHE_SIZE = int(os.environ.get("NAME_RESOLVER_CACHE_SIZE", "2048"))
+
+# Per-view SQL query counting (see journal.instrumentation)
+QUERY_BUDGETS_ENABLED = env_bool("QUERY_BUDGETS_ENABLED", DEBUG)
+QUERY_BUDGETS_STRICT = env_bool("QUERY_BUDGETS_STRICT", False)
+
+# Dream search backend; empty picks PostgreSQL tsvector / SQLite FTS5 by DB vendor
+DREAM_SEARCH_BACKEND = os.environ.get("DREAM_SEARCH_BACKEND") or None
+
+# "Similar dreams" embeddings (see journal.services.similarity)
+DREAM_EMBEDDING_PROVIDER = os.environ.get(
+    "DREAM_EMBEDDING_PROVIDER",
+    "journal.services.similarity.HashingEmbeddingProvider",
+)
+DREAM_EMBEDDING_DIMENSIONS = int(os.environ.get("DREAM_EMBEDDING_DIMENSIONS", "256"))
+AI_EMBEDDING_MODEL = os.environ.get("AI_EMBEDDING_MODEL", "text-embedding-3-small")
+SIMILAR_DREAMS_LIMIT = int(os.environ.get("SIMILAR_DREAMS_LIMIT", "5"))
+SIMILAR_DREAMS_CACHE_SIZE = int(os.environ.get("SIMILAR_DREAMS_CACHE_SIZE", "64"))
+
+# Token budget for chat turns (see journal.services.ai.build_chat_context)
+AI_CHAT_CONTEXT_TOKENS = int(os.environ.get("AI_CHAT_CONTEXT_TOKENS", "2000"))
+AI_CHAT_NARRATIVE_TOKENS = int(os.environ.get("AI_CHAT_NARRATIVE_TOKENS", "600"))
+AI_CHAT_SUMMARY_TOKENS = int(os.environ.get("AI_CHAT_SUMMARY_TOKENS", "250"))
+AI_CHAT_MAX_MESSAGES = int(os.environ.get("AI_CHAT_MAX_MESSAGES", "40"))
+
+# Community feed (see journal.services.feed)
+FEED_PAGE_SIZE = int(os.environ.get("FEED_PAGE_SIZE", "20"))
+FEED_CACHE_TTL = int(os.environ.get("FEED_CACHE_TTL", "300"))
+
+# Per-user AI throttling (see journal.services.throttle); 0 disables a limit
+AI_THROTTLE_BACKEND = os.environ.get(
+    "AI_THROTTLE_BACKEND", "journal.services.throttle.CacheThrottleBackend"
+)
+AI_THROTTLE_PER_MINUTE = float(os.environ.get("AI_THROTTLE_PER_MINUTE", "6"))
+AI_THROTTLE_BURST = int(os.environ.get("AI_THROTTLE_BURST", "5"))
+AI_MAX_IN_FLIGHT = int(os.environ.get("AI_MAX_IN_FLIGHT", "2"))
+AI_IN_FLIGHT_TIMEOUT = int(os.environ.get("AI_IN_FLIGHT_TIMEOUT", "300"))
+
+# Versioned template fragments for dream pages (see journal.services.fragments); 0 disables
+FRAGMENT_CACHE_TTL = int(os.environ.get("FRAGMENT_CACHE_TTL", "86400"))
+
+# Journal export/import (see journal.services.archive)
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "500"))
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "500"))
+
+# Tag/symbol autocomplete (see journal.services.autocomplete); empty backend picks
+# pg_trgm on PostgreSQL, an in-memory index refreshed every N seconds elsewhere
+AUTOCOMPLETE_BACKEND = os.environ.get("AUTOCOMPLETE_BACKEND") or None
+AUTOCOMPLETE_REFRESH_SECONDS = int(os.environ.get("AUTOCOMPLETE_REFRESH_SECONDS", "300"))
+AUTOCOMPLETE_LIMIT = int(os.environ.get("AUTOCOMPLETE_LIMIT", "10"))
+AUTOCOMPLETE_MIN_SIMILARITY = float(os.environ.get("AUTOCOMPLETE_MIN_SIMILARITY", "0.3"))
+
+# Admin changelists on large tables (see journal.pagination.EstimatedCountPaginator)
+ADMIN_EXACT_COUNT_LIMIT = int(os.environ.get("ADMIN_EXACT_COUNT_LIMIT", "10000"))
+
+# Prometheus metrics at /metrics (see journal.metrics); scrapers send this bearer token
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")